@@ -0,0 +1,168 @@
+"""
+Batch throughput benchmark: a serial /process-style loop vs. DomainScheduler fan-out, both running
+the real summarize_url (HTTP fetcher, extraction pool, reducer, router, LLM client) against the
+local stand-ins in bench/standins.py, fully offline.
+
+Pages are served from one fixture site listening on --domains loopback addresses (127.0.0.1,
+127.0.0.2, ...), so the scheduler sees that many hosts; links are spread over them with a Zipf-ish
+skew like a real reading list. Every link is unique per run, so no cache short-circuits a job.
+
+The LLM rate limiter and chunk cache need a Redis; if --redis-url isn't reachable it falls back to an
+in-process fakeredis when `fakeredis` and `lupa` are installed. Run from apps/api:
+
+    python -m bench.batch_throughput --urls 100 --domains 20 --llm-latency 0.5
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+from collections import defaultdict
+
+# Required settings that the benchmark never uses for real; lets it run without a .env
+BENCH_ENV = (
+    "CLERK_SECRET_KEY", "NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY", "NEXT_PUBLIC_SUPABASE_URL",
+    "NEXT_PUBLIC_SUPABASE_ANON_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY", "GROQ_API_KEY",
+    "NOTION_CLIENT_ID", "NOTION_CLIENT_SECRET", "NOTION_REDIRECT_URI",
+)
+
+
+def make_urls(count: int, site_urls: list, paths: list, run_id: str, seed: int):
+    rng = random.Random(seed)
+    # Zipf-ish skew: a few hosts dominate, like real reading lists
+    weights = [1 / (rank + 1) for rank in range(len(site_urls))]
+    hosts = rng.choices(site_urls, weights=weights, k=count)
+    return [f"{host}{paths[i % len(paths)]}?bench={run_id}-{i}" for i, host in enumerate(hosts)]
+
+
+async def use_redis(redis_url: str):
+    """
+    The shared client, or an in-process fakeredis standing in for it when nothing listens at `redis_url`.
+    """
+    import core.redis
+    redis = core.redis.get_redis()
+    try:
+        await redis.ping()
+        return redis
+    except Exception as e:
+        try:
+            import fakeredis
+        except ImportError:
+            raise SystemExit(f"Redis at {redis_url} is unreachable ({e}); start one or pip install fakeredis lupa")
+        print(f"Redis at {redis_url} is unreachable ({e}); using an in-process fakeredis")
+        redis = fakeredis.FakeAsyncRedis()
+        # Modules that `from core.redis import get_redis` are imported after this (pipeline and
+        # what it pulls in), so they bind the stand-in
+        core.redis.get_redis = lambda: redis
+        return redis
+
+
+async def run_mode(ctx, urls: list, scheduler=None) -> dict:
+    from pipeline import summarize_url
+    from services.batch import DomainScheduler
+
+    in_flight, peaks = defaultdict(int), defaultdict(int)
+    failed = 0
+
+    async def one(url):
+        nonlocal failed
+        domain = DomainScheduler.domain_of(url)
+        in_flight[domain] += 1
+        peaks[domain] = max(peaks[domain], in_flight[domain])
+        try:
+            result = await summarize_url(ctx, url)
+            failed += "error" in result["data"]
+        except Exception as e:
+            print(f"{url} failed: {e}")
+            failed += 1
+        finally:
+            in_flight[domain] -= 1
+
+    async def scheduled(url):
+        async with scheduler.slot(url):
+            await one(url)
+
+    started = time.perf_counter()
+    if scheduler:
+        await asyncio.gather(*(scheduled(url) for url in urls))
+    else:
+        for url in urls:
+            await one(url)
+    return {"seconds": time.perf_counter() - started, "failed": failed, "peak_per_domain": max(peaks.values())}
+
+
+async def run(args, site_urls: list, paths: list) -> dict:
+    from services.batch import DomainScheduler
+    from services.extractor import ExtractionPool
+    from services.http import HttpFetcher
+
+    redis = await use_redis(args.redis_url)
+    ctx = {"redis": redis, "extract_pool": ExtractionPool(), "http_fetcher": HttpFetcher(redis=redis)}
+    await ctx["extract_pool"].start()
+    run_id = uuid.uuid4().hex[:8]
+    try:
+        # One unmeasured job first, so lazily imported modules (litellm, ...) don't land in the serial run
+        from pipeline import summarize_url
+        await summarize_url(ctx, f"{site_urls[0]}{paths[0]}?bench={run_id}-warm-up")
+        scheduler = DomainScheduler(args.concurrency, args.per_domain, args.interval)
+        serial = await run_mode(ctx, make_urls(args.urls, site_urls, paths, f"{run_id}-serial", args.seed))
+        batch = await run_mode(ctx, make_urls(args.urls, site_urls, paths, f"{run_id}-batch", args.seed), scheduler)
+    finally:
+        await ctx["http_fetcher"].close()
+        await ctx["extract_pool"].stop()
+    return {"serial": serial, "scheduled": batch, "scheduler": scheduler}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default=os.environ.get("REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--urls", type=int, default=100)
+    parser.add_argument("--domains", type=int, default=20, help="loopback hosts the fixture site answers on (max 254)")
+    parser.add_argument("--pages", type=int, default=50, help="size of the generated fixture corpus")
+    parser.add_argument("--site-latency", type=float, default=0.1, help="median seconds per fixture page")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="median seconds per LLM call")
+    parser.add_argument("--concurrency", type=int, default=None)
+    parser.add_argument("--per-domain", type=int, default=None)
+    parser.add_argument("--interval", type=float, default=None, help="seconds between requests to one host")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["REDIS_URL"] = args.redis_url
+    os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True") # no network fetch of the price list
+    for name in BENCH_ENV:
+        os.environ.setdefault(name, "bench")
+
+    from bench.standins import StandIn, fake_llm, fixture_site, make_corpus
+    from core.config import get_settings
+
+    corpus = make_corpus(args.pages, 0.0, args.seed)
+    hosts = tuple(f"127.0.0.{n}" for n in range(1, args.domains + 1))
+    with StandIn(fixture_site(corpus, args.site_latency, args.seed), hosts=hosts) as site, \
+            StandIn(fake_llm(args.llm_latency, seed=args.seed)) as llm:
+        # Point the pipeline at the stand-ins, as bench/pipeline_e2e.py does
+        settings = get_settings()
+        settings.LLM_MODELS = [{
+            "model": "openai/bench-llm",
+            "api_base": f"{llm.url}/v1",
+            "api_key_setting": "OPENAI_API_KEY",
+            "input_cost_per_1k": 0.00015,
+            "output_cost_per_1k": 0.0006,
+            "max_input_tokens": 128000,
+        }]
+        settings.LLM_RATE_LIMITS = {"default": {"concurrency": 10000, "rpm": 10 ** 7, "tpm": 10 ** 10}}
+        settings.PROXY_SERVER_URL = ""
+        settings.FIRECRAWL_API_KEY = ""
+        results = asyncio.run(run(args, site.urls, sorted(corpus)))
+
+    serial, batch, scheduler = results["serial"], results["scheduled"], results["scheduler"]
+    print(f"\nURLs: {args.urls} across {args.domains} hosts; {args.site_latency * 1000:.0f} ms pages, {args.llm_latency * 1000:.0f} ms LLM")
+    print(f"serial:    {serial['seconds']:7.1f}s  {args.urls / serial['seconds']:6.2f} URLs/s  {serial['failed']} failed")
+    print(f"scheduled: {batch['seconds']:7.1f}s  {args.urls / batch['seconds']:6.2f} URLs/s  {batch['failed']} failed"
+          f"  (global={scheduler.max_concurrency}, per-domain={scheduler.per_domain_concurrency})")
+    print(f"speedup:   {serial['seconds'] / batch['seconds']:7.1f}x")
+    print(f"peak in-flight on busiest domain: {batch['peak_per_domain']}")
+
+
+if __name__ == "__main__":
+    main()
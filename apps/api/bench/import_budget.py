@@ -0,0 +1,81 @@
+"""
+Cold-start budget check for the API and worker entry points.
+
+Imports each module in a fresh interpreter and reports import time, peak RSS and whether any
+heavy per-tier dependency was pulled in eagerly. Exits non-zero when a budget is exceeded, so it
+can run in CI. Run from apps/api:
+
+    python -m bench.import_budget
+    python -m bench.import_budget --max-seconds 1.0 --max-rss-mb 100 --repeat 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+# Loaded on first use of their tier; importing any of these at startup is a regression
+HEAVY_MODULES = ("litellm", "playwright", "yt_dlp", "trafilatura", "groq", "youtube_transcript_api")
+ENTRY_POINTS = ("main", "worker", "pipeline")
+BENCH_ENV = {
+    "REDIS_URL": "redis://localhost:6379",
+    "NEXT_PUBLIC_SUPABASE_URL": "http://localhost",
+    **{name: "bench" for name in (
+        "CLERK_SECRET_KEY", "NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY", "NEXT_PUBLIC_SUPABASE_ANON_KEY", "OPENAI_API_KEY",
+        "GEMINI_API_KEY", "GROQ_API_KEY", "NOTION_CLIENT_ID", "NOTION_CLIENT_SECRET", "NOTION_REDIRECT_URI",
+    )},
+}
+
+PROBE = """
+import json, resource, sys, time
+started = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - started
+print(json.dumps({{
+    "seconds": elapsed,
+    "rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    "heavy": [name for name in {heavy!r} if name in sys.modules],
+}}))
+"""
+
+
+def probe(module: str) -> dict:
+    # Settings only need to parse; nothing connects at import time
+    env = {**BENCH_ENV, **os.environ}
+    output = subprocess.run(
+        [sys.executable, "-c", PROBE.format(module=module, heavy=HEAVY_MODULES)],
+        capture_output=True, text=True, env=env, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-seconds", type=float, default=1.5, help="median import time budget per entry point")
+    parser.add_argument("--max-rss-mb", type=float, default=120, help="peak RSS budget after import")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'module':<10}{'import s':>10}{'rss MB':>10}  eager heavy imports")
+    for module in ENTRY_POINTS:
+        runs = [probe(module) for _ in range(args.repeat)]
+        seconds = statistics.median(run["seconds"] for run in runs)
+        rss = max(run["rss_mb"] for run in runs)
+        heavy = sorted({name for run in runs for name in run["heavy"]})
+        print(f"{module:<10}{seconds:>10.2f}{rss:>10.0f}  {', '.join(heavy) or '-'}")
+        if seconds > args.max_seconds:
+            failures.append(f"{module}: import took {seconds:.2f}s (budget {args.max_seconds}s)")
+        if rss > args.max_rss_mb:
+            failures.append(f"{module}: {rss:.0f} MB after import (budget {args.max_rss_mb} MB)")
+        if heavy:
+            failures.append(f"{module}: imports {', '.join(heavy)} eagerly")
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""
+Near-duplicate detection benchmark: hit rate, false-positive rate and lookup latency of the
+MinHash/LSH index (services/near_duplicates.py) on a generated fixture corpus.
+
+Indexes a set of original articles, then looks up:
+
+- positives: copies of indexed articles as they show up in the wild (syndicated with different
+  site boilerplate, AMP pages missing a paragraph, lightly edited mirrors), expected to match their original
+- negatives: unrelated articles from the same vocabulary and articles quoting one paragraph of an
+  indexed one, expected not to match anything
+
+Needs a Redis you don't mind writing to; keys are namespaced per run and deleted afterwards.
+Run from apps/api:
+
+    python -m bench.near_duplicates --redis-url redis://localhost:6379/15 --originals 2000 --queries 1000
+    python -m bench.near_duplicates --threshold 0.7 --edit-rate 0.05 --json near_dup.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+
+BENCH_ENV = (
+    "CLERK_SECRET_KEY", "NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY", "NEXT_PUBLIC_SUPABASE_URL",
+    "NEXT_PUBLIC_SUPABASE_ANON_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY", "GROQ_API_KEY",
+    "NOTION_CLIENT_ID", "NOTION_CLIENT_SECRET", "NOTION_REDIRECT_URI",
+)
+
+BOILERPLATE = [
+    "Originally published on {site}. Republished with permission.",
+    "Subscribe to the {site} newsletter for more stories like this.",
+    "Share this article: Twitter Facebook LinkedIn Email",
+    "Related: more from {site} on technology, business and markets.",
+    "Copyright {site}. All rights reserved.",
+]
+
+
+def percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def make_article(rng: random.Random) -> list:
+    from bench.standins import _paragraphs
+    # Same length spread as the pipeline benchmark's fixture site
+    return _paragraphs(rng, min(60, max(4, int(rng.lognormvariate(2.3, 0.6)))))
+
+
+def syndicated(rng: random.Random, paragraphs: list) -> str:
+    site = f"site{rng.randint(1, 500)}.example.com"
+    header = [line.format(site=site) for line in rng.sample(BOILERPLATE, 2)]
+    footer = [line.format(site=site) for line in rng.sample(BOILERPLATE, 2)]
+    return "\n\n".join(header + paragraphs + footer)
+
+
+def amp_page(rng: random.Random, paragraphs: list) -> str:
+    # AMP and "lite" versions often drop a paragraph (embedded widget, pull quote)
+    kept = list(paragraphs)
+    if len(kept) > 4:
+        kept.pop(rng.randrange(len(kept)))
+    return "\n\n".join(kept)
+
+
+def edited(rng: random.Random, paragraphs: list, edit_rate: float) -> str:
+    from bench.standins import WORDS
+    words = "\n\n".join(paragraphs).split(" ")
+    for _ in range(int(len(words) * edit_rate)):
+        words[rng.randrange(len(words))] = rng.choice(WORDS)
+    return " ".join(words)
+
+
+def quoting(rng: random.Random, paragraphs: list) -> str:
+    # A different article that quotes one paragraph of an indexed one: must not reuse its summary
+    return "\n\n".join(make_article(rng) + [rng.choice(paragraphs)])
+
+
+def exact_jaccard(a: str, b: str, k: int) -> float:
+    from services.near_duplicates import WORD_PATTERN
+
+    def shingles(text):
+        words = WORD_PATTERN.findall(text.lower())
+        return {tuple(words[i:i + k]) for i in range(len(words) - k + 1)}
+    sa, sb = shingles(a), shingles(b)
+    return len(sa & sb) / len(sa | sb) if sa and sb else 0.0
+
+
+async def run(args) -> dict:
+    from core.config import get_settings
+    from core.redis import get_redis
+    from services.near_duplicates import NearDuplicateIndex, minhash_signature
+
+    settings = get_settings()
+    settings.NEAR_DUP_THRESHOLD = args.threshold
+    redis = get_redis()
+    rng = random.Random(args.seed)
+    # Band keys are namespaced by language, so a per-run "language" keeps runs apart
+    namespace = f"bench-{uuid.uuid4().hex[:8]}"
+    originals = [make_article(rng) for _ in range(args.originals)]
+
+    # 1. Index the originals
+    started = time.perf_counter()
+    for index, paragraphs in enumerate(originals):
+        signature = minhash_signature("\n\n".join(paragraphs))
+        if signature:
+            await NearDuplicateIndex.add(redis, signature, f"{namespace}:{index}", namespace)
+    index_seconds = time.perf_counter() - started
+
+    # 2. Look up positives and negatives
+    kinds = {
+        "syndicated": lambda p: syndicated(rng, p),
+        "amp": lambda p: amp_page(rng, p),
+        "edited": lambda p: edited(rng, p, args.edit_rate),
+        "unrelated": lambda p: "\n\n".join(make_article(rng)),
+        "quoting": lambda p: quoting(rng, p),
+    }
+    positives = {"syndicated", "amp", "edited"}
+    stats = {kind: {"queries": 0, "matched": 0, "correct": 0, "skipped": 0, "jaccard": []} for kind in kinds}
+    fingerprint_ms, lookup_ms = [], []
+    for query in range(args.queries):
+        kind = list(kinds)[query % len(kinds)]
+        target = rng.randrange(len(originals))
+        text = kinds[kind](originals[target])
+        entry = stats[kind]
+        entry["queries"] += 1
+
+        t0 = time.perf_counter()
+        signature = minhash_signature(text)
+        t1 = time.perf_counter()
+        if signature is None:
+            entry["skipped"] += 1
+            continue
+        match, _ = await NearDuplicateIndex.find(redis, signature, namespace)
+        t2 = time.perf_counter()
+        fingerprint_ms.append((t1 - t0) * 1000)
+        lookup_ms.append((t2 - t1) * 1000)
+        if match:
+            entry["matched"] += 1
+            entry["correct"] += match == f"{namespace}:{target}"
+        if query < args.jaccard_samples * len(kinds):
+            entry["jaccard"].append(exact_jaccard(text, "\n\n".join(originals[target]), settings.NEAR_DUP_SHINGLE_WORDS))
+
+    # 3. Clean up this run's keys
+    deleted = 0
+    for pattern in (f"near-dup:band:{namespace}:*", f"near-dup:sig:{namespace}:*"):
+        batch = []
+        async for key in redis.scan_iter(match=pattern, count=1000):
+            batch.append(key)
+            if len(batch) >= 1000:
+                deleted += await redis.delete(*batch)
+                batch = []
+        if batch:
+            deleted += await redis.delete(*batch)
+
+    positive_queries = sum(stats[k]["queries"] - stats[k]["skipped"] for k in positives)
+    negative_queries = sum(stats[k]["queries"] - stats[k]["skipped"] for k in kinds if k not in positives)
+    return {
+        "originals": args.originals,
+        "index_seconds": round(index_seconds, 2),
+        "hit_rate": sum(stats[k]["correct"] for k in positives) / max(1, positive_queries),
+        "false_positive_rate": sum(stats[k]["matched"] for k in kinds if k not in positives) / max(1, negative_queries),
+        "wrong_match": sum(stats[k]["matched"] - stats[k]["correct"] for k in positives),
+        "fingerprint_ms": {f"p{p}": percentile(fingerprint_ms, p) for p in (50, 95, 99)},
+        "lookup_ms": {f"p{p}": percentile(lookup_ms, p) for p in (50, 95, 99)},
+        "by_kind": {
+            kind: {
+                "queries": entry["queries"],
+                "matched": entry["matched"],
+                "correct": entry["correct"],
+                "skipped": entry["skipped"],
+                "median_jaccard": percentile(entry["jaccard"], 50),
+            }
+            for kind, entry in stats.items()
+        },
+        "keys_deleted": deleted,
+    }
+
+
+def report(result: dict):
+    print(f"\nIndexed {result['originals']} originals in {result['index_seconds']}s")
+    print(f"  hit rate            {result['hit_rate']:.3f}")
+    print(f"  false-positive rate {result['false_positive_rate']:.4f}")
+    print(f"  wrong matches       {result['wrong_match']}")
+    for name in ("fingerprint_ms", "lookup_ms"):
+        values = result[name]
+        print(f"  {name:<20}" + "  ".join(f"{p}={v:.2f}" for p, v in values.items() if v is not None))
+    print(f"  {'kind':<12}{'queries':>9}{'matched':>9}{'correct':>9}{'skipped':>9}{'jaccard':>9}")
+    for kind, entry in result["by_kind"].items():
+        jaccard = entry["median_jaccard"]
+        print(
+            f"  {kind:<12}{entry['queries']:>9}{entry['matched']:>9}{entry['correct']:>9}{entry['skipped']:>9}"
+            f"{(f'{jaccard:.2f}' if jaccard is not None else '-'):>9}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default=os.environ.get("REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--originals", type=int, default=1000, help="articles to index")
+    parser.add_argument("--queries", type=int, default=1000, help="lookups, spread evenly over the query kinds")
+    parser.add_argument("--threshold", type=float, default=0.8, help="NEAR_DUP_THRESHOLD to test")
+    parser.add_argument("--edit-rate", type=float, default=0.02, help="share of words changed in edited copies")
+    parser.add_argument("--jaccard-samples", type=int, default=50, help="queries per kind to compute exact Jaccard for")
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["REDIS_URL"] = args.redis_url
+    for name in BENCH_ENV:
+        os.environ.setdefault(name, "bench")
+
+    result = asyncio.run(run(args))
+    report(result)
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"args": vars(args), "results": result}, file, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+"""
+Notion export benchmark: exports a generated history of summaries to a local stand-in of the
+Notion API (bench/standins.py, same ~3 requests/s per-integration limit) and reports throughput,
+requests and 429s for:
+
+- coalesced: NotionExporter, summaries packed into as few block appends as the limits allow
+- per-page: one page per summary, i.e. one request per summary (the baseline)
+
+With --interrupt-after the coalesced export is cancelled after that many appends and resumed,
+and --uncertain-rate makes the stand-in fail writes after applying them. Either way the export
+page is checked for missing and duplicated summaries.
+
+Needs a Redis for the token buckets (keys are per-run workspaces). If --redis-url isn't reachable
+it falls back to an in-process fakeredis when `fakeredis` and `lupa` are installed, otherwise it
+exits. Run from apps/api:
+
+    python -m bench.notion_export --redis-url redis://localhost:6379/15 --summaries 1000
+    python -m bench.notion_export --modes coalesced --interrupt-after 20 --uncertain-rate 0.05
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+
+BENCH_ENV = (
+    "CLERK_SECRET_KEY", "NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY", "NEXT_PUBLIC_SUPABASE_URL",
+    "NEXT_PUBLIC_SUPABASE_ANON_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY", "GROQ_API_KEY",
+    "NOTION_CLIENT_ID", "NOTION_CLIENT_SECRET", "NOTION_REDIRECT_URI",
+)
+
+
+def make_history(count: int, seed: int) -> list:
+    """
+    Rows shaped like ResultStore.history(include_content=True), newest first.
+    """
+    from bench.standins import WORDS
+    rng = random.Random(seed)
+    now = datetime.now(timezone.utc)
+
+    def sentence(low, high):
+        return " ".join(rng.choices(WORDS, k=rng.randint(low, high))).capitalize() + "."
+
+    rows = []
+    for index in range(count):
+        rows.append({
+            "job_id": str(uuid.UUID(int=rng.getrandbits(128))),
+            "created_at": (now - timedelta(minutes=index * 7)).isoformat(),
+            "result": {
+                "original_url": f"https://example.com/article/{index}",
+                "data": {
+                    "title": f"Summary {index}: {sentence(3, 8)}",
+                    "summary": " ".join(sentence(10, 25) for _ in range(rng.randint(2, 4))),
+                    "key_insights": [sentence(8, 18) for _ in range(rng.randint(2, 5))],
+                    "action_items": [sentence(5, 12) for _ in range(rng.randint(1, 3))],
+                    "tags": rng.sample(WORDS, 2),
+                    "priority": rng.choice(["High", "Medium", "Low"]),
+                    "category": rng.choice(["Tech", "Business", "Life"]),
+                    "key_takeaway": sentence(8, 16),
+                },
+            },
+        })
+    return rows
+
+
+def history_source(rows: list):
+    """
+    fetch_page(cursor) over `rows` with ResultStore.history's keyset semantics.
+    """
+    from services.results import decode_cursor, encode_cursor
+
+    async def fetch_page(cursor):
+        from core.config import get_settings
+        limit = get_settings().NOTION_EXPORT_PAGE_SIZE
+        candidates = rows
+        if cursor:
+            created_at, job_id = decode_cursor(cursor)
+            candidates = [
+                row for row in rows
+                if datetime.fromisoformat(row["created_at"]) < datetime.fromisoformat(created_at)
+                or (row["created_at"] == created_at and row["job_id"] < job_id)
+            ]
+        page = candidates[:limit + 1]
+        items = page[:limit]
+        return items, encode_cursor(items[-1]) if len(page) > limit else None
+    return fetch_page
+
+
+def check_export(app, page_id: str, rows: list) -> dict:
+    from services.notion import plain_text
+    titles = [plain_text(block) for block in app.state.children.get(page_id, []) if block["type"] == "heading_2"]
+    expected = [row["result"]["data"]["title"] for row in rows]
+    return {
+        "summaries_in_notion": len(titles),
+        "missing": len(set(expected) - set(titles)),
+        "duplicated": len(titles) - len(set(titles)),
+        "in_order": titles == expected,
+    }
+
+
+async def run_coalesced(args, redis, app, base_url: str, rows: list) -> dict:
+    from services.notion import NotionClient
+    from services.notion_export import NotionExportStore, NotionExporter
+
+    notion = NotionClient(redis, base_url=base_url)
+    target = str(uuid.uuid4())
+    app.state.pages[target] = {"object": "page", "id": target, "properties": {"title": {"title": []}}}
+    connection = {"access_token": f"secret_{uuid.uuid4().hex}", "workspace_id": f"bench-{uuid.uuid4().hex[:8]}", "target_page_id": target}
+    export_id = str(uuid.uuid4())
+    await NotionExportStore.create(redis, export_id, "bench-user")
+    fetch_page = history_source(rows)
+
+    started = time.perf_counter()
+    resumes = 0
+    if args.interrupt_after:
+        task = asyncio.create_task(NotionExporter.run(notion, redis, export_id, connection, fetch_page))
+        while app.state.stats["appends"] < args.interrupt_after and not task.done():
+            await asyncio.sleep(0.01)
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            resumes = 1
+    result = await NotionExporter.run(notion, redis, export_id, connection, fetch_page)
+    elapsed = time.perf_counter() - started
+    await notion.close()
+    await redis.delete(f"notion-export:{export_id}", "notion-export:active:bench-user")
+    return {"elapsed": elapsed, "resumes": resumes, **result, **check_export(app, result["page_id"], rows)}
+
+
+async def run_per_page(args, redis, app, base_url: str, rows: list) -> dict:
+    from services.notion import NotionClient, NotionService, summary_blocks
+
+    notion = NotionClient(redis, base_url=base_url)
+    target = str(uuid.uuid4())
+    app.state.pages[target] = {"object": "page", "id": target, "properties": {"title": {"title": []}}}
+    connection = {"access_token": f"secret_{uuid.uuid4().hex}", "workspace_id": f"bench-{uuid.uuid4().hex[:8]}"}
+    started = time.perf_counter()
+    # Concurrent like a naive sync would be; the shared bucket still spaces the requests
+    semaphore = asyncio.Semaphore(8)
+
+    async def one(row):
+        async with semaphore:
+            await NotionService.create_page(
+                notion, connection, target, row["result"]["data"]["title"], summary_blocks(row["result"])[1:]
+            )
+    await asyncio.gather(*(one(row) for row in rows))
+    elapsed = time.perf_counter() - started
+    await notion.close()
+    return {"elapsed": elapsed, "exported": len(rows), "requests": len(rows)}
+
+
+async def run(args, app, base_url: str) -> dict:
+    from core.redis import get_redis
+
+    redis = get_redis()
+    try:
+        await redis.ping()
+    except Exception as e:
+        try:
+            import fakeredis
+        except ImportError:
+            raise SystemExit(f"Redis at {args.redis_url} is unreachable ({e}); start one or pip install fakeredis lupa")
+        print(f"Redis at {args.redis_url} is unreachable ({e}); using an in-process fakeredis")
+        redis = fakeredis.FakeAsyncRedis()
+    rows = make_history(args.summaries, args.seed)
+    results = {}
+    for mode in args.modes:
+        before = dict(app.state.stats)
+        runner = run_coalesced if mode == "coalesced" else run_per_page
+        result = await runner(args, redis, app, base_url, rows)
+        result["http_requests"] = app.state.stats["requests"] - before["requests"]
+        result["rate_limited"] = app.state.stats["rate_limited"] - before["rate_limited"]
+        result["uncertain"] = app.state.stats["uncertain"] - before["uncertain"]
+        result["summaries_per_second"] = result["exported"] / result["elapsed"]
+        results[mode] = result
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default=os.environ.get("REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--summaries", type=int, default=1000)
+    parser.add_argument("--modes", type=lambda v: v.split(","), default=["coalesced", "per-page"])
+    parser.add_argument("--latency", type=float, default=0.15, help="median stand-in response time (s)")
+    parser.add_argument("--rate", type=float, default=3.0, help="stand-in requests/s per integration")
+    parser.add_argument("--interrupt-after", type=int, default=0, help="cancel the coalesced export after N appends, then resume")
+    parser.add_argument("--uncertain-rate", type=float, default=0.0, help="share of writes that fail after being applied")
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["REDIS_URL"] = args.redis_url
+    for name in BENCH_ENV:
+        os.environ.setdefault(name, "bench")
+    from core.config import get_settings
+    from bench.standins import StandIn, fake_notion
+
+    settings = get_settings()
+    settings.NOTION_REQUESTS_PER_SECOND = args.rate
+    app = fake_notion(latency=args.latency, rate=args.rate, uncertain_rate=args.uncertain_rate, seed=args.seed)
+    with StandIn(app) as notion_api:
+        results = asyncio.run(run(args, app, notion_api.url + "/v1"))
+
+    print(f"\n{args.summaries} summaries, stand-in at {args.rate} requests/s, {args.latency * 1000:.0f} ms median latency")
+    for mode, result in results.items():
+        print(
+            f"  {mode:<10} {result['elapsed']:>7.1f}s  {result['summaries_per_second']:>6.1f} summaries/s"
+            f"  {result['requests']:>5} API calls  {result['http_requests']:>5} HTTP requests"
+            f"  {result['rate_limited']:>4} x 429  {result['uncertain']:>3} uncertain"
+        )
+        if "missing" in result:
+            print(
+                f"  {'':<10} in Notion: {result['summaries_in_notion']}, missing {result['missing']},"
+                f" duplicated {result['duplicated']}, in order: {result['in_order']}, resumes: {result['resumes']}"
+            )
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"args": vars(args), "results": results}, file, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
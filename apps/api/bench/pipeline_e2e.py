@@ -0,0 +1,387 @@
+"""
+End-to-end pipeline benchmark, fully offline.
+
+Runs real pipeline code (fetcher, extraction pool, router, rate limiter, LLM client, Redis caches)
+against the local stand-ins in bench/standins.py and a local Redis, at several concurrency levels:
+
+- task: calls process_url_task directly, like an arq worker would
+- api:  POST /process then polls GET /status/{job_id}, with an in-process arq worker
+
+Reports jobs/sec, p50/p95/p99 per stage and peak RSS (this process plus its extraction workers).
+Needs a Redis you don't mind writing to (keys are unique per run; nothing is flushed). Run from apps/api:
+
+    python -m bench.pipeline_e2e --redis-url redis://localhost:6379/15 --jobs 200 --concurrency 1,8,32
+    python -m bench.pipeline_e2e --mode api --llm-latency 0.5 --json results.json
+    python -m bench.pipeline_e2e --playwright --js-share 0.2   # needs `playwright install chromium`
+    python -m bench.pipeline_e2e --audio-jobs 4                 # Whisper tier; needs ffmpeg
+"""
+import argparse
+import asyncio
+import json
+import os
+import resource
+import subprocess
+import tempfile
+import time
+import uuid
+
+# Required settings that the benchmark never uses for real; lets it run without a .env
+BENCH_ENV = (
+    "CLERK_SECRET_KEY", "NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY", "NEXT_PUBLIC_SUPABASE_URL",
+    "NEXT_PUBLIC_SUPABASE_ANON_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY", "GROQ_API_KEY",
+    "NOTION_CLIENT_ID", "NOTION_CLIENT_SECRET", "NOTION_REDIRECT_URI",
+)
+
+
+def percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def rss_mb() -> float:
+    """
+    Resident memory of this process plus its direct children (the extraction pool), in MB.
+    """
+    def vm_rss(pid) -> int:
+        try:
+            with open(f"/proc/{pid}/status") as file:
+                for line in file:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    if not os.path.exists("/proc/self/status"):
+        # Not Linux: lifetime peak of this process only (bytes on macOS)
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 1024 / 1024 if peak > 1 << 24 else peak / 1024
+    total = vm_rss("self")
+    for task in os.listdir("/proc/self/task"):
+        try:
+            with open(f"/proc/self/task/{task}/children") as file:
+                total += sum(vm_rss(pid) for pid in file.read().split())
+        except OSError:
+            pass
+    return total / 1024
+
+
+class RssSampler:
+    def __init__(self, interval: float = 0.1):
+        self.interval = interval
+        self.peak = 0.0
+        self._task = None
+
+    async def _run(self):
+        while True:
+            self.peak = max(self.peak, rss_mb())
+            await asyncio.sleep(self.interval)
+
+    def __enter__(self):
+        self.peak = rss_mb()
+        self._task = asyncio.create_task(self._run())
+        return self
+
+    def __exit__(self, *exc):
+        self._task.cancel()
+        self.peak = max(self.peak, rss_mb())
+
+
+class UsageRecorder:
+    """
+    Stands in for the worker's UsageLogBuffer and keeps each job's stage durations.
+    """
+
+    def __init__(self):
+        self.records = {}
+
+    def add(self, user_id: str, url: str, **fields):
+        self.records[fields.get("job_id")] = fields
+
+
+async def run_task_level(ctx, urls: list, concurrency: int, recorder: UsageRecorder):
+    from pipeline import process_url_task
+
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {}
+
+    async def one(url: str):
+        job_id = str(uuid.uuid4())
+        async with semaphore:
+            try:
+                result = await process_url_task(ctx, job_id, url, "bench-user")
+                outcomes[job_id] = "error" if "error" in result["data"] else "ok"
+            except Exception:
+                outcomes[job_id] = "failed"
+
+    await asyncio.gather(*(one(url) for url in urls))
+    return outcomes, {}
+
+
+async def run_api_level(client, urls: list, concurrency: int, recorder: UsageRecorder, poll_interval: float):
+    semaphore = asyncio.Semaphore(concurrency)
+    outcomes = {}
+    e2e = {}
+
+    async def one(url: str):
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.post("/process", json={"url": url})
+            response.raise_for_status()
+            job_id = response.json()["job_id"]
+            while True:
+                status = (await client.get(f"/status/{job_id}")).json()
+                if status["status"] == "completed":
+                    outcomes[job_id] = "error" if "error" in (status["result"] or {}).get("data", {}) else "ok"
+                    break
+                if status["status"] == "failed":
+                    outcomes[job_id] = "failed"
+                    break
+                await asyncio.sleep(poll_interval)
+            e2e[job_id] = (time.perf_counter() - started) * 1000
+
+    await asyncio.gather(*(one(url) for url in urls))
+    return outcomes, {"e2e": list(e2e.values())}
+
+
+def summarize_level(mode: str, concurrency: int, elapsed: float, outcomes: dict, recorder: UsageRecorder,
+                    extra_stages: dict, peak_rss: float) -> dict:
+    stages = {"extract": [], "summarize": [], "total": []}
+    methods = {}
+    for job_id in outcomes:
+        record = recorder.records.get(job_id) or {}
+        for stage, value in (record.get("stage_durations_ms") or {}).items():
+            stages.setdefault(stage, []).append(value)
+        method = record.get("extraction_method") or "none"
+        methods[method] = methods.get(method, 0) + 1
+    stages.update(extra_stages)
+    counts = {outcome: list(outcomes.values()).count(outcome) for outcome in ("ok", "error", "failed")}
+    return {
+        "mode": mode,
+        "concurrency": concurrency,
+        "jobs": len(outcomes),
+        **counts,
+        "seconds": round(elapsed, 3),
+        "jobs_per_sec": round(len(outcomes) / elapsed, 2) if elapsed else None,
+        "peak_rss_mb": round(peak_rss, 1),
+        "extraction_methods": methods,
+        "stages_ms": {
+            stage: {f"p{pct}": percentile(values, pct) for pct in (50, 95, 99)}
+            for stage, values in stages.items() if values
+        },
+    }
+
+
+def print_level(result: dict):
+    print(
+        f"\n[{result['mode']}] concurrency={result['concurrency']}: {result['jobs']} jobs "
+        f"({result['ok']} ok, {result['error']} llm errors, {result['failed']} failed) in {result['seconds']}s "
+        f"-> {result['jobs_per_sec']} jobs/s, peak RSS {result['peak_rss_mb']} MB"
+    )
+    print(f"  tiers: {', '.join(f'{k}={v}' for k, v in sorted(result['extraction_methods'].items()))}")
+    print(f"  {'stage (ms)':<12}{'p50':>10}{'p95':>10}{'p99':>10}")
+    for stage, values in result["stages_ms"].items():
+        print(f"  {stage:<12}" + "".join(f"{(values[p] if values[p] is not None else 0):>10.0f}" for p in ("p50", "p95", "p99")))
+
+
+def make_audio(path: str, seconds: int):
+    # Speech-like bursts: 8 s of tone, 2 s of silence, so the silence splitter has cut points
+    subprocess.run([
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-f", "lavfi",
+        "-i", f"aevalsrc='0.5*sin(440*2*PI*t)*lt(mod(t,10),8)':d={seconds}:s=16000", path
+    ], check=True)
+
+
+async def run_audio(jobs: int, concurrency: int, seconds: int):
+    from services.audio import AudioService
+
+    service = AudioService()
+    timings = []
+    semaphore = asyncio.Semaphore(concurrency)
+    with tempfile.TemporaryDirectory() as root:
+        source = os.path.join(root, "source.wav")
+        make_audio(source, seconds)
+
+        async def one(index: int):
+            async with semaphore:
+                with tempfile.TemporaryDirectory(dir=root) as work_dir:
+                    started = time.perf_counter()
+                    await service.transcribe(source, work_dir=work_dir)
+                    timings.append((time.perf_counter() - started) * 1000)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(jobs)))
+        elapsed = time.perf_counter() - started
+    print(
+        f"\n[audio] concurrency={concurrency}: {jobs} x {seconds}s files in {elapsed:.2f}s; "
+        + ", ".join(f"p{p}={percentile(timings, p):.0f}ms" for p in (50, 95, 99))
+    )
+    return {"mode": "audio", "concurrency": concurrency, "jobs": jobs, "seconds": round(elapsed, 3),
+            "stages_ms": {"transcribe": {f"p{p}": percentile(timings, p) for p in (50, 95, 99)}}}
+
+
+async def run(args, site_url: str, paths: list):
+    from core.redis import get_redis
+    from services.browser import BrowserPool
+    from services.extractor import ExtractionPool
+    from services.http import HttpFetcher
+
+    redis = get_redis()
+    await redis.ping()
+    ctx = {"redis": redis}
+    ctx["extract_pool"] = ExtractionPool()
+    await ctx["extract_pool"].start()
+    ctx["http_fetcher"] = HttpFetcher(redis=redis)
+    if args.playwright:
+        ctx["browser_pool"] = BrowserPool()
+        await ctx["browser_pool"].start()
+
+    results = []
+    run_id = uuid.uuid4().hex[:8]
+    try:
+        # One unmeasured job first, so lazily imported tiers (litellm, ...) don't land in the first level
+        from pipeline import process_url_task
+        ctx["usage_log"] = UsageRecorder()
+        await process_url_task(ctx, str(uuid.uuid4()), f"{site_url}{paths[0]}?bench={run_id}-warm-up", "bench-user")
+
+        for concurrency in args.concurrency:
+            # Unique URLs per level so the page, result and chunk caches never short-circuit a job
+            urls = [
+                f"{site_url}{paths[i % len(paths)]}?bench={run_id}-{concurrency}-{i}"
+                for i in range(args.jobs)
+            ]
+            recorder = UsageRecorder()
+            ctx["usage_log"] = recorder
+            with RssSampler() as sampler:
+                started = time.perf_counter()
+                if args.mode == "task":
+                    outcomes, extra = await run_task_level(ctx, urls, concurrency, recorder)
+                else:
+                    outcomes, extra = await run_api_level_with_worker(args, ctx, urls, concurrency, recorder)
+                elapsed = time.perf_counter() - started
+            result = summarize_level(args.mode, concurrency, elapsed, outcomes, recorder, extra, sampler.peak)
+            print_level(result)
+            results.append(result)
+
+        if args.audio_jobs:
+            for concurrency in args.concurrency:
+                results.append(await run_audio(args.audio_jobs, concurrency, args.audio_seconds))
+    finally:
+        await ctx["http_fetcher"].close()
+        await ctx["extract_pool"].stop()
+        if ctx.get("browser_pool"):
+            await ctx["browser_pool"].stop()
+    return results
+
+
+async def run_api_level_with_worker(args, ctx, urls, concurrency, recorder):
+    import httpx
+    import main
+    import pipeline
+    from arq import create_pool
+    from arq.connections import RedisSettings
+    from arq.worker import Worker, func
+    from core.auth import UserProfile, check_usage_quota
+    from core.config import get_settings
+    from core.rate_limit import enforce_rate_limit
+
+    settings = get_settings()
+    pool = await create_pool(RedisSettings.from_dsn(settings.REDIS_URL))
+    # PRO profile: no quota or rate limiting, those aren't what's being measured
+    main.app.dependency_overrides[check_usage_quota] = lambda: UserProfile("bench-user", "PRO", 10 ** 9)
+    main.app.dependency_overrides[enforce_rate_limit] = lambda: None
+    main.redis_pool = pool
+
+    worker_ctx = {key: value for key, value in ctx.items() if key != "redis"}
+    worker = Worker(
+        functions=[func(pipeline.process_url_task, name="process_url_task")],
+        redis_pool=pool,
+        ctx=worker_ctx,
+        max_jobs=settings.WORKER_MAX_JOBS,
+        poll_delay=0.05,
+        handle_signals=False,
+    )
+    worker_task = asyncio.create_task(worker.async_run())
+    try:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            level_task = asyncio.create_task(run_api_level(client, urls, concurrency, recorder, args.poll_interval))
+            await asyncio.wait([level_task, worker_task], return_when=asyncio.FIRST_COMPLETED)
+            if not level_task.done():
+                # The worker died; don't leave the clients polling forever
+                level_task.cancel()
+                worker_task.result()
+                raise RuntimeError("arq worker stopped unexpectedly")
+            return level_task.result()
+    finally:
+        await worker.close()
+        worker_task.cancel()
+        main.app.dependency_overrides.clear()
+        await pool.aclose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["task", "api"], default="task")
+    parser.add_argument("--jobs", type=int, default=100, help="jobs per concurrency level")
+    parser.add_argument("--concurrency", type=lambda v: [int(x) for x in v.split(",")], default=[1, 8, 32])
+    parser.add_argument("--redis-url", default=os.environ.get("REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--pages", type=int, default=200, help="size of the generated fixture corpus")
+    parser.add_argument("--corpus-dir", default=None, help="directory of saved real-world *.html pages to serve")
+    parser.add_argument("--js-share", type=float, default=0.1, help="share of JS-only pages (only with --playwright)")
+    parser.add_argument("--playwright", action="store_true", help="start the browser pool for JS-only pages")
+    parser.add_argument("--site-latency", type=float, default=0.05, help="median seconds per fixture page")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="median seconds per LLM call")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="share of LLM calls answered with 429")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=0.0, help="simulated prefill speed; 0 disables")
+    parser.add_argument("--whisper-latency", type=float, default=2.0, help="median seconds per transcription chunk")
+    parser.add_argument("--audio-jobs", type=int, default=0, help="also benchmark the Whisper tier with N files")
+    parser.add_argument("--audio-seconds", type=int, default=900, help="length of each generated audio file")
+    parser.add_argument("--poll-interval", type=float, default=0.1, help="/status polling interval in api mode")
+    parser.add_argument("--json", default=None, help="write results to this file")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["REDIS_URL"] = args.redis_url
+    os.environ.setdefault("LITELLM_LOCAL_MODEL_COST_MAP", "True") # no network fetch of the price list
+    for name in BENCH_ENV:
+        os.environ.setdefault(name, "bench")
+
+    from bench.standins import StandIn, fake_llm, fake_whisper, fixture_site, make_corpus
+    from core.config import get_settings
+
+    js_share = args.js_share if args.playwright else 0.0
+    corpus = make_corpus(args.pages, js_share, args.seed, args.corpus_dir)
+    with StandIn(fixture_site(corpus, args.site_latency, args.seed)) as site, \
+            StandIn(fake_llm(args.llm_latency, args.llm_error_rate, args.llm_tokens_per_second, args.seed)) as llm, \
+            StandIn(fake_whisper(args.whisper_latency, args.seed)) as whisper:
+        # Point the pipeline at the stand-ins. The shared settings object is read at call time,
+        # so overriding it here reaches every service
+        settings = get_settings()
+        settings.LLM_MODELS = [{
+            "model": "openai/bench-llm",
+            "api_base": f"{llm.url}/v1",
+            "api_key_setting": "OPENAI_API_KEY",
+            "input_cost_per_1k": 0.00015,
+            "output_cost_per_1k": 0.0006,
+            "max_input_tokens": 128000,
+        }]
+        # The stand-in has no provider limits; keep the limiter from becoming the bottleneck
+        settings.LLM_RATE_LIMITS = {"default": {"concurrency": 10000, "rpm": 10 ** 7, "tpm": 10 ** 10}}
+        settings.GROQ_BASE_URL = whisper.url
+        settings.PROXY_SERVER_URL = ""
+        settings.FIRECRAWL_API_KEY = ""
+
+        print(f"Corpus: {len(corpus)} pages at {site.url}; LLM at {llm.url}; Whisper at {whisper.url}; Redis {args.redis_url}")
+        results = asyncio.run(run(args, site.url, sorted(corpus)))
+
+    if args.json:
+        with open(args.json, "w") as file:
+            json.dump({"args": {k: v for k, v in vars(args).items()}, "results": results}, file, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Token-budget reducer benchmark: time per MB and estimated tokens saved on extracted-page text
+(boilerplate lines, repeated paragraphs) and caption transcripts (one short caption per line,
+filler tags, rolling repeats), from typical sizes up to megabyte inputs. Run from apps/api:
+
+    python -m bench.reducer
+    python -m bench.reducer --sizes 20,200,2000 --budget 24000 --repeat 5
+"""
+import argparse
+import os
+import random
+import time
+
+BENCH_ENV = (
+    "REDIS_URL", "CLERK_SECRET_KEY", "NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY", "NEXT_PUBLIC_SUPABASE_URL",
+    "NEXT_PUBLIC_SUPABASE_ANON_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY", "GROQ_API_KEY",
+    "NOTION_CLIENT_ID", "NOTION_CLIENT_SECRET", "NOTION_REDIRECT_URI",
+)
+CHROME = ["Advertisement", "Share this article", "Subscribe to our newsletter", "Read more", "© 2024 Example Media"]
+
+
+def page_text(rng: random.Random, paragraphs: int) -> str:
+    from bench.standins import _paragraphs
+    body = _paragraphs(rng, paragraphs)
+    lines = []
+    for index, paragraph in enumerate(body):
+        lines.append(paragraph)
+        if index % 8 == 0:
+            lines += rng.sample(CHROME, 2)
+        if index % 40 == 39:
+            lines.append(body[rng.randrange(index)])
+    return "\n".join(lines)
+
+
+def caption_text(rng: random.Random, paragraphs: int) -> str:
+    from bench.standins import _paragraphs
+    words = " ".join(_paragraphs(rng, paragraphs)).lower().replace(".", "").split()
+    captions = []
+    for index in range(0, len(words), 7):
+        caption = " ".join(words[index:index + 7])
+        captions.append(caption)
+        if rng.random() < 0.1:
+            captions.append(caption) # rolling auto-captions repeat lines
+        if rng.random() < 0.05:
+            captions.append(rng.choice(["[Music]", "[Applause]", "um", "uh so"]))
+    return "\n".join(captions)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=lambda v: [int(x) for x in v.split(",")], default=[20, 200, 2000],
+                        help="paragraphs per input (2000 is about 1 MB)")
+    parser.add_argument("--budget", type=int, default=None, help="token budget; default REDUCER_TOKEN_BUDGET")
+    parser.add_argument("--repeat", type=int, default=5, help="runs per input; the fastest is reported")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    for name in BENCH_ENV:
+        os.environ.setdefault(name, "bench")
+    from services.reducer import reduce_text
+
+    rng = random.Random(args.seed)
+    print(f"{'input':<12}{'KB':>8}{'ms':>8}{'ms/MB':>8}{'tokens in':>11}{'tokens out':>12}{'saved':>8}  ranked")
+    for paragraphs in args.sizes:
+        for kind, text, transcript in (
+            ("page", page_text(rng, paragraphs), False),
+            ("transcript", caption_text(rng, paragraphs), True),
+        ):
+            best = None
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                _, stats = reduce_text(text, transcript=transcript, token_budget=args.budget)
+                elapsed = time.perf_counter() - started
+                best = elapsed if best is None else min(best, elapsed)
+            size_mb = len(text.encode("utf-8")) / 1e6
+            print(
+                f"{kind:<12}{size_mb * 1000:>8.0f}{best * 1000:>8.1f}{best * 1000 / size_mb:>8.0f}"
+                f"{stats['tokens_before']:>11}{stats['tokens_after']:>12}"
+                f"{stats['tokens_saved'] / max(1, stats['tokens_before']):>8.0%}  {stats['ranked']}"
+            )
+
+
+if __name__ == "__main__":
+    main()
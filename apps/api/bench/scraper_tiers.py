@@ -0,0 +1,140 @@
+"""
+Scraper tier selection benchmark: time-to-content with and without per-domain tier profiles and
+hedging (services/scraper_profiles.py, ScraperService.extract_content).
+
+Tiers are simulated with configurable latencies so this measures the scheduling, not the network:
+
+- easy domains: L1 (trafilatura) works
+- hard domains: L1 runs to its timeout and comes back empty (JS-only pages); L2 (Playwright) works
+- tail domains: L1 works but occasionally stalls
+
+Needs a Redis you don't mind writing to; domains are namespaced per run and their keys deleted
+afterwards. Run from apps/api:
+
+    python -m bench.scraper_tiers --redis-url redis://localhost:6379/15
+    python -m bench.scraper_tiers --l1-timeout 15 --l2 4 --stall-rate 0.05 --jobs 200
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+import uuid
+
+BENCH_ENV = (
+    "CLERK_SECRET_KEY", "NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY", "NEXT_PUBLIC_SUPABASE_URL",
+    "NEXT_PUBLIC_SUPABASE_ANON_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY", "GROQ_API_KEY",
+    "NOTION_CLIENT_ID", "NOTION_CLIENT_SECRET", "NOTION_REDIRECT_URI",
+)
+
+
+def percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def simulated_tiers(args, rng: random.Random):
+    """
+    Returns stand-ins for ScraperService._trafilatura/_playwright/_firecrawl; the domain's kind is
+    the first label of its host. Latencies are scaled down by --speedup so a run takes seconds.
+    """
+    def jitter(seconds):
+        return seconds * rng.uniform(0.8, 1.2) / args.speedup
+
+    async def trafilatura(url, **kwargs):
+        kind = url.split("//")[1].split("-")[0]
+        if kind == "hard":
+            await asyncio.sleep(args.l1_timeout / args.speedup)
+            return None
+        stalled = kind == "tail" and rng.random() < args.stall_rate
+        await asyncio.sleep(jitter(args.l1_timeout if stalled else args.l1))
+        return "text"
+
+    async def playwright(url, **kwargs):
+        await asyncio.sleep(jitter(args.l2))
+        return "text"
+
+    async def firecrawl(url, **kwargs):
+        await asyncio.sleep(jitter(args.l3))
+        return "text"
+    return {"trafilatura": trafilatura, "playwright": playwright, "firecrawl": firecrawl}
+
+
+async def run_mode(args, redis, mode: str, namespace: str) -> dict:
+    from core.config import get_settings
+    from services.scraper import ScraperService
+
+    settings = get_settings()
+    settings.SCRAPER_HEDGE_ENABLED = mode == "profiles+hedging"
+    settings.SCRAPER_HEDGE_MIN_SECONDS = 0.0
+    rng = random.Random(args.seed)
+    for name, function in simulated_tiers(args, rng).items():
+        setattr(ScraperService, f"_{name}", staticmethod(function))
+
+    timings = {"easy": [], "hard": [], "tail": []}
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one(index: int):
+        kind = ("easy", "hard", "tail")[index % 3]
+        url = f"https://{kind}-{index % args.domains}.{namespace}-{mode.replace('+', '-')}.example/{index}"
+        async with semaphore:
+            started = time.perf_counter()
+            # The baseline runs without a profile store, i.e. the fixed L1 > L2 > L3 order
+            await ScraperService.extract_content(url, redis=redis if mode != "baseline" else None)
+            timings[kind].append((time.perf_counter() - started) * args.speedup)
+
+    await asyncio.gather(*(one(index) for index in range(args.jobs)))
+    return {
+        kind: {f"p{p}": percentile(values, p) for p in (50, 90, 99)}
+        for kind, values in timings.items()
+    }
+
+
+async def run(args) -> dict:
+    from core.redis import get_redis
+
+    redis = get_redis()
+    namespace = f"bench{uuid.uuid4().hex[:8]}"
+    results = {}
+    for mode in ("baseline", "profiles", "profiles+hedging"):
+        results[mode] = await run_mode(args, redis, mode, namespace)
+
+    batch = []
+    async for key in redis.scan_iter(match=f"scraper-profile:*{namespace}*", count=1000):
+        batch.append(key)
+    if batch:
+        await redis.delete(*batch)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--redis-url", default=os.environ.get("REDIS_URL", "redis://localhost:6379/15"))
+    parser.add_argument("--jobs", type=int, default=600, help="extractions, spread evenly over easy/hard/tail domains")
+    parser.add_argument("--domains", type=int, default=4, help="distinct domains per kind")
+    parser.add_argument("--concurrency", type=int, default=5, help="extractions in flight (profiles warm up as jobs finish)")
+    parser.add_argument("--l1", type=float, default=1.0, help="trafilatura latency when it works (s)")
+    parser.add_argument("--l1-timeout", type=float, default=15.0, help="trafilatura latency when it fails or stalls (s)")
+    parser.add_argument("--l2", type=float, default=4.0, help="Playwright latency (s)")
+    parser.add_argument("--l3", type=float, default=6.0, help="Firecrawl latency (s)")
+    parser.add_argument("--stall-rate", type=float, default=0.05, help="share of L1 runs on tail domains that stall")
+    parser.add_argument("--speedup", type=float, default=50.0, help="divide simulated latencies by this")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    os.environ["REDIS_URL"] = args.redis_url
+    for name in BENCH_ENV:
+        os.environ.setdefault(name, "bench")
+
+    results = asyncio.run(run(args))
+    print(f"\nTime to content (simulated seconds), {args.jobs} jobs over {args.domains} domains per kind")
+    print(f"  {'mode':<20}{'kind':<6}{'p50':>8}{'p90':>8}{'p99':>8}")
+    for mode, kinds in results.items():
+        for kind, values in kinds.items():
+            print(f"  {mode:<20}{kind:<6}" + "".join(f"{values[p]:>8.1f}" for p in ("p50", "p90", "p99")))
+
+
+if __name__ == "__main__":
+    main()
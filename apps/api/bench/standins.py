@@ -0,0 +1,313 @@
+"""
+Local stand-ins for the services the pipeline talks to, so benchmarks run with no network:
+
+- a fixture site serving a corpus of article pages (plus JS-only pages for the Playwright tier)
+- an OpenAI-compatible chat completions server
+- a Groq-compatible Whisper transcription endpoint
+- a Notion API (pages, block children, search, OAuth) with its per-integration rate limit
+
+Each runs in its own thread and event loop so it doesn't compete with the code being measured.
+"""
+import asyncio
+import json
+import os
+import random
+import socket
+import threading
+import time
+import uuid
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import HTMLResponse, JSONResponse, PlainTextResponse
+
+WORDS = (
+    "system latency cache queue worker browser scraper summary model token budget request"
+    " throughput database index partition replica failover retry backoff cost pipeline vendor"
+    " market revenue customer product launch strategy growth team hiring roadmap quarter"
+).split()
+
+NAV = "".join(f'<li><a href="/section/{i}">Section {i}</a></li>' for i in range(25))
+FOOTER = "<footer><p>© Example Media. All rights reserved.</p><p>Privacy · Terms · Cookies · Contact</p></footer>"
+
+
+def _paragraphs(rng: random.Random, count: int) -> list:
+    paragraphs = []
+    for _ in range(count):
+        sentences = []
+        for _ in range(rng.randint(3, 7)):
+            words = rng.choices(WORDS, k=rng.randint(8, 22))
+            sentences.append(" ".join(words).capitalize() + ".")
+        paragraphs.append(" ".join(sentences))
+    return paragraphs
+
+
+def article_page(rng: random.Random, index: int, paragraphs: int) -> str:
+    body = "".join(f"<p>{p}</p>" for p in _paragraphs(rng, paragraphs))
+    return f"""<!DOCTYPE html><html lang="en"><head><meta charset="utf-8">
+<title>Fixture article {index}</title><link rel="stylesheet" href="/static/site.css">
+<script>window.analytics = {{ track: function() {{}} }};</script></head>
+<body><header><nav><ul>{NAV}</ul></nav></header>
+<main><article><h1>Fixture article {index}</h1><p class="byline">By Bench Writer</p>{body}</article>
+<aside><h3>Related</h3><ul>{NAV}</ul></aside></main>{FOOTER}</body></html>"""
+
+
+def js_only_page(rng: random.Random, index: int, paragraphs: int) -> str:
+    # Nothing useful in the static HTML; the article only exists after the script runs
+    content = json.dumps([f"<p>{p}</p>" for p in _paragraphs(rng, paragraphs)])
+    return f"""<!DOCTYPE html><html lang="en"><head><meta charset="utf-8"><title>App {index}</title></head>
+<body><div id="root">Loading…</div><script>
+document.getElementById("root").innerHTML = "<article><h1>Client-rendered article {index}</h1>" + {content}.join("") + "</article>";
+</script></body></html>"""
+
+
+def make_corpus(pages: int, js_share: float = 0.0, seed: int = 7, corpus_dir: str = None) -> dict:
+    """
+    Returns {path: html}. Saved real-world pages in `corpus_dir` (*.html) are served as-is;
+    the rest are generated with a realistic spread of article lengths.
+    """
+    rng = random.Random(seed)
+    corpus = {}
+    if corpus_dir:
+        for name in sorted(os.listdir(corpus_dir)):
+            if name.endswith(".html"):
+                with open(os.path.join(corpus_dir, name), encoding="utf-8", errors="replace") as file:
+                    corpus[f"/saved/{name}"] = file.read()
+    for index in range(max(0, pages - len(corpus))):
+        # Mostly short/medium posts with a long tail of long reads
+        paragraphs = min(200, max(3, int(rng.lognormvariate(2.5, 0.8))))
+        if rng.random() < js_share:
+            corpus[f"/app/{index}"] = js_only_page(rng, index, paragraphs)
+        else:
+            corpus[f"/article/{index}"] = article_page(rng, index, paragraphs)
+    return corpus
+
+
+def _delay(rng: random.Random, median: float) -> float:
+    return rng.lognormvariate(0, 0.5) * median if median > 0 else 0
+
+
+def fixture_site(corpus: dict, latency: float = 0.0, seed: int = 7) -> FastAPI:
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    @app.get("/{path:path}")
+    async def page(path: str):
+        await asyncio.sleep(_delay(rng, latency))
+        html = corpus.get("/" + path)
+        if html is None:
+            return PlainTextResponse("not found", status_code=404)
+        return HTMLResponse(html)
+
+    return app
+
+
+def fake_llm(latency: float = 1.0, error_rate: float = 0.0, tokens_per_second: float = 0.0, seed: int = 7) -> FastAPI:
+    """
+    OpenAI-compatible /v1/chat/completions. Replies with a valid summary JSON after a lognormal
+    delay around `latency` seconds, plus prompt_tokens / `tokens_per_second` if set (prefill time).
+    Returns 429 for roughly `error_rate` of requests.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    @app.post("/v1/chat/completions")
+    @app.post("/chat/completions")
+    async def completions(request: Request):
+        body = await request.json()
+        prompt_tokens = sum(len(m.get("content") or "") for m in body.get("messages", [])) // 4
+        if rng.random() < error_rate:
+            return JSONResponse(
+                {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}},
+                status_code=429, headers={"retry-after": "0.2"}
+            )
+        await asyncio.sleep(_delay(rng, latency) + (prompt_tokens / tokens_per_second if tokens_per_second else 0))
+        content = json.dumps({
+            "title": "Bench summary",
+            "summary": "A stand-in summary produced by the benchmark LLM server.",
+            "key_insights": ["Insight 1", "Insight 2", "Insight 3"],
+            "action_items": ["Action 1", "Action 2"],
+            "tags": ["Bench"],
+            "priority": "Low",
+            "category": "Tech",
+            "key_takeaway": "Benchmarks need stand-ins.",
+        })
+        completion_tokens = len(content) // 4
+        return {
+            "id": f"chatcmpl-bench-{time.time_ns()}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "bench"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        }
+
+    return app
+
+
+def fake_whisper(latency: float = 2.0, seed: int = 7) -> FastAPI:
+    """
+    Groq-compatible transcription endpoint (the Groq SDK posts to /openai/v1/audio/transcriptions).
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+
+    @app.post("/openai/v1/audio/transcriptions")
+    async def transcriptions(request: Request):
+        form = await request.form()
+        upload = form.get("file")
+        size = len(await upload.read()) if upload else 0
+        await asyncio.sleep(_delay(rng, latency))
+        return PlainTextResponse(f"Stand-in transcript of {size} bytes of audio. " + " ".join(rng.choices(WORDS, k=200)))
+
+    return app
+
+
+def fake_notion(latency: float = 0.15, rate: float = 3.0, burst: int = 3, uncertain_rate: float = 0.0, seed: int = 7) -> FastAPI:
+    """
+    The parts of the Notion API the exporter uses, in memory. Each token gets a `rate` requests/s
+    bucket like Notion's integration limit; over it, requests get 429 with Retry-After. Writes fail
+    with 502 *after* being applied for roughly `uncertain_rate` of requests, like a gateway timeout
+    in front of a write that went through. `app.state.stats` counts requests and outcomes.
+    """
+    app = FastAPI()
+    rng = random.Random(seed)
+    children = {} # block_id -> [block]
+    pages = {} # page_id -> page
+    buckets = {} # token -> (tokens, last)
+    app.state.stats = {"requests": 0, "rate_limited": 0, "uncertain": 0, "appends": 0, "blocks": 0, "pages": 0}
+    app.state.children = children
+    app.state.pages = pages
+
+    def limited(request: Request):
+        app.state.stats["requests"] += 1
+        token = request.headers.get("authorization", "")
+        now = time.monotonic()
+        tokens, last = buckets.get(token, (burst, now))
+        tokens = min(burst, tokens + (now - last) * rate)
+        if tokens < 1:
+            buckets[token] = (tokens, now)
+            app.state.stats["rate_limited"] += 1
+            return JSONResponse(
+                {"object": "error", "status": 429, "code": "rate_limited", "message": "Rate limited"},
+                status_code=429, headers={"retry-after": f"{(1 - tokens) / rate:.2f}"}
+            )
+        buckets[token] = (tokens - 1, now)
+        return None
+
+    def uncertain():
+        if rng.random() < uncertain_rate:
+            app.state.stats["uncertain"] += 1
+            return JSONResponse({"object": "error", "status": 502, "code": "bad_gateway", "message": "Bad gateway"}, status_code=502)
+        return None
+
+    def stored(block: dict) -> dict:
+        return {**block, "object": "block", "id": str(uuid.uuid4()), "has_children": False}
+
+    @app.post("/v1/oauth/token")
+    async def oauth_token(request: Request):
+        return {
+            "access_token": f"secret_{uuid.uuid4().hex}", "token_type": "bearer", "bot_id": str(uuid.uuid4()),
+            "workspace_id": str(uuid.uuid4()), "workspace_name": "Bench workspace", "duplicated_template_id": None,
+        }
+
+    @app.post("/v1/pages")
+    async def create_page(request: Request):
+        if rejected := limited(request):
+            return rejected
+        body = await request.json()
+        await asyncio.sleep(_delay(rng, latency))
+        page_id = str(uuid.uuid4())
+        title = body["properties"]["title"]["title"]
+        pages[page_id] = {
+            "object": "page", "id": page_id, "parent": body["parent"],
+            "properties": {"title": {"title": [{**t, "plain_text": t["text"]["content"]} for t in title]}},
+        }
+        children[page_id] = [stored(block) for block in body.get("children", [])]
+        app.state.stats["pages"] += 1
+        return uncertain() or pages[page_id]
+
+    @app.patch("/v1/blocks/{block_id}/children")
+    async def append(block_id: str, request: Request):
+        if rejected := limited(request):
+            return rejected
+        body = await request.json()
+        if len(body.get("children", [])) > 100:
+            return JSONResponse({"object": "error", "status": 400, "code": "validation_error", "message": "Too many children"}, status_code=400)
+        await asyncio.sleep(_delay(rng, latency))
+        new = [stored(block) for block in body["children"]]
+        children.setdefault(block_id, []).extend(new)
+        app.state.stats["appends"] += 1
+        app.state.stats["blocks"] += len(new)
+        return uncertain() or {"object": "list", "results": new, "next_cursor": None, "has_more": False}
+
+    @app.get("/v1/blocks/{block_id}/children")
+    async def list_children(block_id: str, request: Request, start_cursor: str = None, page_size: int = 100):
+        if rejected := limited(request):
+            return rejected
+        await asyncio.sleep(_delay(rng, latency))
+        blocks = children.get(block_id, [])
+        start = next((i for i, block in enumerate(blocks) if block["id"] == start_cursor), 0) if start_cursor else 0
+        page = blocks[start:start + min(page_size, 100)]
+        has_more = start + len(page) < len(blocks)
+        return {"object": "list", "results": page, "has_more": has_more, "next_cursor": blocks[start + len(page)]["id"] if has_more else None}
+
+    @app.post("/v1/search")
+    async def search(request: Request):
+        if rejected := limited(request):
+            return rejected
+        body = await request.json()
+        await asyncio.sleep(_delay(rng, latency))
+        query = body.get("query", "")
+        results = [
+            page for page in pages.values()
+            if query in "".join(t["plain_text"] for t in page["properties"]["title"]["title"])
+        ]
+        return {"object": "list", "results": results[:body.get("page_size", 100)], "has_more": False, "next_cursor": None}
+
+    return app
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class StandIn:
+    """
+    Serves an ASGI app with uvicorn on a background thread. Use as a context manager.
+    `hosts` are loopback addresses to listen on, all on one port (Linux routes all of 127.0.0.0/8
+    to loopback), so the same app can stand in for several sites.
+    """
+
+    def __init__(self, app: FastAPI, hosts: tuple = ("127.0.0.1",)):
+        self.port = free_port()
+        self.url = f"http://{hosts[0]}:{self.port}"
+        self.urls = [f"http://{host}:{self.port}" for host in hosts]
+        self.sockets = []
+        for host in hosts:
+            sock = socket.socket()
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+            sock.bind((host, self.port))
+            self.sockets.append(sock)
+        self.server = uvicorn.Server(uvicorn.Config(app, log_level="warning", access_log=False, backlog=4096))
+        self.thread = threading.Thread(target=self.server.run, kwargs={"sockets": self.sockets}, daemon=True)
+
+    def __enter__(self):
+        self.thread.start()
+        deadline = time.monotonic() + 10
+        while not self.server.started:
+            if time.monotonic() > deadline:
+                raise RuntimeError(f"Stand-in server on {self.url} did not start")
+            time.sleep(0.02)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=5)
+        for sock in self.sockets:
+            sock.close()
@@ -1,13 +1,22 @@
+import asyncio
 from fastapi import Depends, HTTPException, status
-from typing import Optional
 from db.client import get_supabase_client
 from supabase import Client
+from core.quota import UsageQuota
+from core.profile_cache import ProfileCache
 
 class UserProfile:
     def __init__(self, user_id: str, tier: str, monthly_credits: int):
         self.user_id = user_id
         self.tier = tier
         self.monthly_credits = monthly_credits
+        self.used_credits = None # Filled in by check_usage_quota
+
+    @property
+    def remaining_credits(self):
+        if self.used_credits is None:
+            return self.monthly_credits
+        return max(0, self.monthly_credits - self.used_credits)
 
 async def get_current_user_from_token(token: str = None) -> str:
     """
@@ -19,38 +28,66 @@ async def get_current_user_from_token(token: str = None) -> str:
 async def get_user_profile(user_id: str = Depends(get_current_user_from_token), supabase: Client = Depends(get_supabase_client)) -> UserProfile:
     """
     Queries the PostgreSQL 'users' table to fetch subscription tier and credits.
+    Served from ProfileCache when possible; see ProfileCache.invalidate for tier/credit changes.
     """
-    response = supabase.table("users").select("id, tier, monthly_credits").eq("clerk_id", user_id).execute()
-    
-    if not response.data:
-        # Fallback to demo profile for sandbox
-        if user_id == "demo_user":
-            return UserProfile(user_id="demo-uuid-123", tier="FREE", monthly_credits=50)
-            
-        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User profile not found")
-    
-    user_data = response.data[0]
+    user_data = await ProfileCache.get(user_id)
+    if not user_data:
+        response = await asyncio.to_thread(
+            supabase.table("users").select("id, tier, monthly_credits").eq("clerk_id", user_id).execute
+        )
+        
+        if not response.data:
+            # Fallback to demo profile for sandbox
+            if user_id == "demo_user":
+                return UserProfile(user_id="demo-uuid-123", tier="FREE", monthly_credits=50)
+                
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="User profile not found")
+        
+        user_data = response.data[0]
+        await ProfileCache.set(user_id, user_data)
+
     return UserProfile(user_id=user_data["id"], tier=user_data["tier"], monthly_credits=user_data["monthly_credits"])
 
 async def check_usage_quota(profile: UserProfile = Depends(get_user_profile), supabase: Client = Depends(get_supabase_client)):
     """
     Middleware skeleton: acts as a gatekeeper before /process is hit.
-    Checks the `usage_logs` table for the current month against `monthly_credits`.
+    Atomically checks and consumes one credit from the user's Redis counter for the current month
+    (seeded from `usage_logs` on first use and reconciled periodically by the worker).
+    """
+    return await consume_usage_quota(profile, supabase)
+
+async def consume_usage_quota(profile: UserProfile, supabase: Client, credits: int = 1) -> UserProfile:
+    """
+    check_usage_quota for requests that cost more than one credit (a batch costs one per link);
+    all `credits` are consumed or none. Raises 402 when they don't fit in what's left this month.
     """
     if profile.tier == "PRO":
         # Unlimited usage, immediately allow
         return profile
         
-    # Check the logs for current month
-    # In production, add a datetime filter for current month
-    usage_count_response = supabase.table("usage_logs").select("*", count="exact").eq("user_id", profile.user_id).execute()
-    
-    current_usage = usage_count_response.count if usage_count_response.count is not None else 0
+    allowed, used = await UsageQuota.check_and_increment(supabase, profile.user_id, profile.monthly_credits, credits)
+    profile.used_credits = used
     
-    if current_usage >= profile.monthly_credits:
+    if not allowed:
+        detail = "Monthly free credit limit reached. Please upgrade to Pro."
+        if credits > 1:
+            detail = f"This needs {credits} credits but only {profile.remaining_credits} are left this month. Please upgrade to Pro."
         raise HTTPException(
             status_code=status.HTTP_402_PAYMENT_REQUIRED,
-            detail="Monthly free credit limit reached. Please upgrade to Pro."
+            detail=detail
         )
         
     return profile
+
+async def refund_usage_quota(profile: UserProfile, credits: int = 1):
+    """
+    Gives back what check_usage_quota consumed when the request is rejected afterwards
+    (in-flight cap, enqueue failure, ...). Best-effort: a lost refund only costs the user a credit.
+    """
+    if profile.used_credits is None:
+        # PRO, or the quota was never checked
+        return
+    try:
+        profile.used_credits = await UsageQuota.refund(profile.user_id, credits)
+    except Exception as e:
+        print(f"Quota refund failed for {profile.user_id}: {e}")
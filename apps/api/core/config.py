@@ -15,24 +15,185 @@ class Settings(BaseSettings):
     # Supabase (Database)
     NEXT_PUBLIC_SUPABASE_URL: str
     NEXT_PUBLIC_SUPABASE_ANON_KEY: str
+    # The API and worker read and write tables that have RLS enabled and no policies (results,
+    # notion_connections, usage_logs), which only the service role can reach. Never ship it to the browser
+    SUPABASE_SERVICE_ROLE_KEY: str = ""
     
     # AI Keys
     OPENAI_API_KEY: str
     GEMINI_API_KEY: str
     GROQ_API_KEY: str
+    GROQ_BASE_URL: str = "" # Empty uses the Groq default
+    
+    # LLM routing: models in order of preference, with per-1k-token prices (USD) and context size.
+    # An optional "api_base" points a model at another OpenAI-compatible endpoint (e.g. the bench stand-in)
+    LLM_MODELS: list = [
+        {
+            "model": "gpt-4o-mini",
+            "api_key_setting": "OPENAI_API_KEY",
+            "input_cost_per_1k": 0.00015,
+            "output_cost_per_1k": 0.0006,
+            "max_input_tokens": 128000,
+        },
+        {
+            "model": "gemini/gemini-1.5-flash",
+            "api_key_setting": "GEMINI_API_KEY",
+            "input_cost_per_1k": 0.000075,
+            "output_cost_per_1k": 0.0003,
+            "max_input_tokens": 1000000,
+        },
+    ]
+    # Per request; longer inputs spill over to cheaper models. The default is gpt-4o-mini's price for
+    # ~2,500 input tokens plus the expected output, i.e. the old 10,000-character cut-off for English
+    # text, now in tokens. Only applies to "Auto" language requests (explicit languages stay put)
+    LLM_COST_BUDGET_USD: float = 0.00086
+    LLM_LATENCY_BUDGET_MS: float = 20000
+    LLM_MAX_ERROR_RATE: float = 0.25
+    LLM_METRICS_COOLDOWN_SECONDS: int = 600
+    
+    # LLM rate limits, keyed by model, provider ("openai", "gemini") or "default"
+    LLM_RATE_LIMITS: dict = {
+        "default": {"concurrency": 8, "rpm": 500, "tpm": 200000},
+        "openai": {"concurrency": 16, "rpm": 5000, "tpm": 2000000},
+        "gemini": {"concurrency": 16, "rpm": 2000, "tpm": 4000000},
+    }
+    LLM_EXPECTED_OUTPUT_TOKENS: int = 800
+    LLM_RATE_LIMIT_MAX_WAIT_SECONDS: float = 60.0
+    LLM_MAX_RETRIES: int = 4
+    LLM_RETRY_BASE_SECONDS: float = 1.0
+    LLM_RETRY_MAX_SECONDS: float = 30.0
+    
+    # Long-document (map-reduce) summarization
+    LLM_SINGLE_PASS_MAX_TOKENS: int = 6000
+    LLM_CHUNK_TOKENS: int = 3000
+    LLM_MAP_CONCURRENCY: int = 8
+    LLM_CHUNK_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    # Token-budget reducer ahead of the LLM (services/reducer.py); 0 keeps every deduplicated sentence.
+    # Map-reduce summarizes long inputs in full, so ranking (which drops sentences) only caps what it is
+    # handed: ~70 map calls of LLM_CHUNK_TOKENS. Dedup and boilerplate removal apply to every input
+    REDUCER_TOKEN_BUDGET: int = 200_000
+    
+    # Audio transcription (Whisper fallback)
+    AUDIO_BITRATE: str = "24k"
+    AUDIO_CHUNK_SECONDS: int = 600
+    AUDIO_MAX_CHUNK_SECONDS: int = 900
+    AUDIO_SILENCE_DB: int = -35
+    AUDIO_SILENCE_MIN_SECONDS: float = 0.4
+    AUDIO_TRANSCRIBE_CONCURRENCY: int = 6
     
     # Scraping
     PROXY_SERVER_URL: str = ""
     FIRECRAWL_API_KEY: str = ""
+    BROWSER_MAX_PAGES: int = 4
+    BROWSER_RECYCLE_AFTER: int = 100
+    HTTP_TIMEOUT_SECONDS: float = 15.0
+    HTTP_MAX_CONNECTIONS: int = 100
+    HTTP_MAX_PER_HOST: int = 4
+    HTTP_MAX_RESPONSE_BYTES: int = 5 * 1024 * 1024
+    PAGE_CACHE_TTL_SECONDS: int = 24 * 3600
+    EXTRACT_WORKERS: int = 0 # 0 = one process per CPU core
+    EXTRACT_TIMEOUT_SECONDS: float = 20.0
+    EXTRACT_MAX_HTML_CHARS: int = 3_000_000
+    SCRAPER_PROFILE_WINDOW: int = 50 # runs kept per domain and tier
+    SCRAPER_PROFILE_MIN_SAMPLES: int = 5 # below this the default tier order is used
+    SCRAPER_PROFILE_TTL_SECONDS: int = 7 * 24 * 3600
+    SCRAPER_TIER_MIN_SUCCESS_RATE: float = 0.2 # tiers below this on a domain are tried last there
+    SCRAPER_HEDGE_ENABLED: bool = True
+    SCRAPER_HEDGE_MIN_SECONDS: float = 1.0 # floor on the hedge delay, whatever the domain's p90
+    
+    # Worker
+    WORKER_MAX_JOBS: int = 50
+    # 0 disables. Several workers on one host either get their own port each, or share one with
+    # PROMETHEUS_MULTIPROC_DIR set (the first to bind it serves everyone's metrics)
+    WORKER_METRICS_PORT: int = 9100
+    
+    # Fair scheduling between tiers and users (see services/queue.py).
+    # weight: share of dequeue order relative to other users; head_start_seconds: how far ahead of
+    # newly submitted work a tier's jobs sort (PRO jump FREE backlogs up to the difference in age);
+    # max_wait_seconds: new work is shed with 503 once its estimated queue wait exceeds this (None = never);
+    # max_batches_in_flight caps batches separately, and a batch runs at most max_in_flight links at once
+    QUEUE_TIERS: dict = {
+        "FREE": {"weight": 1, "head_start_seconds": 60, "max_in_flight": 5, "max_batches_in_flight": 1, "job_timeout_seconds": 300, "max_wait_seconds": 300},
+        "PRO": {"weight": 4, "head_start_seconds": 660, "max_in_flight": 25, "max_batches_in_flight": 3, "job_timeout_seconds": 900, "max_wait_seconds": None},
+    }
+    QUEUE_SLOT_SECONDS: float = 2.0 # virtual time one job costs a weight-1 user
+    QUEUE_IN_FLIGHT_TTL_SECONDS: int = 3600 # in-flight entries older than this are assumed lost
+    QUEUE_THROUGHPUT_WINDOW_SECONDS: int = 120
+    QUEUE_MIN_THROUGHPUT: float = 0.2 # jobs/s assumed when there's little recent history
+    JOB_CANCEL_WAIT_SECONDS: float = 2.0
     
     # Notion
     NOTION_CLIENT_ID: str
     NOTION_CLIENT_SECRET: str
     NOTION_REDIRECT_URI: str
+    # Fernet key for access tokens at rest: python -c "from cryptography.fernet import Fernet; print(Fernet.generate_key().decode())"
+    # Only needed once someone connects Notion; saving or reading a connection without it fails
+    NOTION_TOKEN_ENCRYPTION_KEY: str = ""
+    NOTION_API_URL: str = "https://api.notion.com/v1"
+    NOTION_VERSION: str = "2022-06-28"
+    NOTION_REQUESTS_PER_SECOND: float = 3.0 # Notion's average limit per integration, per workspace
+    NOTION_BURST: int = 3
+    NOTION_RATE_LIMIT_MAX_WAIT_SECONDS: float = 120.0
+    NOTION_MAX_RETRIES: int = 5
+    NOTION_RETRY_MAX_SECONDS: float = 60.0
+    NOTION_HTTP_MAX_CONNECTIONS: int = 20
+    NOTION_APPEND_MAX_BLOCKS: int = 100 # Notion's cap on children per append
+    NOTION_APPEND_MAX_BYTES: int = 400_000 # under Notion's 500 KB request payload cap
+    NOTION_EXPORT_PAGE_SIZE: int = 100 # results read from history per round trip
+    NOTION_EXPORT_TIMEOUT_SECONDS: int = 3 * 3600
+    NOTION_EXPORT_TTL_SECONDS: int = 7 * 24 * 3600
+    NOTION_OAUTH_STATE_TTL_SECONDS: int = 600
     
     # Business Logic
-    DEFAULT_DAILY_QUOTA: int = 7
+    # Per-tier and per-IP request limits as {name: (requests, period_seconds)}
+    API_RATE_LIMITS: dict = {
+        "FREE": {"burst": (5, 10), "sustained": (60, 3600)},
+        "PRO": {"burst": (20, 10), "sustained": (1000, 3600)},
+        "IP": {"burst": (30, 10), "sustained": (2000, 3600)},
+    }
+    # Reverse proxies in front of the API that append to X-Forwarded-For (1 behind Render's load
+    # balancer). 0 uses the socket peer, for when the API is reached directly
+    TRUSTED_PROXY_HOPS: int = 0
     REWARD_CREDIT_AMOUNT: int = 3
+    QUOTA_RECONCILE_MINUTES: int = 15
+    # Nothing in this tree changes tiers or credits yet, so nothing calls ProfileCache.invalidate;
+    # edits made straight in the database show up within this long. Raise it once a webhook invalidates
+    PROFILE_CACHE_TTL_SECONDS: int = 60
+    PROFILE_LOCAL_TTL_SECONDS: int = 30
+    PROFILE_LOCAL_MAX_ENTRIES: int = 10000
+    USAGE_LOG_BATCH_SIZE: int = 200
+    USAGE_LOG_FLUSH_SECONDS: float = 5.0
+    USAGE_LOG_MAX_BUFFERED: int = 20000
+    
+    # Summary Cache
+    SUMMARY_CACHE_TTL_SECONDS: int = 7 * 24 * 3600
+    SUMMARY_CACHE_MAX_ENTRIES: int = 50000
+    SUMMARY_CACHE_MAX_BYTES: int = 256 * 1024
+    # Near-duplicate detection: MinHash bins split into bands for LSH (16 x 8 rows puts the
+    # candidate cut-off near 0.7 similarity); candidates are reused at NEAR_DUP_THRESHOLD and above
+    NEAR_DUP_ENABLED: bool = True
+    NEAR_DUP_BINS: int = 128
+    NEAR_DUP_BANDS: int = 16
+    NEAR_DUP_SHINGLE_WORDS: int = 5
+    NEAR_DUP_MIN_WORDS: int = 80
+    NEAR_DUP_THRESHOLD: float = 0.8
+    INFLIGHT_TTL_SECONDS: int = 600
+    VIDEO_CACHE_TTL_SECONDS: int = 30 * 24 * 3600
+    VIDEO_NEGATIVE_CACHE_TTL_SECONDS: int = 6 * 3600
+    JOB_EVENT_TTL_SECONDS: int = 3600
+    
+    # Result Store (Postgres `results` table); arq keeps results in Redis only this long
+    RESULT_HOT_TTL_SECONDS: int = 3600
+    RESULT_ZSTD_LEVEL: int = 3
+    HISTORY_MAX_PAGE_SIZE: int = 100
+    
+    # Batch Ingestion
+    BATCH_MAX_URLS: int = 500
+    BATCH_MAX_CONCURRENCY: int = 20
+    BATCH_PER_DOMAIN_CONCURRENCY: int = 2
+    BATCH_PER_DOMAIN_INTERVAL_SECONDS: float = 1.0
+    BATCH_TTL_SECONDS: int = 7 * 24 * 3600
+    BATCH_TIMEOUT_SECONDS: int = 3 * 3600
     
     model_config = SettingsConfigDict(
         env_file=".env",
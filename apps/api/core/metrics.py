@@ -0,0 +1,145 @@
+import os
+import time
+from datetime import datetime, timezone
+from contextlib import contextmanager
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, REGISTRY, generate_latest, multiprocess,
+    start_http_server
+)
+
+try:
+    # Optional: per-job traces when an OpenTelemetry SDK/exporter is configured; no-op otherwise
+    from opentelemetry import trace
+    tracer = trace.get_tracer("link-collector")
+except ImportError:
+    tracer = None
+
+# Pipeline stages span milliseconds (cache hits) to minutes (Whisper on long videos)
+STAGE_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+
+SCRAPER_TIER_SECONDS = Histogram(
+    "scraper_tier_seconds", "Time spent in each web extraction tier",
+    ["tier", "outcome"], buckets=STAGE_BUCKETS
+)
+SCRAPER_HEDGES = Counter(
+    "scraper_hedges_total", "Extraction tiers started early because the running one passed its domain p90",
+    ["tier", "result"]
+)
+YOUTUBE_TIER_SECONDS = Histogram(
+    "youtube_tier_seconds", "Time spent in each YouTube extraction tier",
+    ["tier", "outcome"], buckets=STAGE_BUCKETS
+)
+YOUTUBE_CACHE_HITS = Counter("youtube_cache_hits_total", "Videos served from the per-video tier cache", ["tier"])
+EXTRACTION_RESULTS = Counter(
+    "extraction_results_total", "Jobs by the tier that finally produced the content", ["source", "method"]
+)
+
+LLM_CALL_SECONDS = Histogram(
+    "llm_call_seconds", "Latency of individual LLM completions", ["model", "outcome"], buckets=STAGE_BUCKETS
+)
+LLM_TOKENS = Counter("llm_tokens_total", "LLM tokens consumed", ["model", "kind"])
+LLM_COST_USD = Counter("llm_cost_usd_total", "Estimated LLM spend in USD", ["model"])
+LLM_SUMMARIZE_SECONDS = Histogram(
+    "llm_summarize_seconds", "End-to-end summarization time including map-reduce", ["mode", "outcome"],
+    buckets=STAGE_BUCKETS
+)
+
+REDUCER_TOKENS_SAVED = Counter("reducer_tokens_saved_total", "Estimated input tokens removed before the LLM", ["source"])
+REDUCER_SECONDS = Histogram(
+    "reducer_seconds", "Token-budget reducer time", buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+NEAR_DUP_LOOKUPS = Counter(
+    "near_duplicate_lookups_total", "Fingerprint lookups before summarization", ["result"]
+)
+NEAR_DUP_LOOKUP_SECONDS = Histogram(
+    "near_duplicate_lookup_seconds", "Fingerprinting plus LSH lookup time",
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1)
+)
+
+NOTION_REQUESTS = Counter("notion_requests_total", "Notion API requests by outcome", ["operation", "outcome"])
+NOTION_EXPORTED = Counter("notion_exported_results_total", "Summaries appended to Notion")
+
+JOB_QUEUE_WAIT_SECONDS = Histogram(
+    "job_queue_wait_seconds", "Time between enqueue and a worker starting the job", ["function"],
+    buckets=STAGE_BUCKETS
+)
+JOB_SECONDS = Histogram(
+    "job_seconds", "Job run time by outcome", ["function", "outcome"], buckets=STAGE_BUCKETS
+)
+# Set from Redis by the API's /metrics handler, so any replica reports the shared queue
+QUEUE_DEPTH = Gauge("queue_depth", "Jobs waiting to start, by user tier", ["tier"], multiprocess_mode="max")
+PROCESS_REQUESTS = Counter("process_requests_total", "/process admissions by result", ["result"])
+
+
+@contextmanager
+def span(name: str, **attributes):
+    if not tracer:
+        yield None
+        return
+    with tracer.start_as_current_span(name, attributes=attributes) as current:
+        yield current
+
+
+@contextmanager
+def track_tier(histogram, tier: str):
+    """
+    Times a fallback tier. The outcome label is "error" if the block raises, otherwise whatever
+    the block sets on the yielded dict ("empty" unless it reports "success").
+    """
+    state = {"outcome": "empty"}
+    started = time.perf_counter()
+    with span(f"tier.{tier}"):
+        try:
+            yield state
+        except Exception:
+            state["outcome"] = "error"
+            raise
+        finally:
+            histogram.labels(tier=tier, outcome=state["outcome"]).observe(time.perf_counter() - started)
+
+
+def observe_queue_wait(ctx, function: str):
+    """
+    Records how long an arq job sat in the queue. Retries are skipped since their enqueue_time is the original one.
+    """
+    enqueue_time = ctx.get("enqueue_time")
+    if enqueue_time and ctx.get("job_try", 1) == 1:
+        wait = (datetime.now(timezone.utc) - enqueue_time).total_seconds()
+        JOB_QUEUE_WAIT_SECONDS.labels(function=function).observe(max(0.0, wait))
+
+
+def _registry():
+    # Aggregates across processes when PROMETHEUS_MULTIPROC_DIR is set
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return registry
+    return REGISTRY
+
+
+def render_metrics():
+    """
+    Returns (body, content_type) for a /metrics endpoint. Aggregates across processes when
+    PROMETHEUS_MULTIPROC_DIR is set (e.g. several uvicorn workers).
+    """
+    return generate_latest(_registry()), CONTENT_TYPE_LATEST
+
+
+def start_metrics_server(port: int) -> bool:
+    """
+    Serves metrics on `port` for processes without a web server of their own (arq workers).
+    With PROMETHEUS_MULTIPROC_DIR set, whichever worker on the host binds the port first serves
+    every worker's metrics and the others find it taken. Returns whether this process serves them.
+    """
+    try:
+        start_http_server(port, registry=_registry())
+    except OSError as e:
+        if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+            print(f"Metrics port {port} is taken; another worker on this host serves the aggregated metrics")
+        else:
+            print(
+                f"Metrics port {port} unavailable ({e}); give each worker its own WORKER_METRICS_PORT "
+                "or set PROMETHEUS_MULTIPROC_DIR to expose this worker's metrics"
+            )
+        return False
+    return True
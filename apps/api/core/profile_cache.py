@@ -0,0 +1,97 @@
+import asyncio
+import json
+import time
+from collections import OrderedDict
+from core.config import get_settings
+from core.redis import get_redis
+
+settings = get_settings()
+
+PROFILE_PREFIX = "profile:"
+INVALIDATION_CHANNEL = "profile-invalidations"
+
+
+class ProfileCache:
+    """
+    Two-level cache for `users` rows keyed by clerk_id: a small in-process LRU with a short TTL
+    in front of a Redis copy with a longer one. `invalidate` drops both and tells every other
+    API process to drop its local copy.
+    """
+    _local = OrderedDict()
+
+    @classmethod
+    def _get_local(cls, clerk_id: str):
+        entry = cls._local.get(clerk_id)
+        if not entry:
+            return None
+        expires_at, profile = entry
+        if expires_at < time.monotonic():
+            cls._local.pop(clerk_id, None)
+            return None
+        cls._local.move_to_end(clerk_id)
+        return profile
+
+    @classmethod
+    def _set_local(cls, clerk_id: str, profile: dict):
+        cls._local[clerk_id] = (time.monotonic() + settings.PROFILE_LOCAL_TTL_SECONDS, profile)
+        cls._local.move_to_end(clerk_id)
+        while len(cls._local) > settings.PROFILE_LOCAL_MAX_ENTRIES:
+            cls._local.popitem(last=False)
+
+    @classmethod
+    async def get(cls, clerk_id: str):
+        profile = cls._get_local(clerk_id)
+        if profile:
+            return profile
+        try:
+            raw = await get_redis().get(PROFILE_PREFIX + clerk_id)
+        except Exception as e:
+            print(f"Profile cache read failed: {e}")
+            return None
+        if not raw:
+            return None
+        profile = json.loads(raw)
+        cls._set_local(clerk_id, profile)
+        return profile
+
+    @classmethod
+    async def set(cls, clerk_id: str, profile: dict):
+        cls._set_local(clerk_id, profile)
+        try:
+            await get_redis().set(PROFILE_PREFIX + clerk_id, json.dumps(profile), ex=settings.PROFILE_CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"Profile cache write failed: {e}")
+
+    @classmethod
+    async def invalidate(cls, clerk_id: str):
+        """
+        Call whenever a user's tier or credits change (e.g. from a billing webhook handler). Until
+        such a path exists, PROFILE_CACHE_TTL_SECONDS bounds how long a change goes unseen.
+        """
+        cls._local.pop(clerk_id, None)
+        redis = get_redis()
+        await redis.delete(PROFILE_PREFIX + clerk_id)
+        await redis.publish(INVALIDATION_CHANNEL, clerk_id)
+
+    @classmethod
+    async def listen_for_invalidations(cls):
+        """
+        Long-running task (started by the API on startup) that evicts local entries invalidated elsewhere.
+        """
+        while True:
+            pubsub = get_redis().pubsub()
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                async for message in pubsub.listen():
+                    if message["type"] == "message":
+                        data = message["data"]
+                        cls._local.pop(data.decode("utf-8") if isinstance(data, bytes) else data, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Without invalidations local entries may be stale for up to PROFILE_LOCAL_TTL_SECONDS
+                print(f"Profile invalidation listener failed, reconnecting: {e}")
+                cls._local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timezone, timedelta
+from core.redis import get_redis
+
+QUOTA_PREFIX = "quota:"
+
+# Atomic check-and-increment by ARGV[2] credits. Returns {-1, 0} when the counter hasn't been
+# seeded yet, {0, used} when the credits don't fit under the limit, and {1, used} after a
+# successful increment.
+CHECK_AND_INCREMENT_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return {-1, 0}
+end
+current = tonumber(current)
+if current + tonumber(ARGV[2]) > tonumber(ARGV[1]) then
+    return {0, current}
+end
+return {1, redis.call('INCRBY', KEYS[1], ARGV[2])}
+"""
+
+# Raises a counter to ARGV[1] if it is lower, atomically with respect to concurrent INCRs
+RAISE_TO_SCRIPT = """
+local current = tonumber(redis.call('GET', KEYS[1]) or '0')
+if tonumber(ARGV[1]) > current then
+    redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# Gives back credits consumed for a request that was then rejected, never going below zero
+REFUND_SCRIPT = """
+local current = redis.call('GET', KEYS[1])
+if not current then
+    return 0
+end
+return redis.call('DECRBY', KEYS[1], math.min(tonumber(current), tonumber(ARGV[1])))
+"""
+
+
+def current_month(now: datetime = None) -> str:
+    return (now or datetime.now(timezone.utc)).strftime("%Y-%m")
+
+
+def month_start(month: str) -> datetime:
+    return datetime.strptime(month, "%Y-%m").replace(tzinfo=timezone.utc)
+
+
+def counter_key(user_id: str, month: str) -> str:
+    return f"{QUOTA_PREFIX}{user_id}:{month}"
+
+
+def count_usage_logs(supabase, user_id: str, month: str) -> int:
+    # Blocking PostgREST call; run it on a thread from async code
+    start = month_start(month)
+    end = (start + timedelta(days=32)).replace(day=1)
+    response = (
+        supabase.table("usage_logs")
+        .select("id", count="exact", head=True)
+        .eq("user_id", user_id)
+        .gte("created_at", start.isoformat())
+        .lt("created_at", end.isoformat())
+        .execute()
+    )
+    return response.count or 0
+
+
+class UsageQuota:
+    """
+    Per-user, per-month usage counters in Redis. The hot path is one EVALSHA; Postgres is only
+    read to seed a missing counter and by the periodic reconcile job.
+    """
+    _script = None
+    _raise_script = None
+    _refund_script = None
+
+    @classmethod
+    async def check_and_increment(cls, supabase, user_id: str, limit: int, credits: int = 1):
+        """
+        Returns (allowed, used) and consumes `credits` when allowed (all of them or none).
+        """
+        redis = get_redis()
+        if cls._script is None:
+            cls._script = redis.register_script(CHECK_AND_INCREMENT_SCRIPT)
+        month = current_month()
+        key = counter_key(user_id, month)
+
+        allowed, used = await cls._script(keys=[key], args=[limit, credits], client=redis)
+        if allowed == -1:
+            # First request this month (or the key was evicted): seed from Postgres, then retry
+            logged = await asyncio.to_thread(count_usage_logs, supabase, user_id, month)
+            await redis.set(key, logged, nx=True, ex=_ttl(month))
+            allowed, used = await cls._script(keys=[key], args=[limit, credits], client=redis)
+        return allowed == 1, int(used)
+
+    @classmethod
+    async def refund(cls, user_id: str, credits: int = 1) -> int:
+        """
+        Returns `credits` consumed by check_and_increment for a request that was rejected or failed
+        before any work was queued. Returns the new count.
+        """
+        redis = get_redis()
+        if cls._refund_script is None:
+            cls._refund_script = redis.register_script(REFUND_SCRIPT)
+        return int(await cls._refund_script(keys=[counter_key(user_id, current_month())], args=[credits], client=redis))
+
+    @classmethod
+    async def reconcile(cls, supabase, month: str = None):
+        """
+        Raises each live counter to at least the number of rows in usage_logs, so counters lost to a
+        Redis failover or eviction catch up. Counters are never lowered: admissions still in flight
+        haven't been logged yet.
+        """
+        redis = get_redis()
+        if cls._raise_script is None:
+            cls._raise_script = redis.register_script(RAISE_TO_SCRIPT)
+        month = month or current_month()
+        reconciled = 0
+        async for key in redis.scan_iter(match=f"{QUOTA_PREFIX}*:{month}", count=500):
+            key = key.decode("utf-8") if isinstance(key, bytes) else key
+            user_id = key[len(QUOTA_PREFIX):-(len(month) + 1)]
+            logged = await asyncio.to_thread(count_usage_logs, supabase, user_id, month)
+            reconciled += await cls._raise_script(keys=[key], args=[logged, _ttl(month)], client=redis)
+        return reconciled
+
+
+def _ttl(month: str) -> int:
+    # Keep the counter a week past the end of its month, then let it expire
+    start = month_start(month)
+    expires = (start + timedelta(days=32)).replace(day=1) + timedelta(days=7)
+    return max(60, int((expires - datetime.now(timezone.utc)).total_seconds()))
@@ -1,27 +1,137 @@
+from fastapi import Depends, HTTPException, Request, Response, status
 from core.config import get_settings
-from fastapi import HTTPException
-from datetime import datetime
+from core.redis import get_redis
+from core.auth import UserProfile, get_user_profile
 
 settings = get_settings()
 
-# In-memory storage for rate limiting (dev/demo only)
-rate_limit_store = {}
+RATE_LIMIT_PREFIX = "rate-limit:"
+
+# GCRA over several limits at once, all-or-nothing: a request is only counted against every
+# limit if it passes all of them. Uses Redis TIME so every API replica shares one clock.
+# KEYS: one per limit. ARGV: (limit, period_seconds) per key.
+# Returns {allowed, limit, remaining, reset_seconds, retry_after_seconds} for the tightest limit.
+GCRA_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local allowed = 1
+local retry_after = 0
+local new_tats = {}
+local tightest = nil
+for i, key in ipairs(KEYS) do
+    local limit = tonumber(ARGV[i * 2 - 1])
+    local period = tonumber(ARGV[i * 2])
+    local interval = period / limit
+    local tat = math.max(tonumber(redis.call('GET', key) or '0'), now)
+    local new_tat = tat + interval
+    local remaining
+    local reset = new_tat - now
+    if new_tat - now > period then
+        allowed = 0
+        retry_after = math.max(retry_after, new_tat - now - period)
+        remaining = 0
+        reset = tat - now
+    else
+        remaining = math.floor((period - (new_tat - now)) / interval)
+    end
+    new_tats[i] = {new_tat, period}
+    if tightest == nil or remaining < tightest[2] then
+        tightest = {limit, remaining, reset}
+    end
+end
+if allowed == 1 then
+    for i, key in ipairs(KEYS) do
+        redis.call('SET', key, tostring(new_tats[i][1]), 'PX', math.ceil(new_tats[i][2] * 1000))
+    end
+end
+return {allowed, tightest[1], tightest[2], tostring(tightest[3]), tostring(retry_after)}
+"""
+
 
 class RateLimitService:
-    async def check_rate_limit(self, user_id: str):
-        today = datetime.now().strftime("%Y-%m-%d")
-        key = f"{user_id}:{today}"
-        
-        current_count = rate_limit_store.get(key, 0)
-        rate_limit_store[key] = current_count + 1
-        
-        if rate_limit_store[key] > settings.DEFAULT_DAILY_QUOTA:
-            raise HTTPException(status_code=429, detail="Daily quota exceeded")
-            
-        return True
-
-    async def get_remaining_quota(self, user_id: str) -> int:
-        today = datetime.now().strftime("%Y-%m-%d")
-        key = f"{user_id}:{today}"
-        current = rate_limit_store.get(key, 0)
-        return max(0, settings.DEFAULT_DAILY_QUOTA - current)
+    """
+    Burst and sustained request limits per user tier and per client IP, shared by every API
+    replica through Redis and checked in a single round trip.
+    """
+    _script = None
+
+    @staticmethod
+    def limits_for(profile: UserProfile, ip: str) -> list:
+        """
+        Returns (key, limit, period_seconds) for every limit that applies to this request.
+        """
+        tier_limits = settings.API_RATE_LIMITS.get(profile.tier, settings.API_RATE_LIMITS["FREE"])
+        limits = []
+        for name, (limit, period) in tier_limits.items():
+            limits.append((f"{RATE_LIMIT_PREFIX}user:{profile.user_id}:{name}", limit, period))
+        for name, (limit, period) in settings.API_RATE_LIMITS["IP"].items():
+            limits.append((f"{RATE_LIMIT_PREFIX}ip:{ip}:{name}", limit, period))
+        return limits
+
+    @classmethod
+    async def check(cls, limits: list):
+        """
+        Returns (allowed, headers). Fails open if Redis is unavailable.
+        """
+        redis = get_redis()
+        try:
+            if cls._script is None:
+                cls._script = redis.register_script(GCRA_SCRIPT)
+            args = []
+            for _, limit, period in limits:
+                args += [limit, period]
+            allowed, limit, remaining, reset, retry_after = await cls._script(
+                keys=[key for key, _, _ in limits], args=args, client=redis
+            )
+        except Exception as e:
+            print(f"Rate limiter unavailable, allowing request: {e}")
+            return True, {}
+
+        headers = {
+            "RateLimit-Limit": str(limit),
+            "RateLimit-Remaining": str(remaining),
+            "RateLimit-Reset": str(max(0, int(float(reset) + 0.999))),
+        }
+        if not allowed:
+            headers["Retry-After"] = str(max(1, int(float(retry_after) + 0.999)))
+        return allowed == 1, headers
+
+
+def client_ip(request: Request) -> str:
+    """
+    The caller's IP for per-IP limits. Behind TRUSTED_PROXY_HOPS proxies the socket peer is the
+    last proxy, so the address is taken from X-Forwarded-For, counting hops from the right: entries
+    further left are whatever the client sent and can't be trusted.
+    """
+    peer = request.client.host if request.client else "unknown"
+    if settings.TRUSTED_PROXY_HOPS <= 0:
+        return peer
+    forwarded = [
+        part.strip() for header in request.headers.getlist("x-forwarded-for") for part in header.split(",")
+    ]
+    forwarded = [part for part in forwarded if part]
+    if len(forwarded) < settings.TRUSTED_PROXY_HOPS:
+        return forwarded[0] if forwarded else peer
+    return forwarded[-settings.TRUSTED_PROXY_HOPS]
+
+
+async def enforce_rate_limit(
+    request: Request,
+    response: Response,
+    profile: UserProfile = Depends(get_user_profile)
+) -> UserProfile:
+    """
+    FastAPI dependency: rejects the request with 429 once a burst or sustained limit is hit and
+    adds RateLimit-* headers to every response. Declare it before check_usage_quota so rejected
+    requests don't consume credits.
+    """
+    ip = client_ip(request)
+    allowed, headers = await RateLimitService.check(RateLimitService.limits_for(profile, ip))
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many requests. Please slow down.",
+            headers=headers
+        )
+    response.headers.update(headers)
+    return profile
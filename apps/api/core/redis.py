@@ -0,0 +1,11 @@
+from functools import lru_cache
+from redis.asyncio import Redis
+from core.config import get_settings
+
+settings = get_settings()
+
+# Shared client for services that need Redis outside of an arq ctx (rate limits, metrics, caches).
+# Connections are opened lazily on first command, so importing this is free.
+@lru_cache()
+def get_redis() -> Redis:
+    return Redis.from_url(settings.REDIS_URL, health_check_interval=30)
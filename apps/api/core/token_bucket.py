@@ -0,0 +1,68 @@
+import asyncio
+from core.redis import get_redis
+
+# Checks every bucket and only deducts if all of them have enough tokens, so a request
+# never burns its RPM slot while waiting on TPM. Uses Redis TIME so all replicas share one clock.
+# KEYS: bucket keys. ARGV: (rate_per_second, capacity, requested) per key.
+# Returns the seconds to wait before retrying, or "0" when the tokens were taken.
+TAKE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local levels = {}
+local wait = 0
+for i, key in ipairs(KEYS) do
+    local rate = tonumber(ARGV[i * 3 - 2])
+    local capacity = tonumber(ARGV[i * 3 - 1])
+    local requested = math.min(tonumber(ARGV[i * 3]), capacity)
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or capacity
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+    levels[i] = {tokens, requested, rate, capacity}
+    if tokens < requested then
+        wait = math.max(wait, (requested - tokens) / rate)
+    end
+end
+for i, key in ipairs(KEYS) do
+    local tokens = levels[i][1]
+    if wait == 0 then
+        tokens = tokens - levels[i][2]
+    end
+    redis.call('HSET', key, 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', key, math.ceil(levels[i][4] / levels[i][3]) + 1)
+end
+return tostring(wait)
+"""
+
+
+class TokenBucket:
+    """
+    Distributed token buckets in Redis. Each bucket is (key, rate_per_second, capacity, requested).
+    """
+    _script = None
+
+    @classmethod
+    async def try_take(cls, buckets: list, redis=None) -> float:
+        redis = redis or get_redis()
+        if cls._script is None:
+            cls._script = redis.register_script(TAKE_SCRIPT)
+        keys = [key for key, _, _, _ in buckets]
+        args = []
+        for _, rate, capacity, requested in buckets:
+            args += [rate, capacity, requested]
+        return float(await cls._script(keys=keys, args=args, client=redis))
+
+    @classmethod
+    async def take(cls, buckets: list, redis=None, max_wait: float = 60.0):
+        """
+        Blocks until all buckets have capacity. Raises TimeoutError after `max_wait` seconds.
+        """
+        waited = 0.0
+        while True:
+            wait = await cls.try_take(buckets, redis)
+            if wait <= 0:
+                return waited
+            if waited + wait > max_wait:
+                raise TimeoutError(f"Rate limit wait would exceed {max_wait}s")
+            await asyncio.sleep(wait)
+            waited += wait
@@ -0,0 +1,76 @@
+import re
+from urllib.parse import urlparse, urlunparse, parse_qsl, urlencode
+
+# Query parameters that only carry attribution/tracking data and never change page content
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "gbraid", "wbraid", "msclkid", "yclid", "twclid",
+    "igshid", "mc_cid", "mc_eid", "_hsenc", "_hsmi", "ref", "ref_src", "ref_url",
+    "si", "feature", "spm", "share", "s_cid", "cmpid", "ncid",
+}
+TRACKING_PREFIXES = ("utm_", "pk_", "mtm_", "hsa_", "oly_")
+
+YOUTUBE_HOSTS = {
+    "youtube.com", "www.youtube.com", "m.youtube.com", "music.youtube.com",
+    "youtube-nocookie.com", "www.youtube-nocookie.com", "youtu.be", "www.youtu.be",
+}
+# Path prefixes whose next segment is the video ID, e.g. /shorts/<id>, /embed/<id>
+YOUTUBE_ID_PATHS = ("shorts", "embed", "live", "v", "e")
+VIDEO_ID_RE = re.compile(r"^[A-Za-z0-9_-]{11}$")
+
+
+def get_youtube_video_id(url: str) -> str:
+    """
+    Returns the 11-character video ID for any YouTube video link (watch, youtu.be, Shorts,
+    /embed/, /live/, m./music. hosts, nocookie embeds), or "" if the URL is not a video link.
+    """
+    url = url.strip()
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    host = (parsed.hostname or "").lower()
+    if host not in YOUTUBE_HOSTS:
+        return ""
+
+    segments = [segment for segment in parsed.path.split("/") if segment]
+    candidate = ""
+    if host.endswith("youtu.be"):
+        candidate = segments[0] if segments else ""
+    elif len(segments) >= 2 and segments[0] in YOUTUBE_ID_PATHS:
+        candidate = segments[1]
+    else:
+        candidate = dict(parse_qsl(parsed.query)).get("v", "")
+
+    return candidate if VIDEO_ID_RE.match(candidate) else ""
+
+
+def normalize_url(url: str) -> str:
+    """
+    Reduces a URL to a canonical form so that links pointing to the same content share a cache key.
+    Lowercases scheme/host, drops fragments, default ports, tracking params and trailing slashes,
+    sorts the remaining query string and rewrites YouTube links to https://www.youtube.com/watch?v=<id>.
+    """
+    url = url.strip()
+    video_id = get_youtube_video_id(url)
+    if video_id:
+        return f"https://www.youtube.com/watch?v={video_id}"
+
+    parsed = urlparse(url if "://" in url else f"https://{url}")
+    scheme = (parsed.scheme or "https").lower()
+    host = (parsed.hostname or "").lower()
+    if host.startswith("www."):
+        host = host[4:]
+
+    port = parsed.port
+    netloc = host
+    if port and not ((scheme == "http" and port == 80) or (scheme == "https" and port == 443)):
+        netloc = f"{host}:{port}"
+
+    query = sorted(
+        (key, value)
+        for key, value in parse_qsl(parsed.query, keep_blank_values=True)
+        if key.lower() not in TRACKING_PARAMS and not key.lower().startswith(TRACKING_PREFIXES)
+    )
+
+    path = parsed.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    return urlunparse((scheme, netloc, path, "", urlencode(query), ""))
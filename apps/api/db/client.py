@@ -1,11 +1,18 @@
+from functools import lru_cache
 from supabase import create_client, Client
 from core.config import get_settings
 
 settings = get_settings()
 
 url: str = settings.NEXT_PUBLIC_SUPABASE_URL
-key: str = settings.NEXT_PUBLIC_SUPABASE_ANON_KEY
+# Server-side client: the service role bypasses RLS, which keeps results, notion_connections and
+# usage_logs unreachable with the public anon key
+key: str = settings.SUPABASE_SERVICE_ROLE_KEY or settings.NEXT_PUBLIC_SUPABASE_ANON_KEY
 
 # Dependency injection for Database
+# One client per process: it keeps its HTTP connections alive across requests
+@lru_cache()
 def get_supabase_client() -> Client:
+    if not settings.SUPABASE_SERVICE_ROLE_KEY:
+        print("SUPABASE_SERVICE_ROLE_KEY is not set; using the anon key, so RLS-protected tables will be unreachable")
     return create_client(url, key)
@@ -17,18 +17,86 @@ CREATE TABLE users (
 );
 
 -- Usage tracking to prevent abuse and trigger paywalls
+-- Partitioned by month so quota counts and analytics only touch the current partition
 CREATE TABLE usage_logs (
-    id UUID PRIMARY KEY DEFAULT uuid_generate_v4(),
+    id UUID NOT NULL DEFAULT uuid_generate_v4(),
     user_id UUID REFERENCES users(id) ON DELETE CASCADE,
     url_processed TEXT NOT NULL,
+    job_id UUID,
+    status VARCHAR(20),
     tokens_used INT,
+    tokens_in INT,
+    tokens_out INT,
+    tokens_saved INT, -- estimated input tokens removed by the reducer before the LLM
+    cost_usd NUMERIC(12, 6),
     model_used VARCHAR(50),
-    created_at TIMESTAMPTZ DEFAULT NOW()
+    extraction_method VARCHAR(30),
+    stage_durations_ms JSONB,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Per-user monthly usage lookups (quota seeding/reconciliation)
+CREATE INDEX idx_usage_logs_user_created ON usage_logs (user_id, created_at);
+
+-- Creates the partition for the month containing `month_start`.
+-- Run ahead of each month, e.g. with pg_cron: SELECT create_usage_logs_partition((date_trunc('month', NOW()) + INTERVAL '1 month')::date);
+CREATE OR REPLACE FUNCTION create_usage_logs_partition(month_start DATE) RETURNS void AS $$
+DECLARE
+    partition_start DATE := date_trunc('month', month_start)::date;
+BEGIN
+    EXECUTE format(
+        'CREATE TABLE IF NOT EXISTS %I PARTITION OF usage_logs FOR VALUES FROM (%L) TO (%L)',
+        'usage_logs_' || to_char(partition_start, 'YYYY_MM'),
+        partition_start,
+        (partition_start + INTERVAL '1 month')::date
+    );
+END;
+$$ LANGUAGE plpgsql;
+
+SELECT create_usage_logs_partition(NOW()::date);
+SELECT create_usage_logs_partition((NOW() + INTERVAL '1 month')::date);
+
+-- Catches rows for months whose partition wasn't created in time
+CREATE TABLE usage_logs_default PARTITION OF usage_logs DEFAULT;
+
+-- Finished summaries, the durable tier behind /status and /history (Redis only keeps recent ones)
+CREATE TABLE results (
+    job_id UUID PRIMARY KEY,
+    user_id UUID REFERENCES users(id) ON DELETE CASCADE,
+    url TEXT NOT NULL,
+    title TEXT,
+    tags TEXT[] NOT NULL DEFAULT '{}',
+    category VARCHAR(50),
+    priority VARCHAR(20),
+    language VARCHAR(30),
+    content BYTEA NOT NULL, -- zstd-compressed JSON of the job result
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+-- Keyset pagination of a user's history, newest first
+CREATE INDEX idx_results_user_created ON results (user_id, created_at DESC, job_id DESC);
+-- Tag filters (tags @> ARRAY['...'])
+CREATE INDEX idx_results_tags ON results USING GIN (tags);
+
+-- Notion workspace each user exported to; tokens are only read by the API and worker (service role)
+CREATE TABLE notion_connections (
+    user_id UUID PRIMARY KEY REFERENCES users(id) ON DELETE CASCADE,
+    workspace_id VARCHAR(64) NOT NULL,
+    workspace_name TEXT,
+    bot_id VARCHAR(64),
+    access_token TEXT NOT NULL,
+    target_page_id VARCHAR(64), -- page exports are created under
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
 );
 
 -- RLS (Row Level Security) Policies
+-- The API and worker connect with the service role (SUPABASE_SERVICE_ROLE_KEY), which bypasses RLS.
+-- Tables without a policy below are therefore server-only: the anon key can't read or write them
 ALTER TABLE users ENABLE ROW LEVEL SECURITY;
 ALTER TABLE usage_logs ENABLE ROW LEVEL SECURITY;
+ALTER TABLE results ENABLE ROW LEVEL SECURITY;
+ALTER TABLE notion_connections ENABLE ROW LEVEL SECURITY;
 
 -- Users can only read their own data
 CREATE POLICY "Users can view own profile" 
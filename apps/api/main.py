@@ -1,20 +1,31 @@
 from fastapi import FastAPI, HTTPException, Depends, Request, BackgroundTasks, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from dotenv import load_dotenv
-import os
 import asyncio
+import secrets
 import uuid
 from arq import create_pool
 from arq.connections import RedisSettings
+from arq.jobs import Job
 from core.config import get_settings
-from core.rate_limit import RateLimitService
-from core.auth import UserProfile, check_usage_quota
+from core.rate_limit import enforce_rate_limit
+from core.auth import UserProfile, check_usage_quota, consume_usage_quota, get_user_profile, refund_usage_quota
+from core.profile_cache import ProfileCache
+from core.metrics import render_metrics, PROCESS_REQUESTS, QUEUE_DEPTH
+from db.client import get_supabase_client
 from pydantic import BaseModel
-from services.scraper import ScraperService
-from services.youtube import YouTubeService
-from services.llm import LLMService
-from datetime import datetime
+from services.cache import ResultCache
+from services.events import JobEvents
+from services.batch import BatchStore
+from services.queue import FairQueue, enforce_in_flight_cap
+from services.results import ResultStore
+from services.usage_log import UsageLogBuffer
+from services.notion import NotionService, NotionError
+from services.notion_export import NotionExportStore
 from urllib.parse import urlparse
+from core.urls import normalize_url
+import json
 
 load_dotenv()
 settings = get_settings()
@@ -29,14 +40,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["RateLimit-Limit", "RateLimit-Remaining", "RateLimit-Reset", "Retry-After"],
 )
 
 # Global Redis Pool
 redis_pool = None
+profile_invalidation_task = None
+# Rows for admissions answered here without a job (cache hits, deduplicated submissions)
+usage_log = None
 
 @app.on_event("startup")
 async def startup_event():
-    global redis_pool
+    global redis_pool, profile_invalidation_task, usage_log
     # Initialize the Arq connection pool
     redis_pool = await create_pool(
         RedisSettings(
@@ -45,56 +60,70 @@ async def startup_event():
             database=0
         )
     )
+    # Warm the shared Supabase client and keep cached profiles in sync across API processes
+    get_supabase_client()
+    profile_invalidation_task = asyncio.create_task(ProfileCache.listen_for_invalidations())
+    usage_log = UsageLogBuffer(get_supabase_client())
+    await usage_log.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     global redis_pool
+    if profile_invalidation_task:
+        profile_invalidation_task.cancel()
+    if usage_log:
+        await usage_log.stop()
     if redis_pool:
-        redis_pool.close()
-        await redis_pool.wait_closed()
-
-# The actual task logic. Arq injects `ctx` as the first argument.
-async def process_url_task(ctx, job_id: str, url: str, user_id: str, language: str = "Auto"):
-    print(f"Processing URL: {url} (Job: {job_id}) Language: {language}")
-    
-    try:
-        content = ""
-        # 1. Determine type (YouTube vs Web)
-        if "youtube.com" in url or "youtu.be" in url:
-            yt_service = YouTubeService()
-            result = await yt_service.process_video(url)
-            content = result.get("content", "")
-        else:
-            from services.scraper import ScraperService
-            result = await ScraperService.extract_content(url)
-            content = result.get("content", "")
-            
-        # 2. Summarize
-        if content:
-             import json
-             summary_json_str = await LLMService.summarize_content(content, language=language)
-             try:
-                 summary_data = json.loads(summary_json_str)
-             except:
-                 summary_data = {"summary": summary_json_str} # Fallback if parsing fails
-
-             return {
-                 "data": summary_data,
-                 "original_url": url,
-                 "processed_at": str(datetime.now())
-             }
-        else:
-             raise Exception("No content extracted")
-             
-    except Exception as e:
-        print(f"Job failed: {e}")
-        raise e
+        await redis_pool.aclose()
 
 class ProcessRequest(BaseModel):
     url: str
     user_id: str = "demo_user"
     language: str = "Auto"
 
+class BatchProcessRequest(BaseModel):
+    urls: list[str]
+    user_id: str = "demo_user"
+    language: str = "Auto"
+
+class NotionConnectRequest(BaseModel):
+    code: str
+    state: str
+
+class NotionExportRequest(BaseModel):
+    tag: str = None
+
+async def shed_if_overloaded(profile: UserProfile):
+    """
+    Admission control: estimates how long new work from this tier would wait and rejects it with
+    503 + Retry-After once that exceeds the tier's max_wait_seconds, so queue latency stays bounded
+    under overload instead of the backlog growing without limit. Returns the estimate.
+    """
+    try:
+        estimate = await FairQueue.estimate_wait(redis_pool, profile.tier)
+    except Exception as e:
+        print(f"Queue estimate unavailable, admitting request: {e}")
+        return None
+
+    max_wait = FairQueue.tier_config(profile.tier).get("max_wait_seconds")
+    if max_wait is not None and estimate["wait_seconds"] > max_wait:
+        PROCESS_REQUESTS.labels(result="shed").inc()
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="We're processing a lot of links right now. Please try again shortly.",
+            headers={"Retry-After": str(max(1, int(estimate["wait_seconds"] - max_wait + 0.999)))}
+        )
+    return estimate
+
+async def admit_process(request: ProcessRequest, profile: UserProfile = Depends(get_user_profile)):
+    # Cached or already-running links don't add to the queue, so they are never shed
+    if redis_pool and await ResultCache.has(redis_pool, ResultCache.make_key(request.url, request.language)):
+        return None
+    return await shed_if_overloaded(profile)
+
+async def admit_batch(profile: UserProfile = Depends(get_user_profile)):
+    return await shed_if_overloaded(profile)
+
 @app.get("/")
 def read_root():
     return {"message": "Link-Collector API v2.0 is running (Redis Production Mode)", "status": "ok"}
@@ -103,28 +132,211 @@ def read_root():
 def health_check():
     return {"status": "healthy"}
 
-@app.post("/process")
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    if redis_pool:
+        try:
+            for tier, depth in (await FairQueue.depths(redis_pool)).items():
+                QUEUE_DEPTH.labels(tier=tier).set(depth)
+        except Exception as e:
+            print(f"Queue depth unavailable: {e}")
+    body, content_type = render_metrics()
+    return Response(content=body, media_type=content_type)
+
+@app.get("/queue")
+async def queue_status():
+    global redis_pool
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis connection failed")
+    return {
+        "depth": await FairQueue.depths(redis_pool),
+        "throughput": await FairQueue.throughput(redis_pool),
+        "estimated_wait_seconds": {
+            tier: (await FairQueue.estimate_wait(redis_pool, tier))["wait_seconds"] for tier in settings.QUEUE_TIERS
+        },
+    }
+
+def log_usage(request: ProcessRequest, profile: UserProfile, job_id: str, outcome: str):
+    # These admissions took a credit too, and a lost quota counter is re-seeded from usage_logs
+    if usage_log:
+        usage_log.add(profile.user_id, request.url, job_id=job_id, status=outcome, extraction_method="cache")
+
+def cached_response(request: ProcessRequest, profile: UserProfile, cached: dict, background_tasks: BackgroundTasks):
+    # A cached summary still goes into the caller's history, as its own row; written after responding
+    cached["original_url"] = request.url
+    job_id = str(uuid.uuid4())
+    background_tasks.add_task(ResultStore.save, get_supabase_client(), job_id, profile.user_id, cached, request.language)
+    log_usage(request, profile, job_id, "cached")
+    PROCESS_REQUESTS.labels(result="cache_hit").inc()
+    return {
+        "job_id": job_id,
+        "status": "completed",
+        "result": cached,
+        "cached": True,
+        "remaining_quota": profile.remaining_credits
+    }
+
+@app.post("/process", dependencies=[Depends(enforce_rate_limit), Depends(enforce_in_flight_cap)])
 async def process_url(
     request: ProcessRequest, 
+    background_tasks: BackgroundTasks,
+    admission: dict = Depends(admit_process),
     profile: UserProfile = Depends(check_usage_quota)
 ):
     global redis_pool
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis connection failed")
     
-    # Generate Job ID
+    # Serve identical links straight from the summary cache without touching the queue
+    cache_key = ResultCache.make_key(request.url, request.language)
+    cached = await ResultCache.get(redis_pool, cache_key)
+    if cached:
+        return cached_response(request, profile, cached, background_tasks)
+    
+    # Generate Job ID, or attach to the job already processing this link
     job_id = str(uuid.uuid4())
+    owner_job_id = await ResultCache.claim(redis_pool, cache_key, job_id)
+    if owner_job_id is None:
+        # Jobs for this link kept finishing under us; its summary is about to be (or is) cached
+        await refund_usage_quota(profile)
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="This link is being processed right now. Please try again shortly.",
+            headers={"Retry-After": "1"}
+        )
+    if owner_job_id != job_id:
+        # The running job adds its summary to this user's history too. If it finished in the
+        # meantime its summary is cached (unless it failed)
+        if not await ResultCache.attach(redis_pool, cache_key, owner_job_id, profile.user_id):
+            cached = await ResultCache.get(redis_pool, cache_key)
+            if cached:
+                return cached_response(request, profile, cached, background_tasks)
+        log_usage(request, profile, owner_job_id, "deduplicated")
+        PROCESS_REQUESTS.labels(result="deduplicated").inc()
+        return {
+            "job_id": owner_job_id,
+            "status": "queued",
+            "deduplicated": True,
+            "remaining_quota": profile.remaining_credits
+        }
     
+    # Reserve an in-flight slot; the returned time orders the job fairly among tiers and users
+    admitted, _, defer_until = await FairQueue.admit(redis_pool, profile.user_id, profile.tier, job_id)
+    if not admitted:
+        await ResultCache.release(redis_pool, cache_key, job_id)
+        await refund_usage_quota(profile)
+        PROCESS_REQUESTS.labels(result="in_flight_cap").inc()
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many links processing at once. Wait for one to finish."
+        )
+
     # Enqueue Background Task via Arq directly to Redis
-    if redis_pool:
-        await redis_pool.enqueue_job("process_url_task", job_id, request.url, profile.user_id, request.language, _job_id=job_id)
-    else:
-        raise HTTPException(status_code=500, detail="Redis connection failed")
+    try:
+        await redis_pool.enqueue_job(
+            "process_url_task", job_id, request.url, profile.user_id, request.language,
+            tier=profile.tier, _job_id=job_id, _defer_until=defer_until
+        )
+    except Exception:
+        await ResultCache.release(redis_pool, cache_key, job_id)
+        await FairQueue.finished(redis_pool, profile.user_id, profile.tier, job_id)
+        await refund_usage_quota(profile)
+        raise
+    await JobEvents.publish(redis_pool, job_id, "queued")
+    PROCESS_REQUESTS.labels(result="queued").inc()
+    try:
+        eta = (await FairQueue.estimate_wait(redis_pool, profile.tier, defer_until))["wait_seconds"]
+    except Exception:
+        eta = admission["wait_seconds"] if admission else None
     
     return {
         "job_id": job_id, 
         "status": "queued",
-        "remaining_quota": profile.monthly_credits # Real tracking to be implemented
+        # Estimated seconds until a worker starts the job
+        "eta_seconds": eta,
+        "remaining_quota": profile.remaining_credits
+    }
+
+@app.post("/process/batch", dependencies=[Depends(enforce_rate_limit)])
+async def process_batch(
+    request: BatchProcessRequest,
+    admission: dict = Depends(admit_batch),
+    profile: UserProfile = Depends(get_user_profile)
+):
+    """
+    Summarizes up to BATCH_MAX_URLS links in one job. Costs one credit per distinct link.
+    """
+    global redis_pool
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis connection failed")
+
+    # Drop blanks and duplicate links (after normalization), keeping the submitted order
+    urls = []
+    seen = set()
+    for url in request.urls:
+        url = url.strip()
+        if url and normalize_url(url) not in seen:
+            seen.add(normalize_url(url))
+            urls.append(url)
+
+    if not urls:
+        raise HTTPException(status_code=400, detail="No URLs provided")
+    if len(urls) > settings.BATCH_MAX_URLS:
+        raise HTTPException(status_code=400, detail=f"A batch can contain at most {settings.BATCH_MAX_URLS} URLs")
+
+    # Batches have their own in-flight cap; admitted before charging so a 429 costs nothing
+    batch_id = str(uuid.uuid4())
+    admitted, _, defer_until = await FairQueue.admit(
+        redis_pool, profile.user_id, profile.tier, batch_id, batch_size=len(urls)
+    )
+    if not admitted:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many batches processing at once. Wait for one to finish."
+        )
+    try:
+        await consume_usage_quota(profile, get_supabase_client(), credits=len(urls))
+    except Exception:
+        await FairQueue.finished(redis_pool, profile.user_id, profile.tier, batch_id)
+        raise
+
+    try:
+        await BatchStore.create(redis_pool, batch_id, urls, profile.user_id, request.language)
+        await redis_pool.enqueue_job(
+            "process_batch_task", batch_id, urls, profile.user_id, request.language,
+            tier=profile.tier, _job_id=batch_id, _defer_until=defer_until
+        )
+    except Exception:
+        await FairQueue.finished(redis_pool, profile.user_id, profile.tier, batch_id)
+        await refund_usage_quota(profile, len(urls))
+        raise
+    try:
+        eta = (await FairQueue.estimate_wait(redis_pool, profile.tier, defer_until))["wait_seconds"]
+    except Exception:
+        eta = admission["wait_seconds"] if admission else None
+
+    return {
+        "batch_id": batch_id,
+        "status": "queued",
+        "total": len(urls),
+        "eta_seconds": eta,
+        "remaining_quota": profile.remaining_credits
     }
 
+@app.get("/process/batch/{batch_id}")
+async def get_batch_status(batch_id: str, include_items: bool = True, profile: UserProfile = Depends(get_user_profile)):
+    global redis_pool
+    if not redis_pool:
+         raise HTTPException(status_code=500, detail="Redis connection failed")
+
+    # Other users' batches look like missing ones
+    if await BatchStore.owner(redis_pool, batch_id) != profile.user_id:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    batch = await BatchStore.get(redis_pool, batch_id, include_items=include_items)
+    if not batch:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return batch
+
 @app.get("/status/{job_id}")
 async def get_job_status(job_id: str):
     global redis_pool
@@ -132,27 +344,227 @@ async def get_job_status(job_id: str):
          raise HTTPException(status_code=500, detail="Redis connection failed")
          
     # Query Arq for the Job Status
-    job = await redis_pool.job(job_id)
-    if not job:
-        raise HTTPException(status_code=404, detail="Job not found")
-        
+    job = Job(job_id, redis_pool)
     status = await job.status()
     # status is an Enum: queued, deferred, in_progress, complete, not_found
+    if status.value == "not_found":
+        # Older results have left Redis but are kept in Postgres
+        try:
+            result = await ResultStore.get(get_supabase_client(), job_id)
+        except Exception as e:
+            print(f"Result store read failed for {job_id}: {e}")
+            result = None
+        if not result:
+            raise HTTPException(status_code=404, detail="Job not found")
+        return {"status": "completed", "result": result}
     
     if status.value == "complete":
-        result = await job.result()
+        try:
+            result = await job.result(timeout=0)
+        except asyncio.CancelledError:
+            return {"status": "cancelled"}
+        except Exception as e:
+            return {"status": "failed", "error": str(e)}
         return {
             "status": "completed",
             "result": result
         }
     elif status.value == "in_progress":
          return {"status": "processing"}
-    elif status.value == "queued":
+    else:
          return {"status": "queued"}
+
+@app.delete("/status/{job_id}")
+async def cancel_job(job_id: str, profile: UserProfile = Depends(get_user_profile)):
+    """
+    Cancels a queued or running job (single link or batch) owned by the caller.
+    """
+    global redis_pool
+    if not redis_pool:
+         raise HTTPException(status_code=500, detail="Redis connection failed")
+
+    job = Job(job_id, redis_pool)
+    info = await job.info()
+    # Both task signatures are (id, url(s), user_id, language); other users' jobs look like missing ones
+    if not info or len(info.args) < 3 or info.args[2] != profile.user_id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    job_status = await job.status()
+    if job_status.value == "complete":
+        raise HTTPException(status_code=409, detail="Job already finished")
+
+    # Queued jobs sit behind the rest of the backlog; move them to the front so a worker drops them right away
+    if job_status.value in ("queued", "deferred"):
+        await redis_pool.zadd(redis_pool.default_queue_name, {job_id: 1}, xx=True)
+    try:
+        cancelled = await job.abort(timeout=settings.JOB_CANCEL_WAIT_SECONDS)
+    except asyncio.TimeoutError:
+        cancelled = False
+
+    # A job aborted before it started never runs its own cleanup
+    tier = info.kwargs.get("tier", "FREE")
+    await FairQueue.finished(redis_pool, profile.user_id, tier, job_id)
+    if info.function == "process_url_task":
+        language = info.args[3] if len(info.args) > 3 else "Auto"
+        await ResultCache.release(redis_pool, ResultCache.make_key(info.args[1], language), job_id)
+        await JobEvents.publish(redis_pool, job_id, "failed", error="Job cancelled")
     else:
-         # Check if it failed by fetching the result
-         try:
-             await job.result()
-             return {"status": "failed", "error": "Unknown error"}
-         except Exception as e:
-             return {"status": "failed", "error": str(e)}
+        await BatchStore.set_status(redis_pool, job_id, "cancelled")
+
+    return {"job_id": job_id, "status": "cancelled" if cancelled else "cancelling"}
+
+@app.get("/history")
+async def get_history(
+    cursor: str = None,
+    limit: int = 20,
+    tag: str = None,
+    include_content: bool = False,
+    profile: UserProfile = Depends(get_user_profile)
+):
+    """
+    The caller's summaries, newest first. Pass `next_cursor` back as `cursor` for the next page.
+    """
+    limit = max(1, min(limit, settings.HISTORY_MAX_PAGE_SIZE))
+    try:
+        items, next_cursor = await ResultStore.history(
+            get_supabase_client(), profile.user_id, limit=limit, cursor=cursor, tag=tag, include_content=include_content
+        )
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return {"items": items, "next_cursor": next_cursor}
+
+@app.get("/notion/authorize")
+async def notion_authorize(profile: UserProfile = Depends(get_user_profile)):
+    """
+    URL to send the user to for connecting Notion. Notion redirects back to NOTION_REDIRECT_URI
+    with `code` and `state`, which the app posts to /notion/connect.
+    """
+    global redis_pool
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis connection failed")
+    state = secrets.token_urlsafe(24)
+    await redis_pool.set(f"notion-oauth:{state}", profile.user_id, ex=settings.NOTION_OAUTH_STATE_TTL_SECONDS)
+    return {"url": NotionService.authorize_url(state)}
+
+@app.post("/notion/connect")
+async def notion_connect(request: NotionConnectRequest, profile: UserProfile = Depends(get_user_profile)):
+    global redis_pool
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis connection failed")
+    owner = await redis_pool.getdel(f"notion-oauth:{request.state}")
+    if not owner or (owner.decode("utf-8") if isinstance(owner, bytes) else owner) != profile.user_id:
+        raise HTTPException(status_code=400, detail="Invalid or expired state")
+    try:
+        token = await NotionService.exchange_code_for_token(request.code)
+    except NotionError as e:
+        print(f"Notion code exchange failed: {e}")
+        raise HTTPException(status_code=400, detail="Notion authorization failed")
+    connection = await NotionService.save_connection(get_supabase_client(), profile.user_id, token)
+    return {"workspace_id": connection["workspace_id"], "workspace_name": connection["workspace_name"]}
+
+@app.post("/notion/export", dependencies=[Depends(enforce_rate_limit)])
+async def notion_export(request: NotionExportRequest, profile: UserProfile = Depends(get_user_profile)):
+    """
+    Exports the caller's history (optionally one tag) to Notion in the background. Poll
+    GET /notion/export/{export_id} for progress.
+    """
+    global redis_pool
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis connection failed")
+    if not await NotionService.get_connection(get_supabase_client(), profile.user_id):
+        raise HTTPException(status_code=400, detail="Connect Notion first")
+
+    export_id = str(uuid.uuid4())
+    if not await NotionExportStore.create(redis_pool, export_id, profile.user_id, request.tag):
+        active = await NotionExportStore.active(redis_pool, profile.user_id)
+        raise HTTPException(status_code=409, detail=f"Export {active} is already running")
+    await redis_pool.enqueue_job("export_to_notion_task", export_id, profile.user_id, _job_id=f"{export_id}:1")
+    return {"export_id": export_id, "status": "queued"}
+
+@app.get("/notion/export/{export_id}")
+async def notion_export_status(export_id: str, profile: UserProfile = Depends(get_user_profile)):
+    global redis_pool
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis connection failed")
+    state = await NotionExportStore.get(redis_pool, export_id)
+    if not state or state["user_id"] != profile.user_id:
+        raise HTTPException(status_code=404, detail="Export not found")
+    return NotionExportStore.public(export_id, state)
+
+@app.post("/notion/export/{export_id}/resume")
+async def notion_export_resume(export_id: str, profile: UserProfile = Depends(get_user_profile)):
+    """
+    Continues a failed or cancelled export from the first summary that isn't in Notion yet. Also
+    takes over one still marked queued or exporting once it no longer holds the user's export slot:
+    its worker died without recording a failure and the slot expired after NOTION_EXPORT_TIMEOUT_SECONDS.
+    """
+    global redis_pool
+    if not redis_pool:
+        raise HTTPException(status_code=500, detail="Redis connection failed")
+    state = await NotionExportStore.get(redis_pool, export_id)
+    if not state or state["user_id"] != profile.user_id:
+        raise HTTPException(status_code=404, detail="Export not found")
+    stale = (
+        state["status"] in ("queued", "exporting")
+        and await NotionExportStore.active(redis_pool, profile.user_id) != export_id
+    )
+    if state["status"] not in ("failed", "cancelled") and not stale:
+        raise HTTPException(status_code=409, detail=f"Export is {state['status']}")
+    if not await NotionExportStore.claim(redis_pool, profile.user_id, export_id):
+        active = await NotionExportStore.active(redis_pool, profile.user_id)
+        raise HTTPException(status_code=409, detail=f"Export {active} is already running")
+
+    attempts = state["attempts"] + 1
+    await NotionExportStore.update(redis_pool, export_id, status="queued", error="", attempts=attempts)
+    # arq keeps finished job IDs around, so each attempt gets its own
+    await redis_pool.enqueue_job("export_to_notion_task", export_id, profile.user_id, _job_id=f"{export_id}:{attempts}")
+    return NotionExportStore.public(export_id, {**state, "status": "queued", "error": ""})
+
+@app.get("/stream/{job_id}")
+async def stream_job_status(job_id: str, request: Request):
+    """
+    Server-Sent Events feed of a job's stage events. /status stays available as a polling fallback.
+    """
+    global redis_pool
+    if not redis_pool:
+         raise HTTPException(status_code=500, detail="Redis connection failed")
+
+    def finished_event(job_status: dict):
+        # /status's answer as a terminal event, or None while the job is still queued or running
+        if job_status["status"] not in ("completed", "failed", "cancelled"):
+            return None
+        stage = "done" if job_status["status"] == "completed" else "failed"
+        return {"job_id": job_id, "stage": stage, **{k: v for k, v in job_status.items() if k != "status"}}
+
+    def format_event(event: dict) -> str:
+        return f"event: {event['stage']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    # Jobs that finished before events were recorded (or whose events expired) are answered from Arq
+    if not await JobEvents.last(redis_pool, job_id):
+        event = finished_event(await get_job_status(job_id))
+        if event:
+            return StreamingResponse(iter([format_event(event)]), media_type="text/event-stream")
+
+    async def event_source():
+        yield "retry: 3000\n\n"
+        async for event in JobEvents.listen(redis_pool, job_id):
+            if await request.is_disconnected():
+                break
+            if event is None:
+                # A worker that died mid-job never publishes a terminal event; once Arq has
+                # finished with the job (or forgotten it), end the stream with its outcome
+                try:
+                    event = finished_event(await get_job_status(job_id))
+                except HTTPException:
+                    event = {"job_id": job_id, "stage": "failed", "error": "Job not found"}
+                if event is None:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield format_event(event)
+                break
+            yield format_event(event)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
@@ -0,0 +1,332 @@
+"""
+Job logic run by the arq worker. Kept apart from main.py so workers don't import the web app,
+and so the heavy per-tier dependencies (Playwright, yt-dlp, litellm, ...) load only when a job
+first needs them.
+"""
+import asyncio
+import json
+import time
+import uuid
+from datetime import datetime
+from core.config import get_settings
+from core.metrics import (
+    span, observe_queue_wait, EXTRACTION_RESULTS, JOB_SECONDS, NEAR_DUP_LOOKUPS, NEAR_DUP_LOOKUP_SECONDS,
+    REDUCER_TOKENS_SAVED, REDUCER_SECONDS
+)
+from core.urls import get_youtube_video_id
+from services.cache import ResultCache
+from services.events import JobEvents
+from services.batch import BatchStore, DomainScheduler
+from services.queue import FairQueue
+from services.results import ResultStore
+from services.near_duplicates import NearDuplicateIndex, minhash_signature
+from services.reducer import reduce_text
+from services.notion import NotionClient, NotionService
+from services.notion_export import NotionExportStore, NotionExporter
+from db.client import get_supabase_client
+
+settings = get_settings()
+
+
+async def find_near_duplicate(redis, content: str, language: str):
+    """
+    Fingerprints extracted text and looks for an already-summarized near-identical document
+    (syndicated copy, AMP page, mirror). Returns (signature, cached_result or None); the signature
+    is None when the text is too short to fingerprint or the lookup failed.
+    """
+    started = time.perf_counter()
+    try:
+        signature = await asyncio.to_thread(minhash_signature, content)
+        if signature is None:
+            NEAR_DUP_LOOKUPS.labels(result="skipped").inc()
+            return None, None
+        cache_key, score = await NearDuplicateIndex.find(redis, signature, language)
+        cached = await ResultCache.get(redis, cache_key) if cache_key else None
+    except Exception as e:
+        print(f"Near-duplicate lookup failed: {e}")
+        NEAR_DUP_LOOKUPS.labels(result="error").inc()
+        return None, None
+    NEAR_DUP_LOOKUP_SECONDS.observe(time.perf_counter() - started)
+    NEAR_DUP_LOOKUPS.labels(result="hit" if cached else "miss").inc()
+    if cached:
+        print(f"Near-duplicate of {cached.get('original_url')} (similarity {score:.2f}), reusing its summary")
+    return signature, cached
+
+
+async def summarize_url(ctx, url: str, language: str = "Auto", on_stage=None, usage: dict = None):
+    """
+    Extracts and summarizes a single URL. Shared by single-link and batch jobs.
+    If `usage` is given it is filled with the extraction method, LLM model/tokens/cost and stage durations.
+    """
+    from services.llm import LLMService
+
+    usage = usage if usage is not None else {}
+    usage["stage_durations_ms"] = {}
+    started = time.perf_counter()
+    content = ""
+    source = "youtube" if get_youtube_video_id(url) else "web"
+    # 1. Determine type (YouTube vs Web)
+    if source == "youtube":
+        from services.youtube import YouTubeService
+        yt_service = YouTubeService(redis=ctx.get("redis"))
+        result = await yt_service.process_video(url, on_stage=on_stage)
+        content = result.get("content", "")
+    else:
+        from services.scraper import ScraperService
+        result = await ScraperService.extract_content(
+            url,
+            browser_pool=ctx.get("browser_pool"),
+            http_fetcher=ctx.get("http_fetcher"),
+            extract_pool=ctx.get("extract_pool"),
+            on_stage=on_stage,
+            redis=ctx.get("redis")
+        )
+        content = result.get("content", "")
+    usage["extraction_method"] = result.get("method")
+    EXTRACTION_RESULTS.labels(source=source, method=result.get("method") or "failed").inc()
+    usage["stage_durations_ms"]["extract"] = round((time.perf_counter() - started) * 1000)
+
+    if not content:
+        raise Exception("No content extracted")
+
+    # 2. Drop what we'd pay tokens for without gaining anything: repeats, boilerplate, caption filler;
+    # rank down to the token budget. Runs on a thread since pages and transcripts can be megabytes
+    reduce_started = time.perf_counter()
+    content, reduction = await asyncio.to_thread(
+        reduce_text, content, transcript=result.get("method") in ("transcript_api", "whisper")
+    )
+    REDUCER_SECONDS.observe(time.perf_counter() - reduce_started)
+    REDUCER_TOKENS_SAVED.labels(source=source).inc(reduction["tokens_saved"])
+    usage["tokens_saved"] = reduction["tokens_saved"]
+    usage["stage_durations_ms"]["reduce"] = round((time.perf_counter() - reduce_started) * 1000)
+    print(
+        f"Reducer: ~{reduction['tokens_before']} -> ~{reduction['tokens_after']} tokens"
+        f"{' (ranked to budget)' if reduction['ranked'] else ''}"
+    )
+
+    # 3. Reuse the summary of a near-identical document that was already summarized
+    redis = ctx.get("redis")
+    signature = None
+    if redis and settings.NEAR_DUP_ENABLED:
+        fingerprint_started = time.perf_counter()
+        signature, duplicate = await find_near_duplicate(redis, content, language)
+        usage["stage_durations_ms"]["fingerprint"] = round((time.perf_counter() - fingerprint_started) * 1000)
+        if duplicate:
+            usage["near_duplicate_of"] = duplicate.get("original_url")
+            return {
+                "data": duplicate["data"],
+                "original_url": url,
+                "near_duplicate_of": duplicate.get("original_url"),
+                "processed_at": str(datetime.now())
+            }
+
+    # 4. Summarize
+    if on_stage:
+        await on_stage("summarizing")
+    summarize_started = time.perf_counter()
+    summary_json_str = await LLMService.summarize_content(content, language=language, usage=usage)
+    usage["stage_durations_ms"]["summarize"] = round((time.perf_counter() - summarize_started) * 1000)
+    try:
+        summary_data = json.loads(summary_json_str)
+    except:
+        summary_data = {"summary": summary_json_str} # Fallback if parsing fails
+
+    # Index the document so later near-duplicates can reuse this summary (it is cached under this key)
+    if signature and "error" not in summary_data:
+        try:
+            await NearDuplicateIndex.add(redis, signature, ResultCache.make_key(url, language), language)
+        except Exception as e:
+            print(f"Near-duplicate index write failed: {e}")
+
+    return {
+        "data": summary_data,
+        "original_url": url,
+        "processed_at": str(datetime.now())
+    }
+
+def log_usage(ctx, user_id: str, url: str, job_id: str, outcome: str, usage: dict, started: float):
+    """
+    One usage_logs row per admitted link (it consumed a credit); buffered and bulk-inserted by the worker.
+    """
+    if not ctx.get("usage_log"):
+        return
+    durations = usage.get("stage_durations_ms", {})
+    durations["total"] = round((time.perf_counter() - started) * 1000)
+    tokens_in = usage.get("prompt_tokens")
+    tokens_out = usage.get("completion_tokens")
+    ctx["usage_log"].add(
+        user_id,
+        url,
+        job_id=job_id,
+        status=outcome,
+        model_used=usage.get("model"),
+        tokens_in=tokens_in,
+        tokens_out=tokens_out,
+        tokens_used=tokens_in + tokens_out if tokens_in is not None else None,
+        tokens_saved=usage.get("tokens_saved"),
+        cost_usd=usage.get("cost_usd"),
+        extraction_method=usage.get("extraction_method"),
+        stage_durations_ms=durations
+    )
+
+# The actual task logic. Arq injects `ctx` as the first argument.
+async def process_url_task(ctx, job_id: str, url: str, user_id: str, language: str = "Auto", tier: str = "FREE"):
+    print(f"Processing URL: {url} (Job: {job_id}) Language: {language} Tier: {tier}")
+    redis = ctx.get("redis")
+    cache_key = ResultCache.make_key(url, language)
+    usage = {}
+    outcome = "failed"
+    started = time.perf_counter()
+    observe_queue_wait(ctx, "process_url_task")
+    if redis:
+        await FairQueue.started(redis, tier, job_id)
+
+    async def on_stage(stage: str):
+        if redis:
+            await JobEvents.publish(redis, job_id, stage)
+    
+    try:
+        timeout = FairQueue.job_timeout(tier)
+        with span("process_url_task", job_id=job_id, url=url, tier=tier):
+            try:
+                result = await asyncio.wait_for(
+                    summarize_url(ctx, url, language, on_stage=on_stage, usage=usage), timeout=timeout
+                )
+            except asyncio.TimeoutError:
+                outcome = "timeout"
+                raise Exception(f"Timed out after {timeout}s")
+        outcome = "error" if "error" in result["data"] else "completed"
+        # Don't cache LLM failures, so the next submission gets a fresh attempt
+        if redis and "error" not in result["data"]:
+            await ResultCache.set(redis, cache_key, result)
+        if "error" not in result["data"]:
+            await ResultStore.save(None, job_id, user_id, result, language)
+            if redis:
+                # Users who submitted the same link while this job ran get it in their history too
+                for waiter in await ResultCache.release(redis, cache_key, job_id):
+                    if waiter != user_id:
+                        await ResultStore.save(None, str(uuid.uuid4()), waiter, result, language)
+        if redis:
+            await JobEvents.publish(redis, job_id, "done", result=result)
+        return result
+             
+    except asyncio.CancelledError:
+        # Aborted through DELETE /status/{job_id}
+        outcome = "cancelled"
+        if redis:
+            await JobEvents.publish(redis, job_id, "failed", error="Job cancelled")
+        raise
+    except Exception as e:
+        print(f"Job failed: {e}")
+        if redis:
+            await JobEvents.publish(redis, job_id, "failed", error=str(e))
+        raise e
+    finally:
+        JOB_SECONDS.labels(function="process_url_task", outcome=outcome).observe(time.perf_counter() - started)
+        if redis:
+            await ResultCache.release(redis, cache_key, job_id)
+            await FairQueue.finished(redis, user_id, tier, job_id)
+        log_usage(ctx, user_id, url, job_id, outcome, usage, started)
+
+async def process_batch_task(ctx, batch_id: str, urls: list, user_id: str, language: str = "Auto", tier: str = "FREE"):
+    print(f"Processing batch {batch_id}: {len(urls)} URLs Language: {language} Tier: {tier}")
+    redis = ctx["redis"]
+    # A batch never runs more links at once than its owner may have single jobs in flight
+    scheduler = DomainScheduler(
+        max_concurrency=min(settings.BATCH_MAX_CONCURRENCY, FairQueue.tier_config(tier)["max_in_flight"])
+    )
+    started = time.perf_counter()
+    observe_queue_wait(ctx, "process_batch_task")
+    await FairQueue.started(redis, tier, batch_id)
+    await BatchStore.set_status(redis, batch_id, "processing")
+
+    async def run_one(index: int, url: str):
+        cache_key = ResultCache.make_key(url, language)
+        # Each link is billed, logged and kept in history like a job of its own. The ID is derived
+        # from the batch, so a retried batch upserts the same result rows
+        job_id = str(uuid.uuid5(uuid.UUID(batch_id), str(index)))
+        usage = {}
+        outcome = "failed"
+        item_started = time.perf_counter()
+        try:
+            result = await ResultCache.get(redis, cache_key)
+            if result:
+                result["original_url"] = url
+                usage["extraction_method"] = "cache"
+            else:
+                async with scheduler.slot(url):
+                    result = await summarize_url(ctx, url, language, usage=usage)
+                if "error" not in result["data"]:
+                    await ResultCache.set(redis, cache_key, result)
+            outcome = "error" if "error" in result["data"] else "completed"
+            if "error" not in result["data"]:
+                await ResultStore.save(None, job_id, user_id, result, language)
+            await BatchStore.record(redis, batch_id, index, url, result=result, job_id=job_id)
+        except asyncio.CancelledError:
+            outcome = "cancelled"
+            raise
+        except Exception as e:
+            print(f"Batch {batch_id} item {url} failed: {e}")
+            await BatchStore.record(redis, batch_id, index, url, error=str(e))
+        finally:
+            log_usage(ctx, user_id, url, job_id, outcome, usage, item_started)
+
+    try:
+        await asyncio.gather(*(run_one(index, url) for index, url in enumerate(urls)))
+    finally:
+        await FairQueue.finished(redis, user_id, tier, batch_id)
+    await BatchStore.set_status(redis, batch_id, "completed")
+    JOB_SECONDS.labels(function="process_batch_task", outcome="completed").observe(time.perf_counter() - started)
+    return await BatchStore.get(redis, batch_id, include_items=False)
+
+
+async def export_to_notion_task(ctx, export_id: str, user_id: str):
+    """
+    Bulk export of a user's history to Notion. Safe to run again for the same export: it resumes
+    from the progress saved in NotionExportStore.
+    """
+    print(f"Exporting history of {user_id} to Notion (Export: {export_id})")
+    redis = ctx["redis"]
+    supabase = get_supabase_client()
+    started = time.perf_counter()
+    observe_queue_wait(ctx, "export_to_notion_task")
+    notion = ctx.get("notion") or NotionClient(redis)
+    state = await NotionExportStore.get(redis, export_id)
+    tag = state["tag"] or None
+
+    async def fetch_page(cursor):
+        return await ResultStore.history(
+            supabase, user_id, limit=settings.NOTION_EXPORT_PAGE_SIZE, cursor=cursor, tag=tag, include_content=True
+        )
+
+    try:
+        connection = await NotionService.get_connection(supabase, user_id)
+        if not connection:
+            raise Exception("Notion is not connected")
+        # Connections made without picking a page export into the first page shared with us
+        if not connection.get("target_page_id"):
+            connection["target_page_id"] = await NotionService.find_target_page(notion, connection)
+            if not connection["target_page_id"]:
+                raise Exception("Share a Notion page with Link-Collector to export into")
+            await NotionService.set_target_page(supabase, user_id, connection["target_page_id"])
+        if not state["total"]:
+            await NotionExportStore.update(redis, export_id, total=await ResultStore.count(supabase, user_id, tag))
+        result = await NotionExporter.run(notion, redis, export_id, connection, fetch_page)
+    except asyncio.CancelledError:
+        await NotionExportStore.finish(redis, export_id, user_id, "cancelled")
+        JOB_SECONDS.labels(function="export_to_notion_task", outcome="cancelled").observe(time.perf_counter() - started)
+        raise
+    except Exception as e:
+        # Progress is kept; POST /notion/export/{export_id}/resume continues from here
+        print(f"Notion export {export_id} failed: {e}")
+        await NotionExportStore.finish(redis, export_id, user_id, "failed", error=str(e))
+        JOB_SECONDS.labels(function="export_to_notion_task", outcome="failed").observe(time.perf_counter() - started)
+        raise
+    finally:
+        if not ctx.get("notion"):
+            await notion.close()
+
+    await NotionExportStore.finish(redis, export_id, user_id, "completed")
+    JOB_SECONDS.labels(function="export_to_notion_task", outcome="completed").observe(time.perf_counter() - started)
+    print(f"Notion export {export_id}: {result['exported']} summaries in {result['requests']} requests")
+    return result
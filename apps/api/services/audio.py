@@ -1,22 +1,121 @@
-from groq import Groq
-from core.config import get_settings
+import asyncio
 import os
+import re
+from core.config import get_settings
 
 settings = get_settings()
 
+DURATION_RE = re.compile(r"Duration: (\d+):(\d+):(\d+(?:\.\d+)?)")
+SILENCE_START_RE = re.compile(r"silence_start: (-?\d+(?:\.\d+)?)")
+SILENCE_END_RE = re.compile(r"silence_end: (\d+(?:\.\d+)?)")
+
+
 class AudioService:
     def __init__(self):
-        self.client = Groq(api_key=settings.GROQ_API_KEY)
+        self._client = None
 
-    def transcribe(self, file_path: str):
+    @property
+    def client(self):
+        # Created on first transcription: most YouTube jobs never get past the transcript API
+        if self._client is None:
+            from groq import AsyncGroq
+            self._client = AsyncGroq(api_key=settings.GROQ_API_KEY, base_url=settings.GROQ_BASE_URL or None)
+        return self._client
+
+    async def transcribe(self, file_path: str, work_dir: str):
+        """
+        Re-encodes `file_path` to low-bitrate mono Opus, splits it on silences into bounded chunks
+        inside `work_dir`, transcribes the chunks concurrently and joins the text in order.
+        The caller owns `work_dir` and is responsible for removing it.
+        """
         try:
-            with open(file_path, "rb") as file:
-                transcription = self.client.audio.transcriptions.create(
-                    file=(file_path, file.read()),
-                    model="whisper-large-v3",
-                    response_format="text"
-                )
-            return transcription
+            chunks = await self.split_on_silence(file_path, work_dir)
+            print(f"Transcribing {len(chunks)} audio chunks")
+            semaphore = asyncio.Semaphore(settings.AUDIO_TRANSCRIBE_CONCURRENCY)
+
+            async def transcribe_chunk(chunk_path: str):
+                async with semaphore:
+                    with open(chunk_path, "rb") as file:
+                        data = file.read()
+                    return await self.client.audio.transcriptions.create(
+                        file=(os.path.basename(chunk_path), data),
+                        model="whisper-large-v3",
+                        response_format="text"
+                    )
+
+            texts = await asyncio.gather(*(transcribe_chunk(chunk) for chunk in chunks))
+            return "\n".join(text.strip() for text in texts if text and text.strip())
         except Exception as e:
             print(f"Groq Whisper failed: {e}")
             raise e
+
+    async def split_on_silence(self, file_path: str, work_dir: str) -> list:
+        duration, silences = await self._detect_silences(file_path)
+        cut_points = self._choose_cut_points(duration, silences)
+
+        # One ffmpeg pass: downmix to 16 kHz mono Opus (plenty for speech) and cut at the chosen points
+        pattern = os.path.join(work_dir, "chunk_%03d.ogg")
+        args = [
+            "-i", file_path, "-vn", "-ac", "1", "-ar", "16000",
+            "-c:a", "libopus", "-b:a", settings.AUDIO_BITRATE, "-application", "voip",
+            "-f", "segment", "-reset_timestamps", "1",
+        ]
+        if cut_points:
+            args += ["-segment_times", ",".join(f"{t:.2f}" for t in cut_points)]
+        else:
+            # Short enough for one request; without this the segment muxer cuts every 2 seconds
+            args += ["-segment_time", str(int(duration) + 60)]
+        await _run_ffmpeg(*args, pattern)
+
+        return sorted(
+            os.path.join(work_dir, name) for name in os.listdir(work_dir)
+            if name.startswith("chunk_") and name.endswith(".ogg")
+        )
+
+    async def _detect_silences(self, file_path: str):
+        output = await _run_ffmpeg(
+            "-i", file_path, "-vn",
+            "-af", f"silencedetect=noise={settings.AUDIO_SILENCE_DB}dB:d={settings.AUDIO_SILENCE_MIN_SECONDS}",
+            "-f", "null", "-"
+        )
+        duration = 0.0
+        match = DURATION_RE.search(output)
+        if match:
+            hours, minutes, seconds = match.groups()
+            duration = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+
+        starts = [float(v) for v in SILENCE_START_RE.findall(output)]
+        ends = [float(v) for v in SILENCE_END_RE.findall(output)]
+        # Cut in the middle of each silence
+        silences = [(max(0.0, start) + end) / 2 for start, end in zip(starts, ends)]
+        return duration, silences
+
+    @staticmethod
+    def _choose_cut_points(duration: float, silences: list) -> list:
+        """
+        Greedily picks the silence closest to every AUDIO_CHUNK_SECONDS mark, never letting a chunk
+        exceed AUDIO_MAX_CHUNK_SECONDS; falls back to a hard cut when there's no silence in range.
+        """
+        target = settings.AUDIO_CHUNK_SECONDS
+        longest = settings.AUDIO_MAX_CHUNK_SECONDS
+        cuts = []
+        last = 0.0
+        while duration - last > longest:
+            window = [s for s in silences if last + target / 2 <= s <= last + longest]
+            cut = min(window, key=lambda s: abs(s - (last + target))) if window else last + target
+            cuts.append(cut)
+            last = cut
+        return cuts
+
+
+async def _run_ffmpeg(*args) -> str:
+    process = await asyncio.create_subprocess_exec(
+        "ffmpeg", "-hide_banner", "-nostdin", "-y", *args,
+        stdout=asyncio.subprocess.DEVNULL,
+        stderr=asyncio.subprocess.PIPE
+    )
+    _, stderr = await process.communicate()
+    output = stderr.decode("utf-8", "replace")
+    if process.returncode != 0:
+        raise RuntimeError(f"ffmpeg failed ({process.returncode}): {output[-500:]}")
+    return output
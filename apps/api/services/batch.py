@@ -0,0 +1,128 @@
+import asyncio
+import json
+import time
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from core.config import get_settings
+
+settings = get_settings()
+
+BATCH_PREFIX = "batch:"
+
+
+class DomainScheduler:
+    """
+    Bounds a batch's fan-out: at most `max_concurrency` URLs in flight overall, at most
+    `per_domain_concurrency` per host, and successive requests to one host spaced by
+    `per_domain_interval` seconds so a single site doesn't start answering 429.
+    """
+
+    def __init__(self, max_concurrency: int = None, per_domain_concurrency: int = None, per_domain_interval: float = None):
+        self.max_concurrency = max_concurrency or settings.BATCH_MAX_CONCURRENCY
+        self.per_domain_concurrency = per_domain_concurrency or settings.BATCH_PER_DOMAIN_CONCURRENCY
+        self.per_domain_interval = settings.BATCH_PER_DOMAIN_INTERVAL_SECONDS if per_domain_interval is None else per_domain_interval
+        self._global = asyncio.Semaphore(self.max_concurrency)
+        self._domains = {}
+        self._next_start = {}
+
+    @staticmethod
+    def domain_of(url: str) -> str:
+        host = (urlparse(url).hostname or "").lower()
+        return host[4:] if host.startswith("www.") else host
+
+    @asynccontextmanager
+    async def slot(self, url: str):
+        domain = self.domain_of(url)
+        if domain not in self._domains:
+            self._domains[domain] = asyncio.Semaphore(self.per_domain_concurrency)
+
+        # Wait on the domain first so URLs queued behind a busy host don't hold global slots
+        async with self._domains[domain]:
+            now = time.monotonic()
+            start_at = max(now, self._next_start.get(domain, now))
+            self._next_start[domain] = start_at + self.per_domain_interval
+            if start_at > now:
+                await asyncio.sleep(start_at - now)
+            async with self._global:
+                yield
+
+
+class BatchStore:
+    """
+    Aggregate batch state in Redis: a counters hash plus one JSON entry per URL.
+    """
+
+    @staticmethod
+    async def create(redis, batch_id: str, urls: list, user_id: str, language: str):
+        key = BATCH_PREFIX + batch_id
+        pipe = redis.pipeline(transaction=True)
+        pipe.hset(key, mapping={
+            "status": "queued",
+            "total": len(urls),
+            "completed": 0,
+            "failed": 0,
+            "user_id": user_id,
+            "language": language,
+            "created_at": time.time(),
+        })
+        pipe.hset(key + ":items", mapping={
+            str(index): json.dumps({"url": url, "status": "queued"}) for index, url in enumerate(urls)
+        })
+        pipe.expire(key, settings.BATCH_TTL_SECONDS)
+        pipe.expire(key + ":items", settings.BATCH_TTL_SECONDS)
+        await pipe.execute()
+
+    @staticmethod
+    async def set_status(redis, batch_id: str, status: str):
+        await redis.hset(BATCH_PREFIX + batch_id, "status", status)
+
+    @staticmethod
+    async def record(redis, batch_id: str, index: int, url: str, result: dict = None, error: str = None, job_id: str = None):
+        key = BATCH_PREFIX + batch_id
+        if error is None and "error" in (result or {}).get("data", {}):
+            # The LLM step failed: a result came back, but it holds the error instead of a summary
+            error = str(result["data"]["error"])
+        if error is None:
+            # job_id is the item's row in the result store, readable through /status later
+            item = {"url": url, "status": "completed", "job_id": job_id, "result": result}
+        else:
+            item = {"url": url, "status": "failed", "error": error}
+        pipe = redis.pipeline(transaction=True)
+        pipe.hset(key + ":items", str(index), json.dumps(item, ensure_ascii=False))
+        pipe.hincrby(key, "completed" if error is None else "failed", 1)
+        await pipe.execute()
+
+    @staticmethod
+    async def owner(redis, batch_id: str):
+        user_id = await redis.hget(BATCH_PREFIX + batch_id, "user_id")
+        return _decode(user_id) if user_id else None
+
+    @staticmethod
+    async def get(redis, batch_id: str, include_items: bool = True):
+        key = BATCH_PREFIX + batch_id
+        raw = await redis.hgetall(key)
+        if not raw:
+            return None
+        meta = {_decode(k): _decode(v) for k, v in raw.items()}
+        total = int(meta["total"])
+        completed = int(meta["completed"])
+        failed = int(meta["failed"])
+        batch = {
+            "batch_id": batch_id,
+            "status": meta["status"],
+            "total": total,
+            "completed": completed,
+            "failed": failed,
+            "pending": total - completed - failed,
+            "progress": round((completed + failed) / total, 4) if total else 1.0,
+        }
+        if include_items:
+            items = await redis.hgetall(key + ":items")
+            batch["items"] = [
+                json.loads(items[k]) for k in sorted(items, key=lambda k: int(_decode(k)))
+            ]
+        return batch
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
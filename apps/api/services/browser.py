@@ -0,0 +1,119 @@
+import asyncio
+from contextlib import asynccontextmanager
+from urllib.parse import urlparse
+from core.config import get_settings
+
+settings = get_settings()
+
+# Resources that never contribute to extracted text
+BLOCKED_RESOURCE_TYPES = {"image", "font", "media"}
+BLOCKED_HOSTS = (
+    "doubleclick.net", "googlesyndication.com", "googleadservices.com", "google-analytics.com",
+    "googletagmanager.com", "googletagservices.com", "adservice.google.com", "facebook.net",
+    "connect.facebook.net", "scorecardresearch.com", "hotjar.com", "segment.io", "segment.com",
+    "mixpanel.com", "amplitude.com", "criteo.com", "criteo.net", "taboola.com", "outbrain.com",
+    "adnxs.com", "amazon-adsystem.com", "quantserve.com", "chartbeat.com", "newrelic.com",
+    "nr-data.net", "clarity.ms", "bat.bing.com",
+)
+
+
+def _is_blocked_host(host: str) -> bool:
+    return any(host == blocked or host.endswith("." + blocked) for blocked in BLOCKED_HOSTS)
+
+
+async def _block_heavy_requests(route):
+    request = route.request
+    host = (urlparse(request.url).hostname or "").lower()
+    if request.resource_type in BLOCKED_RESOURCE_TYPES or _is_blocked_host(host):
+        await route.abort()
+    else:
+        await route.continue_()
+
+
+class BrowserPool:
+    """
+    One long-lived Chromium per worker process. Each job gets an isolated context,
+    concurrent pages are bounded, and the browser is relaunched every `recycle_after`
+    contexts to keep its memory from creeping up.
+    """
+
+    def __init__(self, max_pages: int = None, recycle_after: int = None):
+        self.max_pages = max_pages or settings.BROWSER_MAX_PAGES
+        self.recycle_after = recycle_after or settings.BROWSER_RECYCLE_AFTER
+        self._semaphore = asyncio.Semaphore(self.max_pages)
+        self._lock = asyncio.Lock()
+        self._playwright = None
+        self._browser = None
+        self._uses = 0
+        # Contexts currently open per browser, so retired browsers close once drained
+        self._active = {}
+
+    async def start(self):
+        from playwright.async_api import async_playwright
+        self._playwright = await async_playwright().start()
+        async with self._lock:
+            self._browser = await self._launch()
+
+    async def stop(self):
+        async with self._lock:
+            browsers = set(self._active)
+            if self._browser:
+                browsers.add(self._browser)
+            for browser in browsers:
+                await _close_quietly(browser)
+            self._active.clear()
+            self._browser = None
+        if self._playwright:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def _launch(self):
+        return await self._playwright.chromium.launch(
+            headless=True,
+            args=["--disable-dev-shm-usage", "--disable-gpu", "--disable-extensions"]
+        )
+
+    async def _acquire_browser(self):
+        async with self._lock:
+            browser = self._browser
+            if browser is None or not browser.is_connected() or self._uses >= self.recycle_after:
+                print(f"Recycling browser after {self._uses} contexts")
+                self._browser = await self._launch()
+                self._uses = 0
+                if browser and not self._active.get(browser):
+                    self._active.pop(browser, None)
+                    await _close_quietly(browser)
+                browser = self._browser
+
+            self._uses += 1
+            self._active[browser] = self._active.get(browser, 0) + 1
+            return browser
+
+    async def _release_browser(self, browser):
+        async with self._lock:
+            self._active[browser] = self._active.get(browser, 1) - 1
+            if self._active[browser] <= 0 and browser is not self._browser:
+                self._active.pop(browser, None)
+                await _close_quietly(browser)
+
+    @asynccontextmanager
+    async def page(self):
+        async with self._semaphore:
+            browser = await self._acquire_browser()
+            context = None
+            try:
+                proxy = {"server": settings.PROXY_SERVER_URL} if settings.PROXY_SERVER_URL else None
+                context = await browser.new_context(proxy=proxy)
+                await context.route("**/*", _block_heavy_requests)
+                yield await context.new_page()
+            finally:
+                if context:
+                    await _close_quietly(context)
+                await self._release_browser(browser)
+
+
+async def _close_quietly(target):
+    try:
+        await target.close()
+    except Exception as e:
+        print(f"Browser close failed: {e}")
@@ -0,0 +1,183 @@
+import hashlib
+import json
+import time
+import zlib
+from core.config import get_settings
+from core.urls import normalize_url
+
+settings = get_settings()
+
+RESULT_PREFIX = "summary-cache:result:"
+INFLIGHT_PREFIX = "summary-cache:inflight:"
+WAITERS_PREFIX = "summary-cache:waiters:"
+INDEX_KEY = "summary-cache:index"
+VIDEO_PREFIX = "video-cache:"
+# Sentinel stored for tiers that are known to have nothing for a video
+MISSING = b"__missing__"
+
+# Registers a user as waiting on a job's result, but only while that job still owns the key.
+# KEYS: in-flight marker, the job's waiters set. ARGV: job_id, user_id, ttl
+ATTACH_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('SADD', KEYS[2], ARGV[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+    return 1
+end
+return 0
+"""
+
+# Deletes the in-flight marker only if it still names this job, so a job whose marker expired
+# and was re-claimed can't drop the new owner's claim. Pops the job's waiters in the same step,
+# so a user attaching concurrently is either returned here or told the job is gone.
+# KEYS: in-flight marker, the job's waiters set. ARGV: job_id
+RELEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    redis.call('DEL', KEYS[1])
+end
+local waiters = redis.call('SMEMBERS', KEYS[2])
+redis.call('DEL', KEYS[2])
+return waiters
+"""
+
+
+class ResultCache:
+    """
+    Content-addressed cache of finished summaries, keyed by normalized URL + language.
+    Also tracks the job currently producing each key so duplicate submissions can attach to it.
+    """
+    _attach_script = None
+    _release_script = None
+
+    @staticmethod
+    def make_key(url: str, language: str = "Auto") -> str:
+        raw = f"{normalize_url(url)}|{language or 'Auto'}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    @staticmethod
+    async def get(redis, key: str):
+        raw = await redis.get(RESULT_PREFIX + key)
+        if not raw:
+            return None
+        try:
+            return json.loads(raw)
+        except ValueError:
+            return None
+
+    @staticmethod
+    async def has(redis, key: str) -> bool:
+        """
+        True if `key` is cached or already being produced, i.e. a request for it needs no new job.
+        """
+        return await redis.exists(RESULT_PREFIX + key, INFLIGHT_PREFIX + key) > 0
+
+    @staticmethod
+    async def set(redis, key: str, result: dict):
+        payload = json.dumps(result, ensure_ascii=False)
+        if len(payload.encode("utf-8")) > settings.SUMMARY_CACHE_MAX_BYTES:
+            print(f"Result for {key} exceeds cache size limit, not caching.")
+            return
+
+        pipe = redis.pipeline(transaction=False)
+        pipe.set(RESULT_PREFIX + key, payload, ex=settings.SUMMARY_CACHE_TTL_SECONDS)
+        pipe.zadd(INDEX_KEY, {key: time.time()})
+        await pipe.execute()
+
+        # Size-based eviction: drop the oldest entries once the index grows past the limit
+        overflow = await redis.zcard(INDEX_KEY) - settings.SUMMARY_CACHE_MAX_ENTRIES
+        if overflow > 0:
+            evicted = await redis.zpopmin(INDEX_KEY, overflow)
+            if evicted:
+                await redis.delete(*[RESULT_PREFIX + _decode(member) for member, _ in evicted])
+
+    @staticmethod
+    async def claim(redis, key: str, job_id: str):
+        """
+        Singleflight: registers `job_id` as the producer for `key` unless another job already is.
+        Returns the job ID that owns the key (either `job_id` or the one already running), or None
+        if the key kept changing hands and neither could be established.
+        """
+        for _ in range(3):
+            if await redis.set(INFLIGHT_PREFIX + key, job_id, nx=True, ex=settings.INFLIGHT_TTL_SECONDS):
+                return job_id
+            owner = await redis.get(INFLIGHT_PREFIX + key)
+            if owner:
+                return _decode(owner)
+            # The owner finished between SET and GET; try to claim again
+        return None
+
+    @classmethod
+    async def attach(cls, redis, key: str, job_id: str, user_id: str) -> bool:
+        """
+        Records that `user_id` is waiting on `job_id` (the owner claim() returned), so the job can
+        add its result to their history too. False if the job already finished with the key.
+        """
+        if cls._attach_script is None:
+            cls._attach_script = redis.register_script(ATTACH_SCRIPT)
+        attached = await cls._attach_script(
+            keys=[INFLIGHT_PREFIX + key, WAITERS_PREFIX + job_id],
+            args=[job_id, user_id, settings.INFLIGHT_TTL_SECONDS],
+            client=redis
+        )
+        return attached == 1
+
+    @classmethod
+    async def release(cls, redis, key: str, job_id: str) -> list:
+        """
+        Ends `job_id`'s claim on `key`. Returns the users who attached to it (each only once).
+        """
+        if cls._release_script is None:
+            cls._release_script = redis.register_script(RELEASE_SCRIPT)
+        waiters = await cls._release_script(
+            keys=[INFLIGHT_PREFIX + key, WAITERS_PREFIX + job_id], args=[job_id], client=redis
+        )
+        return [_decode(user_id) for user_id in waiters]
+
+
+class VideoCache:
+    """
+    Per-video cache of YouTube tier results (transcript API, Whisper, yt-dlp metadata), keyed by
+    video ID so every URL form of the same video shares it. Tiers known to be unavailable are
+    negatively cached for a shorter TTL so the next run skips straight past them.
+    """
+
+    @staticmethod
+    async def get(redis, video_id: str, tier: str):
+        """
+        Returns the cached text, MISSING for a negative entry, or None on a miss.
+        """
+        if not redis:
+            return None
+        try:
+            raw = await redis.get(f"{VIDEO_PREFIX}{video_id}:{tier}")
+        except Exception as e:
+            print(f"Video cache read failed: {e}")
+            return None
+        if raw is None or raw == MISSING:
+            return raw
+        return zlib.decompress(raw).decode("utf-8")
+
+    @staticmethod
+    async def set(redis, video_id: str, tier: str, text: str):
+        if not redis:
+            return
+        try:
+            await redis.set(
+                f"{VIDEO_PREFIX}{video_id}:{tier}",
+                zlib.compress(text.encode("utf-8")),
+                ex=settings.VIDEO_CACHE_TTL_SECONDS
+            )
+        except Exception as e:
+            print(f"Video cache write failed: {e}")
+
+    @staticmethod
+    async def set_missing(redis, video_id: str, tier: str):
+        if not redis:
+            return
+        try:
+            await redis.set(f"{VIDEO_PREFIX}{video_id}:{tier}", MISSING, ex=settings.VIDEO_NEGATIVE_CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"Video cache write failed: {e}")
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
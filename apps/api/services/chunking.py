@@ -0,0 +1,64 @@
+import re
+
+# Coarsest to finest: paragraphs, lines (caption transcripts have no blank lines), sentences, words
+SENTENCE_RE = re.compile(r"(?<=[.!?。！？])\s+")
+SEPARATORS = ["\n\n", "\n", "sentence", " "]
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    try:
+        import litellm
+        return litellm.token_counter(model=model, text=text)
+    except Exception:
+        # Rough fallback; errs high for Latin scripts, which keeps chunks under budget
+        return len(text) // 3 + 1
+
+
+def _split(text: str, separator: str) -> list:
+    if separator == "sentence":
+        return SENTENCE_RE.split(text)
+    return text.split(separator)
+
+
+def split_into_chunks(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> list:
+    """
+    Splits `text` into pieces of at most `max_tokens`, breaking on the coarsest boundary
+    (paragraph, line, sentence, word) that fits and packing neighbours together greedily.
+    """
+    return _pack(text.strip(), max_tokens, model, 0)
+
+
+def _pack(text: str, max_tokens: int, model: str, level: int) -> list:
+    if not text:
+        return []
+    if count_tokens(text, model) <= max_tokens:
+        return [text]
+    if level >= len(SEPARATORS):
+        # A single "word" longer than the budget (e.g. unspaced CJK); cut by characters
+        step = max(1, len(text) * max_tokens // count_tokens(text, model))
+        return [text[i:i + step] for i in range(0, len(text), step)]
+
+    separator = SEPARATORS[level]
+    joiner = " " if separator in ("sentence", " ") else separator
+    chunks = []
+    current = []
+    current_tokens = 0
+    for part in _split(text, separator):
+        part = part.strip()
+        if not part:
+            continue
+        part_tokens = count_tokens(part, model) + 1 # +1 for the joiner
+        if part_tokens > max_tokens:
+            if current:
+                chunks.append(joiner.join(current))
+                current, current_tokens = [], 0
+            chunks.extend(_pack(part, max_tokens, model, level + 1))
+            continue
+        if current and current_tokens + part_tokens > max_tokens:
+            chunks.append(joiner.join(current))
+            current, current_tokens = [], 0
+        current.append(part)
+        current_tokens += part_tokens
+    if current:
+        chunks.append(joiner.join(current))
+    return chunks
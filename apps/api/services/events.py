@@ -0,0 +1,63 @@
+import json
+import time
+from core.config import get_settings
+
+settings = get_settings()
+
+CHANNEL_PREFIX = "job-events:"
+LAST_EVENT_PREFIX = "job-events:last:"
+TERMINAL_STAGES = {"done", "failed"}
+
+
+class JobEvents:
+    """
+    Stage events for a job (queued, fetching, extracting, transcribing, summarizing, done, failed)
+    published over Redis pub/sub. The latest event is also stored so late subscribers catch up.
+    """
+
+    @staticmethod
+    async def publish(redis, job_id: str, stage: str, **data):
+        event = {"job_id": job_id, "stage": stage, "at": time.time(), **data}
+        payload = json.dumps(event, ensure_ascii=False)
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.set(LAST_EVENT_PREFIX + job_id, payload, ex=settings.JOB_EVENT_TTL_SECONDS)
+            pipe.publish(CHANNEL_PREFIX + job_id, payload)
+            await pipe.execute()
+        except Exception as e:
+            # Progress events are best-effort; never fail the job over them
+            print(f"Event publish failed for {job_id}: {e}")
+
+    @staticmethod
+    async def last(redis, job_id: str):
+        raw = await redis.get(LAST_EVENT_PREFIX + job_id)
+        return json.loads(raw) if raw else None
+
+    @staticmethod
+    async def listen(redis, job_id: str, heartbeat: float = 15.0):
+        """
+        Yields events for `job_id` until a terminal stage, starting with the latest stored one.
+        Yields None every `heartbeat` seconds of silence so callers can keep the connection alive.
+        """
+        pubsub = redis.pubsub()
+        # Subscribe before reading the stored event so nothing is missed in between
+        await pubsub.subscribe(CHANNEL_PREFIX + job_id)
+        try:
+            event = await JobEvents.last(redis, job_id)
+            if event:
+                yield event
+                if event["stage"] in TERMINAL_STAGES:
+                    return
+
+            while True:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=heartbeat)
+                if message is None:
+                    yield None
+                    continue
+                event = json.loads(message["data"])
+                yield event
+                if event["stage"] in TERMINAL_STAGES:
+                    return
+        finally:
+            await pubsub.unsubscribe(CHANNEL_PREFIX + job_id)
+            await pubsub.aclose()
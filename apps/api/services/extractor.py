@@ -0,0 +1,87 @@
+import asyncio
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from core.config import get_settings
+
+settings = get_settings()
+
+
+def extract_html(html: str):
+    # trafilatura (and lxml) is imported on first use, so only processes that extract pay for it
+    import trafilatura
+    return trafilatura.extract(html)
+
+
+def _warm_up():
+    # Runs in each child; importing trafilatura's extractors there moves the cost out of the first job
+    extract_html("<html><body><p>warm up</p></body></html>")
+    return os.getpid()
+
+
+class ExtractionPool:
+    """
+    Runs trafilatura.extract in worker processes so CPU-heavy pages don't hold the GIL
+    on the event loop. Sized to the CPU count unless EXTRACT_WORKERS is set.
+    """
+
+    def __init__(self, max_workers: int = None):
+        self.max_workers = max_workers or settings.EXTRACT_WORKERS or os.cpu_count() or 1
+        self._executor = None
+
+    async def start(self):
+        # spawn, not fork: the worker already has an event loop and Playwright threads running
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        loop = asyncio.get_running_loop()
+        pids = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, _warm_up) for _ in range(self.max_workers)
+        ])
+        print(f"Extraction pool ready with {len(set(pids))} processes")
+
+    async def stop(self):
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    async def extract(self, html: str):
+        if not html:
+            return None
+        if len(html) > settings.EXTRACT_MAX_HTML_CHARS:
+            print(f"HTML is {len(html)} chars, truncating to {settings.EXTRACT_MAX_HTML_CHARS} before extraction")
+            html = html[:settings.EXTRACT_MAX_HTML_CHARS]
+
+        if not self._executor:
+            return await asyncio.to_thread(extract_html, html)
+
+        executor = self._executor
+        loop = asyncio.get_running_loop()
+        try:
+            return await asyncio.wait_for(
+                loop.run_in_executor(executor, extract_html, html),
+                timeout=settings.EXTRACT_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            # The child keeps parsing after wait_for gives up on it, holding its pool slot however long that takes;
+            # the executor can't kill one worker, so the pool is replaced
+            print(f"Extraction timed out after {settings.EXTRACT_TIMEOUT_SECONDS}s")
+            await self._restart(executor, "Extraction worker stuck")
+            return None
+        except BrokenProcessPool:
+            # A child died (e.g. OOM); rebuild the pool so later jobs keep working
+            await self._restart(executor, "Extraction pool broken")
+            return None
+
+    async def _restart(self, executor, reason: str):
+        # Only the first caller restarts a given pool; extractions that were running on it fail
+        # with BrokenProcessPool and find it already replaced
+        if self._executor is not executor:
+            return
+        print(f"{reason}, restarting extraction pool")
+        for process in list((executor._processes or {}).values()):
+            process.terminate()
+        executor.shutdown(wait=False, cancel_futures=True)
+        await self.start()
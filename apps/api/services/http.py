@@ -0,0 +1,172 @@
+import asyncio
+import codecs
+import hashlib
+import re
+import zlib
+from urllib.parse import urlparse
+import httpx
+from core.config import get_settings
+
+settings = get_settings()
+
+PAGE_CACHE_PREFIX = "page-cache:"
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+TEXT_CONTENT_TYPES = ("text/", "application/xhtml", "application/xml", "application/rss", "application/atom")
+META_CHARSET_RE = re.compile(rb"""<meta[^>]+charset=["']?([\w-]+)""", re.IGNORECASE)
+
+
+class HttpFetcher:
+    """
+    Async page fetcher shared by every job in a worker: one pooled HTTP/2 client,
+    a per-host concurrency cap, a response size cap and ETag/Last-Modified revalidation
+    against pages cached in Redis.
+    """
+
+    def __init__(self, redis=None):
+        self.redis = redis
+        self.client = httpx.AsyncClient(
+            http2=True,
+            follow_redirects=True,
+            proxy=settings.PROXY_SERVER_URL or None,
+            timeout=httpx.Timeout(settings.HTTP_TIMEOUT_SECONDS, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_MAX_CONNECTIONS // 2,
+                keepalive_expiry=30.0
+            ),
+            headers={
+                "User-Agent": USER_AGENT,
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+                "Accept-Language": "en-US,en;q=0.5",
+            }
+        )
+        self._host_semaphores = {}
+
+    async def close(self):
+        await self.client.aclose()
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        if len(self._host_semaphores) > 1000:
+            # Drop idle hosts so the map doesn't grow with every domain ever seen. A host is idle only
+            # when all its permits are free; dropping one with fetches in flight would let the next
+            # fetch get a fresh semaphore and exceed HTTP_MAX_PER_HOST
+            self._host_semaphores = {
+                h: s for h, s in self._host_semaphores.items() if s._value < settings.HTTP_MAX_PER_HOST
+            }
+        if host not in self._host_semaphores:
+            self._host_semaphores[host] = asyncio.Semaphore(settings.HTTP_MAX_PER_HOST)
+        return self._host_semaphores[host]
+
+    async def fetch(self, url: str):
+        """
+        Returns the decoded HTML of `url`, or None if the page can't be fetched as text.
+        """
+        cached = await self._get_cached(url)
+        headers = {}
+        if cached:
+            if cached.get("etag"):
+                headers["If-None-Match"] = cached["etag"]
+            if cached.get("last_modified"):
+                headers["If-Modified-Since"] = cached["last_modified"]
+
+        host = (urlparse(url).hostname or "").lower()
+        async with self._host_semaphore(host):
+            async with self.client.stream("GET", url, headers=headers) as response:
+                if response.status_code == 304 and cached:
+                    return cached["body"]
+                if response.status_code >= 400:
+                    print(f"Fetch {url} returned HTTP {response.status_code}")
+                    return None
+
+                content_type = response.headers.get("content-type", "text/html").lower()
+                if not content_type.startswith(TEXT_CONTENT_TYPES):
+                    print(f"Skipping non-text response ({content_type}) for {url}")
+                    return None
+
+                declared_length = int(response.headers.get("content-length") or 0)
+                if declared_length > settings.HTTP_MAX_RESPONSE_BYTES:
+                    print(f"Response for {url} is {declared_length} bytes, over the size cap")
+                    return None
+
+                body = await self._read_text(response)
+
+        etag = response.headers.get("etag")
+        last_modified = response.headers.get("last-modified")
+        if etag or last_modified:
+            await self._set_cached(url, body, etag, last_modified)
+        return body
+
+    async def _read_text(self, response: httpx.Response) -> str:
+        # Decode incrementally while streaming so we never hold more than the cap in memory
+        decoder = None
+        parts = []
+        received = 0
+        async for chunk in response.aiter_bytes():
+            if decoder is None:
+                decoder = codecs.getincrementaldecoder(_detect_encoding(response, chunk))(errors="replace")
+            if received + len(chunk) > settings.HTTP_MAX_RESPONSE_BYTES:
+                chunk = chunk[:settings.HTTP_MAX_RESPONSE_BYTES - received]
+                parts.append(decoder.decode(chunk, final=True))
+                print(f"Truncated {response.url} at {settings.HTTP_MAX_RESPONSE_BYTES} bytes")
+                return "".join(parts)
+            received += len(chunk)
+            parts.append(decoder.decode(chunk))
+        if decoder:
+            parts.append(decoder.decode(b"", final=True))
+        return "".join(parts)
+
+    async def _get_cached(self, url: str):
+        if not self.redis:
+            return None
+        try:
+            cached = await self.redis.hgetall(_cache_key(url))
+        except Exception as e:
+            print(f"Page cache read failed: {e}")
+            return None
+        if not cached:
+            return None
+        cached = {_decode(k): v for k, v in cached.items()}
+        return {
+            "etag": _decode(cached.get("etag", b"")),
+            "last_modified": _decode(cached.get("last_modified", b"")),
+            "body": zlib.decompress(cached["body"]).decode("utf-8"),
+        }
+
+    async def _set_cached(self, url: str, body: str, etag: str, last_modified: str):
+        if not self.redis:
+            return
+        key = _cache_key(url)
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.hset(key, mapping={
+                "etag": etag or "",
+                "last_modified": last_modified or "",
+                "body": zlib.compress(body.encode("utf-8")),
+            })
+            pipe.expire(key, settings.PAGE_CACHE_TTL_SECONDS)
+            await pipe.execute()
+        except Exception as e:
+            print(f"Page cache write failed: {e}")
+
+
+def _detect_encoding(response: httpx.Response, first_chunk: bytes) -> str:
+    for candidate in (response.charset_encoding, _meta_charset(first_chunk)):
+        if candidate:
+            try:
+                return codecs.lookup(candidate).name
+            except LookupError:
+                pass
+    return "utf-8"
+
+
+def _meta_charset(chunk: bytes):
+    match = META_CHARSET_RE.search(chunk[:4096])
+    return match.group(1).decode("ascii", "ignore") if match else None
+
+
+def _cache_key(url: str) -> str:
+    return PAGE_CACHE_PREFIX + hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
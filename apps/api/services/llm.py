@@ -1,11 +1,42 @@
-from litellm import completion
+import asyncio
+import hashlib
+import random
+import time
+from functools import lru_cache
 from core.config import get_settings
+from core.redis import get_redis
+from services.chunking import count_tokens, split_into_chunks
+from services.llm_limiter import LLMRateLimiter
+from services.router import ModelRouter
+from core.metrics import LLM_CALL_SECONDS, LLM_TOKENS, LLM_COST_USD, LLM_SUMMARIZE_SECONDS
 
 settings = get_settings()
 
+@lru_cache()
+def retryable_errors() -> tuple:
+    # litellm takes seconds and ~100 MB to import, so it's loaded on the first LLM call
+    import litellm
+    return (
+        litellm.RateLimitError,
+        litellm.InternalServerError,
+        litellm.ServiceUnavailableError,
+        litellm.BadGatewayError,
+        litellm.APIConnectionError,
+        litellm.Timeout,
+    )
+
+CHUNK_CACHE_PREFIX = "llm-chunk:v1:"
+CHUNK_PROMPT = """You are condensing one part of a longer document so it can be summarized as a whole later.
+Write dense notes that keep every key fact, argument, number, name, decision and actionable point in this part.
+Keep the original language of the text. Use plain-text bullet points. No preamble, no conclusion."""
+
 class LLMService:
     @staticmethod
-    async def summarize_content(text: str, language: str = "Auto", model: str = "gpt-4o-mini"):
+    async def summarize_content(text: str, language: str = "Auto", model: str = None, usage: dict = None):
+        """
+        Returns the summary as a JSON string. If `usage` is given it is filled with the model used
+        and the prompt/completion tokens and cost summed over every LLM call (map and reduce).
+        """
         lang_instruction = ""
         if language and language != "Auto":
             lang_instruction = f"IMPORTANT: The output MUST be in {language} language."
@@ -25,12 +56,31 @@ Rules for Analysis:
    - Never hallucinate facts. If the content is extremely lacking, note "Insufficient information."
    - DO NOT provide markdown tags outside of the JSON block. Maintain strict JSON formatting."""
 
+        # Dynamic Model Switching (Cost Optimization)
+        # The router picks a model by token count, cost budget and live provider latency/error rates;
+        # the remaining candidates are failovers
+        started = time.perf_counter()
+        candidates = await ModelRouter.choose(text, preferred_model=model, language=language)
+
+        # Long documents: summarize token-budgeted chunks in parallel (map), then reduce the notes below
+        long_document_note = ""
+        mode = "single_pass"
+        if candidates[0]["input_tokens"] > settings.LLM_SINGLE_PASS_MAX_TOKENS:
+            mode = "map_reduce"
+            try:
+                text = await LLMService._map_chunks(text, candidates, usage=usage)
+                long_document_note = "The text below is a set of section notes covering a long document in order.\n"
+            except Exception as e:
+                print(f"LLM failed: {e}")
+                LLM_SUMMARIZE_SECONDS.labels(mode=mode, outcome="error").observe(time.perf_counter() - started)
+                return '{ "error": "LLM processing failed" }'
+
         user_prompt = f"""
 Analyze the following text and extract a Structured Knowledge Block.
 {lang_instruction}
 
-Text to analyze:
-{text[:15000]}
+{long_document_note}Text to analyze:
+{text}
 
 Required JSON Structure EXACTLY as shown below:
 {{
@@ -47,28 +97,148 @@ Required JSON Structure EXACTLY as shown below:
 Return ONLY a valid JSON object. Do not include a markdown code fence like ```json.
 """
 
-        # Dynamic Model Switching (Cost Optimization)
-        # Switch to Gemini (gemini/gemini-1.5-flash) if the length is > 10,000 characters
-        api_key = settings.OPENAI_API_KEY
-        if len(text) > 10000 and "Auto" in language:
-           model = "gemini/gemini-1.5-flash"
-           api_key = settings.GEMINI_API_KEY
-           print(f"Text > 10000 chars ({len(text)}). Dynamic Routing: Switched to Gemini for cost-saving.")
-
         try:
-            response = completion(
-                model=model,
+            response = await LLMService._complete_with_failover(
+                candidates,
                 messages=[
                     {"role": "system", "content": system_prompt},
                     {"role": "user", "content": user_prompt}
                 ],
-                api_key=api_key,
-                response_format={ "type": "json_object" } if "gpt-4" in model or "gpt-3.5" in model else None
+                json_mode=True,
+                usage=usage
             )
             content = response.choices[0].message.content
             # Clean up potential markdown formatting in case the model ignores strict JSON instructions
             content = content.replace("```json", "").replace("```", "").strip()
+            LLM_SUMMARIZE_SECONDS.labels(mode=mode, outcome="success").observe(time.perf_counter() - started)
             return content 
         except Exception as e:
             print(f"LLM failed: {e}")
+            LLM_SUMMARIZE_SECONDS.labels(mode=mode, outcome="error").observe(time.perf_counter() - started)
             return '{ "error": "LLM processing failed" }'
+
+    @staticmethod
+    async def _map_chunks(text: str, candidates: list, depth: int = 0, usage: dict = None) -> str:
+        model = candidates[0]["model"]
+        chunks = split_into_chunks(text, settings.LLM_CHUNK_TOKENS, model)
+        print(f"Long document: map-reduce over {len(chunks)} chunks (pass {depth + 1})")
+        semaphore = asyncio.Semaphore(settings.LLM_MAP_CONCURRENCY)
+
+        async def summarize_chunk(chunk: str):
+            async with semaphore:
+                return await LLMService._summarize_chunk(chunk, candidates, usage=usage)
+
+        notes = await asyncio.gather(*(summarize_chunk(chunk) for chunk in chunks))
+        combined = "\n\n".join(f"[Part {i + 1}/{len(notes)}]\n{note}" for i, note in enumerate(notes))
+
+        # Collapse again if the notes themselves still overflow a single pass
+        if count_tokens(combined, model) > settings.LLM_SINGLE_PASS_MAX_TOKENS and len(chunks) > 1 and depth < 2:
+            return await LLMService._map_chunks(combined, candidates, depth + 1, usage=usage)
+        return combined
+
+    @staticmethod
+    async def _summarize_chunk(chunk: str, candidates: list, usage: dict = None) -> str:
+        # Notes are kept in the source language, so a re-run in another language only redoes the reduce step
+        model = candidates[0]["model"]
+        cache_key = CHUNK_CACHE_PREFIX + hashlib.sha256(f"{model}|{chunk}".encode("utf-8")).hexdigest()
+        try:
+            cached = await get_redis().get(cache_key)
+            if cached:
+                return cached.decode("utf-8")
+        except Exception as e:
+            print(f"Chunk cache read failed: {e}")
+
+        response = await LLMService._complete_with_failover(
+            candidates,
+            messages=[
+                {"role": "system", "content": CHUNK_PROMPT},
+                {"role": "user", "content": chunk}
+            ],
+            usage=usage
+        )
+        notes = response.choices[0].message.content.strip()
+
+        try:
+            await get_redis().set(cache_key, notes, ex=settings.LLM_CHUNK_CACHE_TTL_SECONDS)
+        except Exception as e:
+            print(f"Chunk cache write failed: {e}")
+        return notes
+
+    @staticmethod
+    async def _complete_with_failover(candidates: list, messages: list, json_mode: bool = False, usage: dict = None):
+        """
+        Tries each routed model in turn, recording latency, outcome and cost for the router.
+        Token counts and cost are added to `usage` when given.
+        """
+        last_error = None
+        for candidate in candidates:
+            model = candidate["model"]
+            started = time.perf_counter()
+            try:
+                response = await LLMService._complete(
+                    model=model,
+                    messages=messages,
+                    api_key=candidate["api_key"],
+                    api_base=candidate.get("api_base"),
+                    response_format={ "type": "json_object" } if json_mode and ("gpt-4" in model or "gpt-3.5" in model) else None
+                )
+            except Exception as e:
+                LLM_CALL_SECONDS.labels(model=model, outcome="error").observe(time.perf_counter() - started)
+                await ModelRouter.record(model, (time.perf_counter() - started) * 1000, ok=False)
+                print(f"LLM {model} failed, failing over: {e}")
+                last_error = e
+                continue
+
+            response_usage = getattr(response, "usage", None)
+            prompt_tokens = (response_usage.prompt_tokens or 0) if response_usage else 0
+            completion_tokens = (response_usage.completion_tokens or 0) if response_usage else 0
+            cost = None
+            if response_usage:
+                cost = ModelRouter.estimate_cost(candidate, prompt_tokens, completion_tokens)
+            LLM_CALL_SECONDS.labels(model=model, outcome="success").observe(time.perf_counter() - started)
+            LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+            LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
+            if cost:
+                LLM_COST_USD.labels(model=model).inc(cost)
+            await ModelRouter.record(model, (time.perf_counter() - started) * 1000, ok=True, cost_usd=cost)
+            if usage is not None:
+                usage["model"] = model
+                usage["prompt_tokens"] = usage.get("prompt_tokens", 0) + prompt_tokens
+                usage["completion_tokens"] = usage.get("completion_tokens", 0) + completion_tokens
+                usage["cost_usd"] = usage.get("cost_usd", 0.0) + (cost or 0.0)
+            return response
+        raise last_error
+
+    @staticmethod
+    async def _complete(model: str, messages: list, **kwargs):
+        """
+        Non-blocking completion behind the per-model rate limiter, retried with
+        full-jitter exponential backoff on 429/5xx/connection errors.
+        """
+        import litellm
+        try:
+            prompt_tokens = litellm.token_counter(model=model, messages=messages)
+        except Exception:
+            prompt_tokens = sum(len(m["content"]) for m in messages) // 3
+        estimated_tokens = prompt_tokens + settings.LLM_EXPECTED_OUTPUT_TOKENS
+
+        for attempt in range(settings.LLM_MAX_RETRIES + 1):
+            try:
+                async with LLMRateLimiter.slot(model, estimated_tokens):
+                    return await litellm.acompletion(model=model, messages=messages, **kwargs)
+            except retryable_errors() as e:
+                if attempt == settings.LLM_MAX_RETRIES:
+                    raise
+                backoff = min(settings.LLM_RETRY_MAX_SECONDS, settings.LLM_RETRY_BASE_SECONDS * 2 ** attempt)
+                delay = max(_retry_after(e), random.uniform(0, backoff))
+                print(f"LLM call to {model} failed ({type(e).__name__}), retry {attempt + 1} in {delay:.1f}s")
+                await asyncio.sleep(delay)
+
+
+def _retry_after(error: Exception) -> float:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None) or {}
+    try:
+        return min(float(headers.get("retry-after", 0)), settings.LLM_RETRY_MAX_SECONDS)
+    except (TypeError, ValueError):
+        return 0.0
@@ -0,0 +1,52 @@
+import asyncio
+from contextlib import asynccontextmanager
+from core.config import get_settings
+from core.token_bucket import TokenBucket
+
+settings = get_settings()
+
+
+def provider_of(model: str) -> str:
+    return model.split("/", 1)[0] if "/" in model else "openai"
+
+
+class LLMRateLimiter:
+    """
+    Per-model admission for LLM calls: a local concurrency semaphore plus requests-per-minute
+    and tokens-per-minute buckets shared by every worker through Redis.
+    Limits come from LLM_RATE_LIMITS, looked up by model, then provider, then "default".
+    """
+    _semaphores = {}
+
+    @staticmethod
+    def limits_for(model: str) -> dict:
+        limits = settings.LLM_RATE_LIMITS
+        return {**limits.get("default", {}), **limits.get(provider_of(model), {}), **limits.get(model, {})}
+
+    @classmethod
+    def _semaphore(cls, model: str) -> asyncio.Semaphore:
+        if model not in cls._semaphores:
+            cls._semaphores[model] = asyncio.Semaphore(cls.limits_for(model).get("concurrency", 8))
+        return cls._semaphores[model]
+
+    @classmethod
+    @asynccontextmanager
+    async def slot(cls, model: str, tokens: int):
+        limits = cls.limits_for(model)
+        async with cls._semaphore(model):
+            buckets = []
+            if limits.get("rpm"):
+                buckets.append((f"llm-bucket:{model}:rpm", limits["rpm"] / 60, limits["rpm"], 1))
+            if limits.get("tpm"):
+                buckets.append((f"llm-bucket:{model}:tpm", limits["tpm"] / 60, limits["tpm"], tokens))
+            if buckets:
+                try:
+                    waited = await TokenBucket.take(buckets, max_wait=settings.LLM_RATE_LIMIT_MAX_WAIT_SECONDS)
+                    if waited:
+                        print(f"LLM rate limit: waited {waited:.2f}s for {model}")
+                except TimeoutError:
+                    raise
+                except Exception as e:
+                    # Redis trouble shouldn't stop summaries; the provider's own 429s still apply
+                    print(f"LLM rate limiter unavailable, proceeding: {e}")
+            yield
@@ -0,0 +1,131 @@
+import hashlib
+import re
+import struct
+from core.config import get_settings
+
+settings = get_settings()
+
+INDEX_PREFIX = "near-dup:"
+MASK64 = (1 << 64) - 1
+# Signature values are stored truncated to 32 bits; bins are only ever compared for equality
+MASK32 = (1 << 32) - 1
+WORD_PATTERN = re.compile(r"\w+")
+
+
+def _mix64(value: int) -> int:
+    # splitmix64 finalizer: spreads the combined shingle hash evenly over 64 bits
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
+
+
+def minhash_signature(text: str, bins: int = None, shingle_words: int = None):
+    """
+    One-permutation MinHash over word shingles: each shingle is hashed once and the minimum kept
+    per bin, so the cost is linear in the text (no per-permutation pass). Empty bins (short texts)
+    are filled from the next non-empty bin. The share of equal bins between two signatures
+    estimates the Jaccard similarity of their shingle sets.
+    Returns None for texts too short to fingerprint reliably.
+    """
+    bins = bins or settings.NEAR_DUP_BINS
+    shingle_words = shingle_words or settings.NEAR_DUP_SHINGLE_WORDS
+    words = WORD_PATTERN.findall(text.lower())
+    if len(words) < settings.NEAR_DUP_MIN_WORDS:
+        return None
+
+    word_hashes = {}
+    hashes = []
+    for word in words:
+        value = word_hashes.get(word)
+        if value is None:
+            value = int.from_bytes(hashlib.blake2b(word.encode("utf-8"), digest_size=8).digest(), "big")
+            word_hashes[word] = value
+        hashes.append(value)
+
+    mins = [None] * bins
+    for i in range(len(hashes) - shingle_words + 1):
+        value = 0
+        for word_hash in hashes[i:i + shingle_words]:
+            value = ((value * 0x100000001B3) ^ word_hash) & MASK64
+        value = _mix64(value)
+        slot = value % bins
+        value //= bins
+        if mins[slot] is None or value < mins[slot]:
+            mins[slot] = value
+
+    # Rotation densification: an empty bin borrows the next non-empty bin's value, offset by the distance
+    original = list(mins)
+    for i in range(bins):
+        if original[i] is None:
+            distance = 1
+            while original[(i + distance) % bins] is None:
+                distance += 1
+            mins[i] = original[(i + distance) % bins] + distance * 0x9E3779B97F4A7C15
+    return [value & MASK32 for value in mins]
+
+
+def similarity(a: list, b: list) -> float:
+    return sum(1 for x, y in zip(a, b) if x == y) / len(a)
+
+
+class NearDuplicateIndex:
+    """
+    LSH index of MinHash signatures in Redis, so syndicated copies, AMP pages and mirrors of an
+    already-summarized document can reuse its summary. Signatures are split into bands; documents
+    sharing any band hash are candidates, which are then checked against NEAR_DUP_THRESHOLD.
+    Entries point at the ResultCache key of the summarized document and expire with the cache.
+    """
+
+    @staticmethod
+    def _band_keys(signature: list, language: str) -> list:
+        rows = len(signature) // settings.NEAR_DUP_BANDS
+        keys = []
+        for band in range(settings.NEAR_DUP_BANDS):
+            chunk = struct.pack(f"<{rows}I", *signature[band * rows:(band + 1) * rows])
+            digest = hashlib.blake2b(chunk, digest_size=8).hexdigest()
+            # Summaries are per language, so only documents requested in the same language match
+            keys.append(f"{INDEX_PREFIX}band:{language}:{band}:{digest}")
+        return keys
+
+    @staticmethod
+    async def find(redis, signature: list, language: str = "Auto"):
+        """
+        Returns (cache_key, similarity) of the closest indexed document at or above the threshold,
+        or (None, best_similarity_seen).
+        """
+        pipe = redis.pipeline(transaction=False)
+        for key in NearDuplicateIndex._band_keys(signature, language):
+            pipe.smembers(key)
+        candidates = set()
+        for members in await pipe.execute():
+            candidates.update(members)
+        if not candidates:
+            return None, 0.0
+
+        candidates = list(candidates)
+        stored = await redis.mget([INDEX_PREFIX + "sig:" + _decode(candidate) for candidate in candidates])
+        best_key, best = None, 0.0
+        for candidate, packed in zip(candidates, stored):
+            # Signature expired; its band entries are cleaned up when the band set expires
+            if not packed:
+                continue
+            score = similarity(signature, struct.unpack(f"<{len(signature)}I", packed))
+            if score > best:
+                best_key, best = _decode(candidate), score
+        if best >= settings.NEAR_DUP_THRESHOLD:
+            return best_key, best
+        return None, best
+
+    @staticmethod
+    async def add(redis, signature: list, cache_key: str, language: str = "Auto"):
+        ttl = settings.SUMMARY_CACHE_TTL_SECONDS
+        pipe = redis.pipeline(transaction=False)
+        pipe.set(INDEX_PREFIX + "sig:" + cache_key, struct.pack(f"<{len(signature)}I", *signature), ex=ttl)
+        for key in NearDuplicateIndex._band_keys(signature, language):
+            pipe.sadd(key, cache_key)
+            pipe.expire(key, ttl)
+        await pipe.execute()
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
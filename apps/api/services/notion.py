@@ -1,15 +1,393 @@
-from core.config import get_settings
+import asyncio
+import json
+import random
+from functools import lru_cache
+from urllib.parse import urlencode
 import httpx
+from cryptography.fernet import Fernet, InvalidToken
+from core.config import get_settings
+from core.metrics import NOTION_REQUESTS
+from core.redis import get_redis
+from core.token_bucket import TokenBucket
 
 settings = get_settings()
 
+BUCKET_PREFIX = "notion-bucket:"
+BACKOFF_PREFIX = "notion-backoff:"
+MAX_TEXT_CHARS = 2000 # per rich text object
+MAX_URL_CHARS = 2000
+
+
+class NotionError(Exception):
+    def __init__(self, status_code: int, code: str, message: str):
+        super().__init__(f"Notion {status_code} {code}: {message}")
+        self.status_code = status_code
+        self.code = code
+
+
+class NotionUncertainError(NotionError):
+    """
+    A write failed in a way that doesn't say whether Notion applied it (timeout or 5xx after the
+    request was sent). Retrying blindly could append the same blocks twice; the caller checks first.
+    """
+
+
+class NotionClient:
+    """
+    Async Notion API client shared by every export job in a worker: one pooled HTTP/2 client, a
+    per-workspace token bucket in Redis so all workers together stay under Notion's per-integration
+    rate limit, and retries of 429s after Retry-After (also shared, so other workers hold off too).
+    Reads are retried on 5xx and timeouts as well; writes raise NotionUncertainError instead.
+    """
+
+    def __init__(self, redis=None, base_url: str = None):
+        self.redis = redis
+        self.client = httpx.AsyncClient(
+            base_url=(base_url or settings.NOTION_API_URL).rstrip("/") + "/",
+            http2=True,
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=settings.NOTION_HTTP_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.NOTION_HTTP_MAX_CONNECTIONS,
+                keepalive_expiry=30.0
+            ),
+            headers={"Notion-Version": settings.NOTION_VERSION},
+        )
+
+    async def close(self):
+        await self.client.aclose()
+
+    async def _throttle(self, workspace_id: str):
+        redis = self.redis or get_redis()
+        try:
+            # A 429 seen by any worker pauses the whole workspace for its Retry-After
+            backoff_ms = await redis.pttl(BACKOFF_PREFIX + workspace_id)
+            if backoff_ms and backoff_ms > 0:
+                await asyncio.sleep(backoff_ms / 1000)
+            await TokenBucket.take(
+                [(BUCKET_PREFIX + workspace_id, settings.NOTION_REQUESTS_PER_SECOND, settings.NOTION_BURST, 1)],
+                redis, max_wait=settings.NOTION_RATE_LIMIT_MAX_WAIT_SECONDS
+            )
+        except TimeoutError:
+            raise
+        except Exception as e:
+            # Redis trouble shouldn't stop exports; Notion's own 429s still apply
+            print(f"Notion rate limiter unavailable, proceeding: {e}")
+
+    async def _back_off(self, workspace_id: str, seconds: float):
+        redis = self.redis or get_redis()
+        try:
+            await redis.set(BACKOFF_PREFIX + workspace_id, 1, px=max(1, int(seconds * 1000)))
+        except Exception as e:
+            print(f"Notion backoff write failed: {e}")
+
+    async def request(self, method: str, path: str, token: str, workspace_id: str, json_body: dict = None, params: dict = None):
+        operation = f"{method} {path.split('/', 1)[0]}"
+        safe = method == "GET" or path == "search"
+        for attempt in range(settings.NOTION_MAX_RETRIES + 1):
+            await self._throttle(workspace_id)
+            backoff = min(settings.NOTION_RETRY_MAX_SECONDS, 2 ** attempt)
+            try:
+                response = await self.client.request(
+                    method, path, json=json_body, params=params, headers={"Authorization": f"Bearer {token}"}
+                )
+            except (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout) as e:
+                # Never reached Notion, so retrying can't duplicate anything
+                error = NotionError(0, "connection_error", str(e) or type(e).__name__)
+                delay = random.uniform(0, backoff)
+            except httpx.TransportError as e:
+                error = NotionError(0, "transport_error", str(e) or type(e).__name__)
+                if not safe:
+                    NOTION_REQUESTS.labels(operation=operation, outcome="uncertain").inc()
+                    raise NotionUncertainError(error.status_code, error.code, str(e)) from e
+                delay = random.uniform(0, backoff)
+            else:
+                if response.status_code < 400:
+                    NOTION_REQUESTS.labels(operation=operation, outcome="ok").inc()
+                    return response.json()
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = {}
+                error = NotionError(response.status_code, body.get("code", "error"), body.get("message", response.text[:200]))
+                if response.status_code == 429:
+                    # Rejected before anything was applied, so this is safe for writes too
+                    NOTION_REQUESTS.labels(operation=operation, outcome="rate_limited").inc()
+                    delay = _retry_after(response) or random.uniform(0, backoff)
+                    await self._back_off(workspace_id, delay)
+                elif response.status_code in (500, 502, 503, 504):
+                    if not safe:
+                        NOTION_REQUESTS.labels(operation=operation, outcome="uncertain").inc()
+                        raise NotionUncertainError(error.status_code, error.code, str(error))
+                    delay = random.uniform(0, backoff)
+                else:
+                    NOTION_REQUESTS.labels(operation=operation, outcome="error").inc()
+                    raise error
+            if attempt == settings.NOTION_MAX_RETRIES:
+                NOTION_REQUESTS.labels(operation=operation, outcome="error").inc()
+                raise error
+            print(f"Notion {operation} failed ({error.code}), retry {attempt + 1} in {delay:.1f}s")
+            await asyncio.sleep(delay)
+
+
+def _retry_after(response: httpx.Response) -> float:
+    try:
+        return min(float(response.headers.get("retry-after", 0)), settings.NOTION_RETRY_MAX_SECONDS)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+@lru_cache()
+def _token_cipher() -> Fernet:
+    if not settings.NOTION_TOKEN_ENCRYPTION_KEY:
+        raise RuntimeError("NOTION_TOKEN_ENCRYPTION_KEY is not set; Notion connections can't be saved or read without it")
+    return Fernet(settings.NOTION_TOKEN_ENCRYPTION_KEY)
+
+
+def encrypt_token(token: str) -> str:
+    return _token_cipher().encrypt(token.encode("utf-8")).decode("ascii")
+
+
+def decrypt_token(stored: str) -> str:
+    """
+    Raises InvalidToken if `stored` wasn't encrypted with NOTION_TOKEN_ENCRYPTION_KEY.
+    """
+    return _token_cipher().decrypt(stored.encode("ascii")).decode("utf-8")
+
+
+def _text(content, link: str = None, **annotations) -> list:
+    content = str(content)
+    # Notion caps a rich text object at 2000 characters and a rich text array at 100 objects
+    pieces = [content[i:i + MAX_TEXT_CHARS] for i in range(0, len(content), MAX_TEXT_CHARS)][:100] or [""]
+    rich_text = []
+    for piece in pieces:
+        item = {"type": "text", "text": {"content": piece}}
+        if link:
+            item["text"]["link"] = {"url": link}
+        if annotations:
+            item["annotations"] = annotations
+        rich_text.append(item)
+    return rich_text
+
+
+def _block(block_type: str, rich_text: list, **extra) -> dict:
+    return {"object": "block", "type": block_type, block_type: {"rich_text": rich_text, **extra}}
+
+
+def _as_list(value) -> list:
+    if isinstance(value, list):
+        return [item for item in value if item]
+    return [value] if value else []
+
+
+def summary_blocks(result: dict) -> list:
+    """
+    One summary as a flat run of blocks (no nesting, so summaries can be packed into appends by
+    block count): linked title, summary, takeaway, insights, action items, tags line, divider.
+    """
+    data = result.get("data") or {}
+    url = result.get("original_url") or ""
+    link = url if url.startswith(("http://", "https://")) and len(url) <= MAX_URL_CHARS else None
+    blocks = [_block("heading_2", _text(data.get("title") or url or "Untitled", link=link))]
+    if data.get("summary"):
+        blocks.append(_block("paragraph", _text(data["summary"])))
+    if data.get("key_takeaway"):
+        blocks.append(_block("callout", _text(data["key_takeaway"]), icon={"type": "emoji", "emoji": "💡"}))
+    for insight in _as_list(data.get("key_insights")):
+        blocks.append(_block("bulleted_list_item", _text(insight)))
+    for action in _as_list(data.get("action_items")):
+        blocks.append(_block("to_do", _text(action), checked=False))
+    meta = [f"#{tag}" for tag in _as_list(data.get("tags"))]
+    if data.get("category"):
+        meta.append(str(data["category"]))
+    if data.get("priority"):
+        meta.append(f"{data['priority']} priority")
+    if meta:
+        blocks.append(_block("paragraph", _text(" · ".join(meta), italic=True, color="gray")))
+    blocks.append({"object": "block", "type": "divider", "divider": {}})
+    return blocks
+
+
+def plain_text(block: dict) -> str:
+    content = block.get(block.get("type"), {})
+    return "".join(item.get("text", {}).get("content", "") for item in content.get("rich_text", []))
+
+
+def block_size(block: dict) -> int:
+    return len(json.dumps(block, ensure_ascii=False))
+
+
 class NotionService:
     @staticmethod
-    async def create_page(token: str, data: dict):
-        # TODO: Implement Notion page creation
-        pass
+    def authorize_url(state: str) -> str:
+        return f"{settings.NOTION_API_URL.rstrip('/')}/oauth/authorize?" + urlencode({
+            "client_id": settings.NOTION_CLIENT_ID,
+            "response_type": "code",
+            "owner": "user",
+            "redirect_uri": settings.NOTION_REDIRECT_URI,
+            "state": state,
+        })
+
+    @staticmethod
+    async def exchange_code_for_token(code: str) -> dict:
+        """
+        Returns Notion's token response: access_token, workspace_id, workspace_name, bot_id and
+        duplicated_template_id (the page the user picked when connecting, if any).
+        """
+        async with httpx.AsyncClient(timeout=15.0) as client:
+            response = await client.post(
+                f"{settings.NOTION_API_URL.rstrip('/')}/oauth/token",
+                auth=(settings.NOTION_CLIENT_ID, settings.NOTION_CLIENT_SECRET),
+                json={"grant_type": "authorization_code", "code": code, "redirect_uri": settings.NOTION_REDIRECT_URI},
+            )
+        body = response.json() if response.content else {}
+        if response.status_code >= 400:
+            raise NotionError(response.status_code, body.get("error", "error"), body.get("error_description", ""))
+        return body
+
+    @staticmethod
+    async def save_connection(supabase, user_id: str, token: dict):
+        row = {
+            "user_id": user_id,
+            "workspace_id": token["workspace_id"],
+            "workspace_name": token.get("workspace_name"),
+            "bot_id": token.get("bot_id"),
+            "target_page_id": token.get("duplicated_template_id"),
+        }
+        # Tokens are stored encrypted, so a database leak or a misconfigured policy doesn't hand out workspace access
+        stored = {**row, "access_token": encrypt_token(token["access_token"])}
+        await asyncio.to_thread(supabase.table("notion_connections").upsert(stored).execute)
+        return row
+
+    @staticmethod
+    async def get_connection(supabase, user_id: str):
+        response = await asyncio.to_thread(
+            supabase.table("notion_connections").select("*").eq("user_id", user_id).limit(1).execute
+        )
+        if not response.data:
+            return None
+        connection = response.data[0]
+        try:
+            connection["access_token"] = decrypt_token(connection["access_token"])
+        except InvalidToken:
+            # Encrypted under a different key (or not at all): the user has to connect again
+            print(f"Notion token for {user_id} can't be decrypted; treating the connection as missing")
+            return None
+        return connection
+
+    @staticmethod
+    async def set_target_page(supabase, user_id: str, page_id: str):
+        await asyncio.to_thread(
+            supabase.table("notion_connections").update({"target_page_id": page_id}).eq("user_id", user_id).execute
+        )
+
+    @staticmethod
+    async def find_target_page(notion: NotionClient, connection: dict):
+        """
+        The first page the user shared with the integration, for connections made without picking one.
+        """
+        response = await notion.request(
+            "POST", "search", connection["access_token"], connection["workspace_id"],
+            json_body={"filter": {"property": "object", "value": "page"}, "page_size": 1},
+        )
+        results = response.get("results") or []
+        return results[0]["id"] if results else None
+
+    @staticmethod
+    async def find_page(notion: NotionClient, connection: dict, title: str):
+        response = await notion.request(
+            "POST", "search", connection["access_token"], connection["workspace_id"],
+            json_body={"query": title, "filter": {"property": "object", "value": "page"}, "page_size": 10},
+        )
+        for page in response.get("results") or []:
+            title_property = (page.get("properties") or {}).get("title", {})
+            if "".join(item.get("plain_text", "") for item in title_property.get("title", [])) == title:
+                return page["id"]
+        return None
+
+    @staticmethod
+    async def create_page(notion: NotionClient, connection: dict, parent_page_id: str, title: str, children: list = None, verify: bool = False) -> str:
+        """
+        Creates a child page of `parent_page_id` and returns its ID. A write whose outcome is
+        unknown, or any write with `verify`, is resolved by looking the page up by its
+        (caller-unique) title first.
+        """
+        if verify:
+            existing = await NotionService.find_page(notion, connection, title)
+            if existing:
+                return existing
+        body = {
+            "parent": {"page_id": parent_page_id},
+            "properties": {"title": {"title": _text(title)}},
+            "children": children or [],
+        }
+        for attempt in range(settings.NOTION_MAX_RETRIES + 1):
+            try:
+                page = await notion.request("POST", "pages", connection["access_token"], connection["workspace_id"], json_body=body)
+                return page["id"]
+            except NotionUncertainError:
+                if attempt == settings.NOTION_MAX_RETRIES:
+                    raise
+                existing = await NotionService.find_page(notion, connection, title)
+                if existing:
+                    return existing
+
+    @staticmethod
+    async def list_children(notion: NotionClient, connection: dict, block_id: str, start_cursor: str = None, page_size: int = 100) -> dict:
+        params = {"page_size": page_size}
+        if start_cursor:
+            params["start_cursor"] = start_cursor
+        return await notion.request(
+            "GET", f"blocks/{block_id}/children", connection["access_token"], connection["workspace_id"], params=params
+        )
+
+    @staticmethod
+    async def append_blocks(notion: NotionClient, connection: dict, block_id: str, children: list, after_block_id: str = None, verify: bool = False) -> str:
+        """
+        Appends `children` (at most NOTION_APPEND_MAX_BLOCKS) at the end of `block_id` and returns the
+        ID of the last new block. `after_block_id` is the current last child (None if empty); when a
+        write's outcome is unknown, or up front with `verify`, the children after it are compared
+        with `children` so a retry never appends the same blocks twice.
+        """
+        if verify:
+            appended = await NotionService._appended_after(notion, connection, block_id, after_block_id, children)
+            if appended:
+                print(f"Notion append to {block_id} had already been applied; skipping it")
+                return appended
+        for attempt in range(settings.NOTION_MAX_RETRIES + 1):
+            try:
+                response = await notion.request(
+                    "PATCH", f"blocks/{block_id}/children", connection["access_token"], connection["workspace_id"],
+                    json_body={"children": children},
+                )
+                return response["results"][-1]["id"]
+            except NotionUncertainError:
+                if attempt == settings.NOTION_MAX_RETRIES:
+                    raise
+                appended = await NotionService._appended_after(notion, connection, block_id, after_block_id, children)
+                if appended:
+                    print(f"Notion append to {block_id} had already been applied; not retrying")
+                    return appended
 
     @staticmethod
-    async def exchange_code_for_token(code: str):
-        # TODO: Implement OAuth code exchange
-        pass
+    async def _appended_after(notion: NotionClient, connection: dict, block_id: str, after_block_id: str, children: list):
+        """
+        Returns the ID of the last block if the children following `after_block_id` match `children`, else None.
+        """
+        found = []
+        cursor = after_block_id
+        while len(found) < len(children):
+            response = await NotionService.list_children(notion, connection, block_id, start_cursor=cursor)
+            results = response.get("results") or []
+            # The start cursor is the block itself; what we're looking for comes after it
+            found += [block for block in results if block.get("id") != after_block_id]
+            if not response.get("has_more"):
+                break
+            cursor = response.get("next_cursor")
+        found = found[:len(children)]
+        if len(found) < len(children):
+            return None
+        for mine, theirs in zip(children, found):
+            if mine["type"] != theirs.get("type") or plain_text(mine) != plain_text(theirs):
+                return None
+        return found[-1]["id"]
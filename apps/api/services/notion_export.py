@@ -0,0 +1,179 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from core.config import get_settings
+from core.metrics import NOTION_EXPORTED
+from services.notion import NotionService, summary_blocks, block_size
+from services.results import encode_cursor
+
+settings = get_settings()
+
+EXPORT_PREFIX = "notion-export:"
+ACTIVE_PREFIX = "notion-export:active:"
+# Sorts after any real job ID, so a cursor built from it keeps the row it was built from
+MAX_JOB_ID = "ffffffff-ffff-ffff-ffff-ffffffffffff"
+INT_FIELDS = ("exported", "total", "requests", "offset", "attempts")
+
+
+class NotionExportStore:
+    """
+    Export state in Redis: status, counters and the resume position (history cursor, offset into
+    that page, the export page and its last block). One export runs per user at a time.
+    """
+
+    @staticmethod
+    async def claim(redis, user_id: str, export_id: str) -> bool:
+        claimed = await redis.set(ACTIVE_PREFIX + user_id, export_id, nx=True, ex=settings.NOTION_EXPORT_TIMEOUT_SECONDS)
+        return bool(claimed) or _decode(await redis.get(ACTIVE_PREFIX + user_id)) == export_id
+
+    @staticmethod
+    async def active(redis, user_id: str):
+        value = await redis.get(ACTIVE_PREFIX + user_id)
+        return _decode(value) if value else None
+
+    @staticmethod
+    async def create(redis, export_id: str, user_id: str, tag: str = None) -> bool:
+        if not await NotionExportStore.claim(redis, user_id, export_id):
+            return False
+        key = EXPORT_PREFIX + export_id
+        pipe = redis.pipeline(transaction=True)
+        pipe.hset(key, mapping={
+            "status": "queued",
+            "user_id": user_id,
+            "tag": tag or "",
+            "exported": 0,
+            "total": 0,
+            "requests": 0,
+            "cursor": "",
+            "offset": 0,
+            "page_id": "",
+            "last_block_id": "",
+            "attempts": 1,
+            "error": "",
+            "created_at": time.time(),
+        })
+        pipe.expire(key, settings.NOTION_EXPORT_TTL_SECONDS)
+        await pipe.execute()
+        return True
+
+    @staticmethod
+    async def get(redis, export_id: str):
+        raw = await redis.hgetall(EXPORT_PREFIX + export_id)
+        if not raw:
+            return None
+        state = {_decode(k): _decode(v) for k, v in raw.items()}
+        for field in INT_FIELDS:
+            state[field] = int(state.get(field) or 0)
+        return state
+
+    @staticmethod
+    async def update(redis, export_id: str, **fields):
+        await redis.hset(EXPORT_PREFIX + export_id, mapping={k: "" if v is None else v for k, v in fields.items()})
+
+    @staticmethod
+    async def finish(redis, export_id: str, user_id: str, status: str, error: str = None):
+        await NotionExportStore.update(redis, export_id, status=status, error=error or "")
+        if await NotionExportStore.active(redis, user_id) == export_id:
+            await redis.delete(ACTIVE_PREFIX + user_id)
+
+    @staticmethod
+    def public(export_id: str, state: dict) -> dict:
+        total = state["total"]
+        return {
+            "export_id": export_id,
+            "status": state["status"],
+            "exported": state["exported"],
+            "total": total or None,
+            "progress": round(state["exported"] / total, 4) if total else None,
+            "notion_page_id": state["page_id"] or None,
+            "error": state["error"] or None,
+        }
+
+
+class NotionExporter:
+    """
+    Appends a user's history to one Notion page, newest first. Summaries are packed into as few
+    block appends as Notion's per-request limits allow (NOTION_APPEND_MAX_BLOCKS blocks,
+    NOTION_APPEND_MAX_BYTES) instead of a request per summary, and the next history page is read
+    while the current one is being appended. Progress is saved after every append, so a failed or
+    interrupted export picks up at the first summary that isn't in Notion yet.
+    """
+
+    @staticmethod
+    async def run(notion, redis, export_id: str, connection: dict, fetch_page) -> dict:
+        """
+        `fetch_page(cursor)` returns (items, next_cursor) like ResultStore.history with include_content.
+        """
+        state = await NotionExportStore.get(redis, export_id)
+        # A previous run may have been stopped between a write reaching Notion and its progress being
+        # saved, so the first write of a resumed run checks whether it's already there
+        verify = state["attempts"] > 1 or state["status"] == "exporting"
+        await NotionExportStore.update(redis, export_id, status="exporting")
+        exported, requests = state["exported"], state["requests"]
+
+        # 1. The page the summaries go into, created once per export
+        page_id = state["page_id"]
+        if not page_id:
+            created = datetime.fromtimestamp(float(state["created_at"]), timezone.utc)
+            # The export ID makes the title unique, which is how an uncertain create is resolved
+            title = f"Link-Collector export {created:%Y-%m-%d} ({export_id[:8]})"
+            page_id = await NotionService.create_page(notion, connection, connection["target_page_id"], title, verify=verify)
+            requests += 1
+            await NotionExportStore.update(redis, export_id, page_id=page_id, requests=requests)
+        last_block_id = state["last_block_id"] or None
+
+        # 2. Pack summaries into appends; each pending entry remembers the resume position after it
+        pending = []
+        pending_blocks = 0
+        pending_bytes = 0
+
+        async def flush():
+            nonlocal last_block_id, exported, requests, pending_blocks, pending_bytes, verify
+            blocks = [block for entry_blocks, _ in pending for block in entry_blocks]
+            last_block_id = await NotionService.append_blocks(notion, connection, page_id, blocks, last_block_id, verify=verify)
+            verify = False
+            exported += len(pending)
+            requests += 1
+            cursor, offset = pending[-1][1]
+            await NotionExportStore.update(
+                redis, export_id, cursor=cursor, offset=offset, last_block_id=last_block_id,
+                exported=exported, requests=requests
+            )
+            NOTION_EXPORTED.inc(len(pending))
+            pending.clear()
+            pending_blocks = pending_bytes = 0
+
+        cursor, offset = state["cursor"] or None, state["offset"]
+        page_task = asyncio.create_task(fetch_page(cursor))
+        try:
+            while page_task:
+                items, next_cursor = await page_task
+                page_task = asyncio.create_task(fetch_page(next_cursor)) if next_cursor else None
+                if cursor is None and items:
+                    # Pin the first page: summaries finished during the export would otherwise shift it
+                    cursor = encode_cursor({"created_at": items[0]["created_at"], "job_id": MAX_JOB_ID})
+                for index in range(offset, len(items)):
+                    blocks = summary_blocks(items[index].get("result") or {})
+                    if len(blocks) > settings.NOTION_APPEND_MAX_BLOCKS:
+                        blocks = blocks[:settings.NOTION_APPEND_MAX_BLOCKS - 1] + blocks[-1:]
+                    size = sum(block_size(block) for block in blocks)
+                    if pending and (
+                        pending_blocks + len(blocks) > settings.NOTION_APPEND_MAX_BLOCKS
+                        or pending_bytes + size > settings.NOTION_APPEND_MAX_BYTES
+                    ):
+                        await flush()
+                    pending.append((blocks, (cursor, index + 1)))
+                    pending_blocks += len(blocks)
+                    pending_bytes += size
+                cursor, offset = next_cursor, 0
+            if pending:
+                await flush()
+        finally:
+            if page_task:
+                page_task.cancel()
+
+        return {"page_id": page_id, "exported": exported, "requests": requests}
+
+
+def _decode(value) -> str:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
@@ -0,0 +1,210 @@
+import time
+from datetime import datetime, timezone
+from arq.constants import default_queue_name
+from fastapi import Depends, HTTPException, status
+from core.config import get_settings
+from core.redis import get_redis
+from core.auth import UserProfile, get_user_profile
+
+settings = get_settings()
+
+QUEUE_PREFIX = "fair-queue:"
+# Job starts are counted in buckets of this many seconds to measure recent throughput
+THROUGHPUT_BUCKET_SECONDS = 10
+
+# Admission for one job, atomic with respect to the user's other submissions.
+# arq dequeues in score order, so the score is where fairness happens: each user has a virtual
+# clock that advances by slot / tier weight per job (start-time fair queueing), and each tier
+# gets a head start, so a PRO job sorts ahead of FREE jobs submitted up to the difference earlier.
+# Scores are clamped to now so no job is ever held back while workers are idle.
+# KEYS: user in-flight zset, user virtual clock, tier pending zset.
+# ARGV: job_id, max_in_flight, head_start_ms, slot_ms, stale_ms.
+# Returns {admitted, in_flight, score_ms}.
+ADMIT_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) * 1000 + math.floor(tonumber(now_parts[2]) / 1000)
+local head_start = tonumber(ARGV[3])
+local stale_ms = tonumber(ARGV[5])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - stale_ms)
+local in_flight = redis.call('ZCARD', KEYS[1])
+if in_flight >= tonumber(ARGV[2]) then
+    return {0, in_flight, 0}
+end
+local start = math.max(now - head_start, tonumber(redis.call('GET', KEYS[2]) or '0'))
+local finish = start + tonumber(ARGV[4])
+redis.call('SET', KEYS[2], finish, 'PX', math.max(1, finish - (now - head_start)))
+redis.call('ZADD', KEYS[1], now, ARGV[1])
+redis.call('PEXPIRE', KEYS[1], stale_ms)
+redis.call('ZADD', KEYS[3], now, ARGV[1])
+return {1, in_flight + 1, math.min(start, now)}
+"""
+
+
+def in_flight_key(user_id: str) -> str:
+    return f"{QUEUE_PREFIX}in-flight:{user_id}"
+
+
+def batch_in_flight_key(user_id: str) -> str:
+    return f"{QUEUE_PREFIX}in-flight-batches:{user_id}"
+
+
+def pending_key(tier: str) -> str:
+    return f"{QUEUE_PREFIX}pending:{tier}"
+
+
+def started_key(bucket: int) -> str:
+    return f"{QUEUE_PREFIX}started:{bucket}"
+
+
+class FairQueue:
+    """
+    Tier-aware scheduling on top of the single arq queue: weighted fair ordering between users
+    and tiers, per-user in-flight caps and per-tier job timeouts. Pending jobs are also tracked
+    per tier so queue depth can be reported without scanning arq's queue.
+    """
+    _script = None
+
+    @staticmethod
+    def tier_config(tier: str) -> dict:
+        return settings.QUEUE_TIERS.get(tier, settings.QUEUE_TIERS["FREE"])
+
+    @staticmethod
+    def job_timeout(tier: str) -> float:
+        return FairQueue.tier_config(tier)["job_timeout_seconds"]
+
+    @classmethod
+    async def admit(cls, redis, user_id: str, tier: str, job_id: str, batch_size: int = None):
+        """
+        Reserves an in-flight slot for `job_id`. Returns (admitted, in_flight, defer_until), where
+        defer_until is the datetime to enqueue the job with (`_defer_until`) so it sorts fairly.
+        Batches (`batch_size` links) are capped by max_batches_in_flight instead of max_in_flight,
+        and advance the user's virtual clock by one slot per link.
+        """
+        config = cls.tier_config(tier)
+        if cls._script is None:
+            cls._script = redis.register_script(ADMIT_SCRIPT)
+        admitted, in_flight, score = await cls._script(
+            keys=[
+                batch_in_flight_key(user_id) if batch_size else in_flight_key(user_id),
+                f"{QUEUE_PREFIX}clock:{user_id}",
+                pending_key(tier),
+            ],
+            args=[
+                job_id,
+                config["max_batches_in_flight"] if batch_size else config["max_in_flight"],
+                int(config["head_start_seconds"] * 1000),
+                int(settings.QUEUE_SLOT_SECONDS * 1000 / config["weight"] * (batch_size or 1)),
+                settings.QUEUE_IN_FLIGHT_TTL_SECONDS * 1000,
+            ],
+            client=redis
+        )
+        return admitted == 1, in_flight, datetime.fromtimestamp(score / 1000, tz=timezone.utc)
+
+    @staticmethod
+    async def in_flight(redis, user_id: str) -> int:
+        stale_before = datetime.now(timezone.utc).timestamp() * 1000 - settings.QUEUE_IN_FLIGHT_TTL_SECONDS * 1000
+        pipe = redis.pipeline(transaction=False)
+        pipe.zremrangebyscore(in_flight_key(user_id), "-inf", stale_before)
+        pipe.zcard(in_flight_key(user_id))
+        _, count = await pipe.execute()
+        return count
+
+    @staticmethod
+    async def started(redis, tier: str, job_id: str):
+        bucket = int(time.time() // THROUGHPUT_BUCKET_SECONDS)
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.zrem(pending_key(tier), job_id)
+            pipe.incr(started_key(bucket))
+            pipe.expire(started_key(bucket), settings.QUEUE_THROUGHPUT_WINDOW_SECONDS + THROUGHPUT_BUCKET_SECONDS * 2)
+            await pipe.execute()
+        except Exception as e:
+            print(f"Queue bookkeeping failed for {job_id}: {e}")
+
+    @staticmethod
+    async def finished(redis, user_id: str, tier: str, job_id: str):
+        """
+        Frees the job's in-flight slot. Safe to call more than once (worker and cancel both do).
+        """
+        try:
+            pipe = redis.pipeline(transaction=False)
+            pipe.zrem(in_flight_key(user_id), job_id)
+            pipe.zrem(batch_in_flight_key(user_id), job_id)
+            pipe.zrem(pending_key(tier), job_id)
+            await pipe.execute()
+        except Exception as e:
+            print(f"Queue bookkeeping failed for {job_id}: {e}")
+
+    @staticmethod
+    async def depths(redis) -> dict:
+        """
+        Returns {tier: jobs waiting to start}. Entries for jobs lost to a crashed worker age out.
+        """
+        stale_before = datetime.now(timezone.utc).timestamp() * 1000 - settings.QUEUE_IN_FLIGHT_TTL_SECONDS * 1000
+        pipe = redis.pipeline(transaction=False)
+        tiers = list(settings.QUEUE_TIERS)
+        for tier in tiers:
+            pipe.zremrangebyscore(pending_key(tier), "-inf", stale_before)
+            pipe.zcard(pending_key(tier))
+        results = await pipe.execute()
+        return {tier: results[i * 2 + 1] for i, tier in enumerate(tiers)}
+
+    @staticmethod
+    async def throughput(redis) -> float:
+        """
+        Jobs started per second across all workers over the last QUEUE_THROUGHPUT_WINDOW_SECONDS
+        (the bucket in progress is left out since it is only partly filled).
+        """
+        current = int(time.time() // THROUGHPUT_BUCKET_SECONDS)
+        buckets = max(1, settings.QUEUE_THROUGHPUT_WINDOW_SECONDS // THROUGHPUT_BUCKET_SECONDS)
+        counts = await redis.mget([started_key(current - i) for i in range(1, buckets + 1)])
+        return sum(int(count) for count in counts if count) / (buckets * THROUGHPUT_BUCKET_SECONDS)
+
+    @staticmethod
+    async def estimate_wait(redis, tier: str, defer_until: datetime = None) -> dict:
+        """
+        Estimates how long a job would wait for a worker: the jobs that sort ahead of it divided by
+        recent throughput (floored at QUEUE_MIN_THROUGHPUT so a quiet spell doesn't read as a stalled
+        queue). Pass the job's `defer_until` from admit() for an enqueued job; without it the estimate
+        is for new work from `tier` by a user with nothing else queued.
+        """
+        if defer_until:
+            cutoff_ms = defer_until.timestamp() * 1000
+        else:
+            cutoff_ms = time.time() * 1000 - FairQueue.tier_config(tier)["head_start_seconds"] * 1000
+        pipe = redis.pipeline(transaction=False)
+        pipe.zcount(default_queue_name, "-inf", cutoff_ms)
+        pipe.zcard(default_queue_name)
+        for name in settings.QUEUE_TIERS:
+            pipe.zcard(pending_key(name))
+        ahead, queued, *pending = await pipe.execute()
+        # arq keeps running jobs in its queue until they finish; they are the oldest entries,
+        # so they fall inside the count above and are taken back out
+        running = max(0, queued - sum(pending))
+        # An enqueued job is counted in its own range
+        ahead = max(0, ahead - running - (1 if defer_until else 0))
+        throughput = max(await FairQueue.throughput(redis), settings.QUEUE_MIN_THROUGHPUT)
+        return {
+            "ahead": ahead,
+            "throughput": round(throughput, 3),
+            "wait_seconds": round(ahead / throughput, 1),
+        }
+
+
+async def enforce_in_flight_cap(profile: UserProfile = Depends(get_user_profile)) -> UserProfile:
+    """
+    FastAPI dependency: early 429 for users already at their tier's in-flight cap, declared
+    before check_usage_quota so the request doesn't consume a credit. FairQueue.admit enforces
+    the cap atomically at enqueue time; this is only the cheap pre-check.
+    """
+    try:
+        in_flight = await FairQueue.in_flight(get_redis(), profile.user_id)
+    except Exception as e:
+        print(f"In-flight check unavailable, allowing request: {e}")
+        return profile
+    if in_flight >= FairQueue.tier_config(profile.tier)["max_in_flight"]:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many links processing at once. Wait for one to finish."
+        )
+    return profile
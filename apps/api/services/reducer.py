@@ -0,0 +1,191 @@
+import math
+import re
+import string
+from collections import Counter
+from itertools import repeat
+from core.config import get_settings
+
+settings = get_settings()
+
+# Rough characters per token for budgeting; exact counts would cost more than the reduction itself.
+# Latin-script text runs ~4 characters a token; CJK, Hangul and other scripts that take 3 bytes in
+# UTF-8 run ~1-2 (GPT-4o tokenizer: Korean ~1.8, Japanese ~1.3)
+CHARS_PER_TOKEN = 4
+WIDE_CHARS_PER_TOKEN = 1.4
+CHARS_PER_WORD = 6
+
+# Sentence ends are marked with str.replace rather than a regex split: this stage has to stay in
+# the low milliseconds on megabyte inputs, and whole-text C string operations are what get it there
+SENTENCE_ENDS = (".", "!", "?", "。", "！", "？")
+MARK = "\x00"
+RANK_SAMPLE_SENTENCES = 2000
+PUNCTUATION_TABLE = str.maketrans({char: " " for char in string.punctuation + "“”‘’«»…–—"})
+# Whole lines that are page chrome rather than content. Exact, short strings only, so a sentence that
+# merely mentions cookies or subscribing is kept (checked only on lines up to 150 chars)
+BOILERPLATE_RE = re.compile(
+    r"^(?:advertisement|sponsored( content)?|share( this)?( article| story| post)?|share on \w+|share via email"
+    r"|related( articles| posts| stories)?|read more|read next|continue reading|sign up|sign in|log in"
+    r"|subscribe( now)?|subscribe to our newsletter|follow us( on \w+)?|click here|skip to( main)? content"
+    r"|back to top|loading|print this (article|page)|email this (article|page)|comments?( \(\d+\))?"
+    r"|accept( all)? cookies|reject( all)? cookies|manage cookies|cookie (settings|preferences|policy)"
+    r"|(© ?\d{4}(-\d{4})?( [^.]{1,40})?\. ?)?all rights reserved|© ?\d{4}(-\d{4})?( [^.]{1,40})?)[.!:…]*$",
+    re.IGNORECASE
+)
+# Caption filler: [Music], (applause) and disfluencies. Each pattern starts with a literal so the
+# regex engine can skip ahead instead of trying every position
+CAPTION_TAG_RE = re.compile(r"\[[^\]\n]{1,30}\]")
+CAPTION_SOUND_RE = re.compile(r"\((?:[Mm]usic|[Aa]pplause|[Ll]aughter|[Ll]aughs|[Ii]naudible|[Cc]rosstalk)\)")
+FILLER_RE = re.compile(r" (?:[uU]+[mMhH]+|[eE][rR][mM]|[hH][mM]+)\b[,.]?")
+STOPWORDS = frozenset(
+    "a an the and or but if then so of to in on at by for with from as is are was were be been being it its"
+    " this that these those i you he she we they me him her us them my your our their not no do does did"
+    " have has had will would can could should may might just also very really like get got going go know"
+    " think what which who when where how there here about into out up down over than too all any some".split()
+)
+
+
+def estimate_tokens(text: str) -> int:
+    # One encode() tells how many characters are 3-byte ones, without a tokenizer pass: every
+    # 3-byte character adds two bytes (2-byte scripts like Cyrillic count half, close enough)
+    wide = (len(text.encode("utf-8", "ignore")) - len(text)) // 2
+    return math.ceil((len(text) - wide) / CHARS_PER_TOKEN + wide / WIDE_CHARS_PER_TOKEN)
+
+
+def _normalize_spaces(text: str) -> str:
+    text = text.replace("\r", "\n")
+    for char in ("\t", "\u00a0", "\u200b"):
+        if char in text:
+            text = text.replace(char, " ")
+    while "  " in text:
+        text = text.replace("  ", " ")
+    return text
+
+
+def _mark_sentences(text: str) -> str:
+    # Spaces are already single, so "<end> " is exactly a sentence boundary
+    for end in SENTENCE_ENDS:
+        if end in text:
+            text = text.replace(end + " ", end + MARK)
+    return text
+
+
+def _transcript_sentences(text: str) -> list:
+    sentences = [sentence for sentence in _mark_sentences(text).split(MARK) if sentence]
+    # Auto-generated captions often have no punctuation at all; fall back to ~30-word windows,
+    # cut at the first space past each window
+    if len(text) / max(1, len(sentences)) > 60 * CHARS_PER_WORD:
+        sentences = []
+        start = 0
+        while start < len(text):
+            end = text.find(" ", start + 30 * CHARS_PER_WORD)
+            end = len(text) if end == -1 else end
+            sentences.append(text[start:end])
+            start = end + 1
+    return sentences
+
+
+def reduce_text(text: str, transcript: bool = False, token_budget: int = None):
+    """
+    Cuts what the LLM would be paid to read without adding information: repeated lines and
+    sentences, page boilerplate, caption filler and whitespace. Transcripts (one caption per line)
+    are collapsed into paragraphs. If the result is still over `token_budget` (default
+    REDUCER_TOKEN_BUDGET, 0 = no limit), sentences are ranked by how central their words are to the
+    document and the best are kept, in their original order.
+    Returns (text, stats) with estimated tokens before/after.
+    """
+    budget = settings.REDUCER_TOKEN_BUDGET if token_budget is None else token_budget
+    tokens_before = estimate_tokens(text)
+
+    # 1. Whitespace and caption filler
+    text = _normalize_spaces(text)
+    if transcript:
+        if "[" in text:
+            text = CAPTION_TAG_RE.sub(" ", text)
+        if "(" in text:
+            text = CAPTION_SOUND_RE.sub(" ", text)
+        # The leading space lets fillers at the start of a caption line match too
+        text = FILLER_RE.sub("", text.replace(">>", " ").replace("\n", "\n "))
+        text = _normalize_spaces(text)
+
+    # 2. Repeated lines and boilerplate (transcripts have no page chrome, only rolling-caption repeats).
+    # Keys come from one lower() over the whole text; `seen.add` returns None, so the filter also records
+    text = text.replace(" \n", "\n").replace("\n ", "\n").strip()
+    seen = {""}
+    lines = [
+        line for line, key in zip(text.split("\n"), text.lower().split("\n"))
+        if key not in seen and not seen.add(key)
+    ]
+    if not transcript:
+        lines = [line for line in lines if len(line) > 150 or not BOILERPLATE_RE.match(line)]
+
+    # 3. Paragraphs of sentences: extracted pages have one paragraph per line; transcripts are
+    # re-flowed into paragraphs of a few sentences
+    if transcript:
+        sentences = _transcript_sentences(" ".join(lines))
+        paragraphs = [sentences[i:i + 5] for i in range(0, len(sentences), 5)]
+    else:
+        paragraphs = [paragraph.split(MARK) for paragraph in _mark_sentences("\n".join(lines)).split("\n")]
+
+    # 4. Repeated sentences (short ones like "Yes." or list markers are left alone)
+    units = [
+        (index, position, sentence)
+        for index, paragraph in enumerate(paragraphs)
+        for position, sentence in enumerate(paragraph)
+        if sentence
+    ]
+    seen = set()
+    keys = "\n".join(sentence for _, _, sentence in units).lower().split("\n")
+    units = [
+        unit for unit, key in zip(units, keys)
+        if len(key) <= 20 or (key not in seen and not seen.add(key))
+    ]
+
+    # 5. Rank down to the budget, converting between characters and tokens at the document's own rate
+    ranked = False
+    chars_per_token = len(text) / max(1, estimate_tokens(text))
+    if budget and sum(len(sentence) + 1 for _, _, sentence in units) / chars_per_token > budget:
+        ranked = True
+        # One lower/translate over the whole text, then one line of words per sentence.
+        # Word frequencies only need to be relative, so on long inputs they come from a sample of sentences
+        unit_lines = "\n".join(sentence for _, _, sentence in units).lower().translate(PUNCTUATION_TABLE).split("\n")
+        step = max(1, len(unit_lines) // RANK_SAMPLE_SENTENCES)
+        weights = {word: math.log1p(count) for word, count in Counter(" ".join(unit_lines[::step]).split()).items()}
+        for word in STOPWORDS.intersection(weights):
+            weights[word] = 0.0
+        scores = []
+        for order, words in enumerate(unit_lines):
+            words = words.split()
+            score = sum(map(weights.get, words, repeat(0.0))) / math.sqrt(len(words) + 1)
+            # Leads carry more than their word counts suggest: paragraph openers and the start of the document
+            if units[order][1] == 0:
+                score *= 1.2
+            if order < len(units) * 0.05:
+                score *= 1.5
+            scores.append(score)
+
+        keep = set()
+        remaining = budget * chars_per_token
+        for order in sorted(range(len(units)), key=scores.__getitem__, reverse=True):
+            size = len(units[order][2]) + 1
+            if size <= remaining:
+                keep.add(order)
+                remaining -= size
+        units = [unit for order, unit in enumerate(units) if order in keep]
+
+    # 6. Reassemble, one paragraph per line
+    output = []
+    current_index = None
+    for index, _, sentence in units:
+        if index != current_index:
+            output.append([])
+            current_index = index
+        output[-1].append(sentence)
+    reduced = "\n".join(" ".join(paragraph) for paragraph in output)
+
+    tokens_after = estimate_tokens(reduced)
+    return reduced, {
+        "tokens_before": tokens_before,
+        "tokens_after": tokens_after,
+        "tokens_saved": max(0, tokens_before - tokens_after),
+        "ranked": ranked,
+    }
@@ -0,0 +1,115 @@
+import asyncio
+import base64
+import json
+import uuid
+import zstandard
+from datetime import datetime
+from core.config import get_settings
+from db.client import get_supabase_client
+
+settings = get_settings()
+
+_compressor = zstandard.ZstdCompressor(level=settings.RESULT_ZSTD_LEVEL)
+_decompressor = zstandard.ZstdDecompressor()
+
+# Columns for history listings; `content` is only fetched when the caller asks for it
+SUMMARY_COLUMNS = "job_id, url, title, tags, category, priority, language, created_at"
+
+
+def compress_result(result: dict) -> str:
+    # PostgREST takes bytea as a "\x"-prefixed hex string
+    raw = json.dumps(result, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    return "\\x" + _compressor.compress(raw).hex()
+
+
+def decompress_result(content: str) -> dict:
+    return json.loads(_decompressor.decompress(bytes.fromhex(content[2:])))
+
+
+def encode_cursor(row: dict) -> str:
+    return base64.urlsafe_b64encode(f"{row['created_at']}|{row['job_id']}".encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str):
+    """
+    Raises ValueError for anything that isn't a cursor we issued (the values end up in a filter).
+    """
+    created_at, job_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|", 1)
+    return datetime.fromisoformat(created_at).isoformat(), str(uuid.UUID(job_id))
+
+
+class ResultStore:
+    """
+    Durable store for finished summaries in the Postgres `results` table, zstd-compressed.
+    arq's result in Redis is only the hot tier (RESULT_HOT_TTL_SECONDS); /status falls back here
+    and /history pages through it. Every submission that returns a summary gets a row for its
+    user: jobs, batch items, cache hits and submissions attached to another user's job.
+    """
+
+    @staticmethod
+    async def save(supabase, job_id: str, user_id: str, result: dict, language: str = "Auto"):
+        """
+        Best-effort. Pass supabase=None to have the client built here, so a client that can't be
+        built is logged like any other failed write instead of failing the caller.
+        """
+        data = result.get("data", {})
+        tags = data.get("tags") if isinstance(data.get("tags"), list) else []
+        row = {
+            "job_id": job_id,
+            "user_id": user_id,
+            "url": result.get("original_url"),
+            "title": data.get("title"),
+            "tags": [str(tag) for tag in tags],
+            "category": data.get("category"),
+            "priority": data.get("priority"),
+            "language": language,
+            "content": compress_result(result),
+        }
+        try:
+            supabase = supabase or get_supabase_client()
+            await asyncio.to_thread(supabase.table("results").upsert(row).execute)
+        except Exception as e:
+            # The hot copy in Redis still serves /status until it expires
+            print(f"Result store write failed for {job_id}: {e}")
+
+    @staticmethod
+    async def get(supabase, job_id: str):
+        response = await asyncio.to_thread(
+            supabase.table("results").select("content").eq("job_id", job_id).limit(1).execute
+        )
+        if not response.data:
+            return None
+        return decompress_result(response.data[0]["content"])
+
+    @staticmethod
+    async def count(supabase, user_id: str, tag: str = None) -> int:
+        query = supabase.table("results").select("job_id", count="exact").eq("user_id", user_id)
+        if tag:
+            query = query.contains("tags", [tag])
+        response = await asyncio.to_thread(query.limit(1).execute)
+        return response.count or 0
+
+    @staticmethod
+    async def history(supabase, user_id: str, limit: int = 20, cursor: str = None, tag: str = None, include_content: bool = False):
+        """
+        Newest first, keyset-paginated on (created_at, job_id) so deep pages cost the same as the
+        first one. Returns (items, next_cursor); next_cursor is None on the last page.
+        """
+        columns = SUMMARY_COLUMNS + (", content" if include_content else "")
+        query = supabase.table("results").select(columns).eq("user_id", user_id)
+        if tag:
+            query = query.contains("tags", [tag])
+        if cursor:
+            created_at, job_id = decode_cursor(cursor)
+            query = query.or_(
+                f'created_at.lt."{created_at}",and(created_at.eq."{created_at}",job_id.lt.{job_id})'
+            )
+        query = query.order("created_at", desc=True).order("job_id", desc=True).limit(limit + 1)
+        response = await asyncio.to_thread(query.execute)
+
+        rows = response.data[:limit]
+        for row in rows:
+            if include_content:
+                row["result"] = decompress_result(row.pop("content"))
+        next_cursor = encode_cursor(rows[-1]) if len(response.data) > limit else None
+        return rows, next_cursor
@@ -0,0 +1,145 @@
+from core.config import get_settings
+from core.redis import get_redis
+from services.chunking import count_tokens
+
+settings = get_settings()
+
+METRICS_PREFIX = "llm-metrics:"
+WINDOW = 200 # samples kept per model for latency, outcome and cost
+MIN_SAMPLES = 10 # below this a model is considered healthy by default
+
+
+def _percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class ModelRouter:
+    """
+    Picks the LLM for a request. Models in LLM_MODELS are listed in order of preference; the
+    first one that fits the input, stays under LLM_COST_BUDGET_USD and is healthy (rolling p95
+    latency under LLM_LATENCY_BUDGET_MS, error rate under LLM_MAX_ERROR_RATE) wins, and the
+    rest are returned behind it as failovers. As before the router, requests for an explicit
+    output language aren't moved to a cheaper model for cost.
+    """
+
+    @staticmethod
+    def api_key_for(model_config: dict) -> str:
+        return getattr(settings, model_config["api_key_setting"], "")
+
+    @staticmethod
+    def estimate_cost(model_config: dict, input_tokens: int, output_tokens: int) -> float:
+        return (
+            input_tokens / 1000 * model_config["input_cost_per_1k"]
+            + output_tokens / 1000 * model_config["output_cost_per_1k"]
+        )
+
+    @staticmethod
+    async def stats(models: list) -> dict:
+        """
+        Rolling p50/p95 latency (ms), error rate and average cost per model, in one round trip.
+        """
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            for model in models:
+                pipe.lrange(f"{METRICS_PREFIX}{model}:latency", 0, -1)
+                pipe.lrange(f"{METRICS_PREFIX}{model}:outcome", 0, -1)
+                pipe.lrange(f"{METRICS_PREFIX}{model}:cost", 0, -1)
+            raw = await pipe.execute()
+        except Exception as e:
+            print(f"Router metrics unavailable: {e}")
+            raw = [[]] * (len(models) * 3)
+
+        stats = {}
+        for i, model in enumerate(models):
+            latencies = [float(v) for v in raw[i * 3]]
+            outcomes = [int(v) for v in raw[i * 3 + 1]]
+            costs = [float(v) for v in raw[i * 3 + 2]]
+            stats[model] = {
+                "p50_ms": _percentile(latencies, 50),
+                "p95_ms": _percentile(latencies, 95),
+                "error_rate": (1 - sum(outcomes) / len(outcomes)) if outcomes else 0.0,
+                "avg_cost_usd": sum(costs) / len(costs) if costs else None,
+                "samples": len(outcomes),
+            }
+        return stats
+
+    @staticmethod
+    async def record(model: str, latency_ms: float, ok: bool, cost_usd: float = None):
+        try:
+            pipe = get_redis().pipeline(transaction=False)
+            samples = {"outcome": 1 if ok else 0}
+            if ok:
+                # Failures return fast and would make a broken provider look quick
+                samples["latency"] = round(latency_ms, 1)
+            if cost_usd is not None:
+                samples["cost"] = cost_usd
+            for metric, value in samples.items():
+                key = f"{METRICS_PREFIX}{model}:{metric}"
+                pipe.lpush(key, value)
+                pipe.ltrim(key, 0, WINDOW - 1)
+                # A model we routed away from gets no new samples; letting its window expire
+                # puts it back in rotation after the cool-down so it can recover
+                pipe.expire(key, settings.LLM_METRICS_COOLDOWN_SECONDS)
+            await pipe.execute()
+        except Exception as e:
+            print(f"Router metrics write failed: {e}")
+
+    @staticmethod
+    async def choose(text: str, preferred_model: str = None, language: str = "Auto") -> list:
+        """
+        Returns model configs ordered by routing preference: the chosen model first, then failovers.
+        """
+        configs = list(settings.LLM_MODELS)
+        if preferred_model:
+            configs.sort(key=lambda c: c["model"] != preferred_model)
+        stats = await ModelRouter.stats([c["model"] for c in configs])
+
+        ranked = []
+        for position, config in enumerate(configs):
+            model = config["model"]
+            # Count with each model's own tokenizer; CJK text is far off a chars/4 guess
+            input_tokens = count_tokens(text, model)
+            cost = ModelRouter.estimate_cost(config, input_tokens, settings.LLM_EXPECTED_OUTPUT_TOKENS)
+            model_stats = stats[model]
+            enough_samples = model_stats["samples"] >= MIN_SAMPLES
+            reasons = []
+            if input_tokens + settings.LLM_EXPECTED_OUTPUT_TOKENS > config["max_input_tokens"]:
+                reasons.append("context")
+            if enough_samples and model_stats["error_rate"] > settings.LLM_MAX_ERROR_RATE:
+                reasons.append("errors")
+            if enough_samples and model_stats["p95_ms"] and model_stats["p95_ms"] > settings.LLM_LATENCY_BUDGET_MS:
+                reasons.append("latency")
+            # Translation into a requested language is kept on the preferred model whatever the length
+            if cost > settings.LLM_COST_BUDGET_USD and (not language or language == "Auto"):
+                reasons.append("cost")
+            ranked.append({
+                **config,
+                "api_key": ModelRouter.api_key_for(config),
+                "input_tokens": input_tokens,
+                "estimated_cost_usd": cost,
+                "rejected_for": reasons,
+                "stats": model_stats,
+                "_order": (
+                    "context" in reasons, # never pick a model the input can't fit
+                    "errors" in reasons or "latency" in reasons, # then prefer healthy providers
+                    "cost" in reasons, # then stay within budget
+                    position if not reasons else cost,
+                ),
+            })
+
+        ranked.sort(key=lambda c: c["_order"])
+        chosen = ranked[0]
+        skipped = ", ".join(f"{c['model']} ({'/'.join(c['rejected_for'])})" for c in ranked if c["rejected_for"])
+        print(
+            f"LLM routing: {chosen['model']} "
+            f"(tokens={chosen['input_tokens']}, est_cost=${chosen['estimated_cost_usd']:.5f}, "
+            f"p50_ms={chosen['stats']['p50_ms']}, p95_ms={chosen['stats']['p95_ms']}, "
+            f"errors={chosen['stats']['error_rate']:.0%})"
+            + (f"; skipped {skipped}" if skipped else "")
+        )
+        for config in ranked:
+            config.pop("_order")
+        return ranked
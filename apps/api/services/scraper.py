@@ -1,26 +1,51 @@
-import trafilatura
-from playwright.async_api import async_playwright
+import asyncio
 # from firecrawl import FirecrawlApp # Assuming firecrawl-py package usage
-import os
+import time
 from core.config import get_settings
+from core.metrics import track_tier, SCRAPER_TIER_SECONDS, SCRAPER_HEDGES
+from services.extractor import extract_html
+from services.scraper_profiles import ScraperProfiles
 
 settings = get_settings()
 
 class ScraperService:
     @staticmethod
-    async def extract_content(url: str):
-        # L1: Trafilatura
-        try:
-            downloaded = trafilatura.fetch_url(url)
-            if downloaded:
-                text = trafilatura.extract(downloaded)
-                if text:
-                    return {"method": "trafilatura", "content": text}
-        except Exception as e:
-            print(f"Trafilatura failed: {e}")
+    async def _extract_text(html: str, extract_pool=None):
+        if extract_pool:
+            return await extract_pool.extract(html)
+        return await asyncio.to_thread(extract_html, html)
 
-        # L2: Playwright
-        try:
+    @staticmethod
+    def tiers() -> list:
+        return ["trafilatura", "playwright"] + (["firecrawl"] if settings.FIRECRAWL_API_KEY else [])
+
+    @staticmethod
+    async def _trafilatura(url: str, browser_pool=None, http_fetcher=None, extract_pool=None, on_stage=None):
+        if on_stage:
+            await on_stage("fetching")
+        if http_fetcher:
+            downloaded = await http_fetcher.fetch(url)
+        else:
+            # fetch_url is blocking; keep it off the event loop
+            import trafilatura
+            downloaded = await asyncio.to_thread(trafilatura.fetch_url, url)
+        if not downloaded:
+            return None
+        if on_stage:
+            await on_stage("extracting")
+        return await ScraperService._extract_text(downloaded, extract_pool)
+
+    @staticmethod
+    async def _playwright(url: str, browser_pool=None, http_fetcher=None, extract_pool=None, on_stage=None):
+        if on_stage:
+            await on_stage("fetching")
+        if browser_pool:
+            # Shared worker browser: isolated context per job, heavy resources blocked
+            async with browser_pool.page() as page:
+                await page.goto(url, timeout=30000)
+                content = await page.content()
+        else:
+            from playwright.async_api import async_playwright
             async with async_playwright() as p:
                 browser = await p.chromium.launch(headless=True)
                 proxy = {"server": settings.PROXY_SERVER_URL} if settings.PROXY_SERVER_URL else None
@@ -28,31 +53,109 @@ class ScraperService:
                 page = await context.new_page()
                 await page.goto(url, timeout=30000)
                 content = await page.content()
-                text = trafilatura.extract(content) # Use trafilatura to clean HTML
                 await browser.close()
-                if text:
-                    return {"method": "playwright", "content": text}
-        except Exception as e:
-            print(f"Playwright failed: {e}")
+        if on_stage:
+            await on_stage("extracting")
+        return await ScraperService._extract_text(content, extract_pool) # Use trafilatura to clean HTML
 
-        # L3: Firecrawl (Fallback)
-        if settings.FIRECRAWL_API_KEY:
+    @staticmethod
+    async def _firecrawl(url: str, browser_pool=None, http_fetcher=None, extract_pool=None, on_stage=None):
+        def scrape():
+            from firecrawl import FirecrawlApp
+            app = FirecrawlApp(api_key=settings.FIRECRAWL_API_KEY)
             try:
-                from firecrawl import FirecrawlApp
-                app = FirecrawlApp(api_key=settings.FIRECRAWL_API_KEY)
                 scrape_result = app.scrape_url(url, params={'formats': ['markdown']})
-                if scrape_result and scrape_result.get('markdown'):
-                    return {"method": "firecrawl", "content": scrape_result['markdown']}
             except AttributeError:
                 # Handle newer firecrawl-py versions where scrape_url is scrape
+                scrape_result = app.scrape(url, formats=['markdown'])
+            return scrape_result.get('markdown') if scrape_result else None
+        # The SDK is blocking; on the event loop it would stall the tier racing it
+        return await asyncio.to_thread(scrape)
+
+    @staticmethod
+    async def _run_tier(name: str, url: str, domain: str, redis=None, **kwargs):
+        """
+        Runs one tier and records its outcome in the domain profile. Returns the text, or None if
+        the tier failed or came back empty. Cancellation (a hedge won) is not recorded.
+        """
+        started = time.perf_counter()
+        text = None
+        try:
+            with track_tier(SCRAPER_TIER_SECONDS, name) as tier:
                 try:
-                    scrape_result = app.scrape(url, formats=['markdown'])
-                    if scrape_result and scrape_result.get('markdown'):
-                        return {"method": "firecrawl", "content": scrape_result['markdown']}
-                except Exception as e:
-                    print(f"Firecrawl failed: {e}")
-            except Exception as e:
-                print(f"Firecrawl failed: {e}")
-            
-        return {"method": "failed", "content": ""}
+                    text = await getattr(ScraperService, f"_{name}")(url, **kwargs)
+                except asyncio.CancelledError:
+                    tier["outcome"] = "cancelled"
+                    raise
+                if text:
+                    tier["outcome"] = "success"
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"{name.capitalize()} failed: {e}")
+        await ScraperProfiles.record(redis, domain, name, (time.perf_counter() - started) * 1000, bool(text))
+        return text or None
+
+    @staticmethod
+    async def extract_content(url: str, browser_pool=None, http_fetcher=None, extract_pool=None, on_stage=None, redis=None):
+        """
+        Tries the extraction tiers (L1 trafilatura, L2 Playwright, L3 Firecrawl) until one returns text.
+        The order comes from the domain's profile: tiers that rarely work on it are tried last.
+        With SCRAPER_HEDGE_ENABLED, a tier still running past the domain's p90 latency for it gets
+        the next tier started alongside; whichever returns text first wins and the other is cancelled.
+        """
+        domain = ScraperProfiles.domain(url)
+        tiers = ScraperService.tiers()
+        stats = await ScraperProfiles.stats(redis, domain, tiers)
+        remaining = ScraperProfiles.order(tiers, stats)
+        if remaining != tiers:
+            print(f"Scraper plan for {domain}: {' > '.join(remaining)}")
+        kwargs = {"browser_pool": browser_pool, "http_fetcher": http_fetcher, "extract_pool": extract_pool, "on_stage": on_stage}
+
+        def hedge_deadline(name: str, started: float):
+            p90_ms = stats[name]["p90_ms"]
+            if not settings.SCRAPER_HEDGE_ENABLED or not p90_ms or not remaining:
+                return None
+            return started + max(settings.SCRAPER_HEDGE_MIN_SECONDS, p90_ms / 1000)
+
+        running = {} # task -> (tier, started)
+        hedged = []
+        winner = None
+        hedge_at = None
+        try:
+            while remaining or running:
+                # 1. Start the next tier: nothing is running, or the running tier passed its p90
+                if not running or (hedge_at is not None and time.perf_counter() >= hedge_at):
+                    name = remaining.pop(0)
+                    if running:
+                        hedged.append(name)
+                        print(f"Hedging {domain}: starting {name} alongside {', '.join(t for t, _ in running.values())}")
+                    started = time.perf_counter()
+                    task = asyncio.create_task(ScraperService._run_tier(name, url, domain, redis, **kwargs))
+                    running[task] = (name, started)
+                    # At most two tiers at once: a hedge is not hedged again
+                    hedge_at = hedge_deadline(name, started) if len(running) == 1 else None
 
+                # 2. Wait for a result or the hedge deadline
+                timeout = max(0.0, hedge_at - time.perf_counter()) if hedge_at is not None else None
+                done, _ = await asyncio.wait(running, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    name, _ = running.pop(task)
+                    text = task.result()
+                    if text:
+                        winner = name
+                        return {"method": name, "content": text}
+
+                # 3. A tier failed while another keeps running: the survivor can be hedged in turn
+                if done and len(running) == 1:
+                    name, started = next(iter(running.values()))
+                    hedge_at = hedge_deadline(name, started)
+        finally:
+            for task in running:
+                task.cancel()
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+            for name in hedged:
+                SCRAPER_HEDGES.labels(tier=name, result="won" if name == winner else "lost").inc()
+
+        return {"method": "failed", "content": ""}
@@ -0,0 +1,89 @@
+from urllib.parse import urlparse
+from core.config import get_settings
+
+settings = get_settings()
+
+PROFILE_PREFIX = "scraper-profile:"
+
+
+def _percentile(values: list, pct: float):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+class ScraperProfiles:
+    """
+    Per-domain record of how each web extraction tier fares there: outcome and latency of the last
+    SCRAPER_PROFILE_WINDOW runs. JS-heavy or bot-walled domains start at the tier that works for
+    them instead of paying for every cheaper tier first, and the latency p90 is what hedging waits for.
+    """
+
+    @staticmethod
+    def domain(url: str) -> str:
+        host = (urlparse(url if "://" in url else f"https://{url}").hostname or "").lower()
+        return host.removeprefix("www.")
+
+    @staticmethod
+    async def stats(redis, domain: str, tiers: list) -> dict:
+        """
+        Success rate, latency p50/p90 (ms, successful runs only) and sample count per tier, in one round trip.
+        """
+        raw = [[]] * (len(tiers) * 2)
+        if redis and domain:
+            try:
+                pipe = redis.pipeline(transaction=False)
+                for tier in tiers:
+                    pipe.lrange(f"{PROFILE_PREFIX}{domain}:{tier}:latency", 0, -1)
+                    pipe.lrange(f"{PROFILE_PREFIX}{domain}:{tier}:outcome", 0, -1)
+                raw = await pipe.execute()
+            except Exception as e:
+                print(f"Scraper profile unavailable for {domain}: {e}")
+
+        stats = {}
+        for i, tier in enumerate(tiers):
+            latencies = [float(v) for v in raw[i * 2]]
+            outcomes = [int(v) for v in raw[i * 2 + 1]]
+            stats[tier] = {
+                "success_rate": sum(outcomes) / len(outcomes) if outcomes else None,
+                "p50_ms": _percentile(latencies, 50),
+                "p90_ms": _percentile(latencies, 90) if len(latencies) >= settings.SCRAPER_PROFILE_MIN_SAMPLES else None,
+                "samples": len(outcomes),
+            }
+        return stats
+
+    @staticmethod
+    async def record(redis, domain: str, tier: str, latency_ms: float, ok: bool):
+        if not redis or not domain:
+            return
+        try:
+            pipe = redis.pipeline(transaction=False)
+            samples = {"outcome": 1 if ok else 0}
+            if ok:
+                # Failures are often fast (blocked, empty page) and would pull the p90 down
+                samples["latency"] = round(latency_ms, 1)
+            for metric, value in samples.items():
+                key = f"{PROFILE_PREFIX}{domain}:{tier}:{metric}"
+                pipe.lpush(key, value)
+                pipe.ltrim(key, 0, settings.SCRAPER_PROFILE_WINDOW - 1)
+                # A tier moved to the back stops getting samples; once its history expires the
+                # domain goes back to the default order and the tier gets another chance
+                pipe.expire(key, settings.SCRAPER_PROFILE_TTL_SECONDS)
+            await pipe.execute()
+        except Exception as e:
+            print(f"Scraper profile write failed for {domain}: {e}")
+
+    @staticmethod
+    def order(tiers: list, stats: dict) -> list:
+        """
+        Default order (cheapest first), except that tiers which rarely work on this domain move to
+        the back, so the first tier tried is the cheapest one likely to succeed.
+        """
+        def failing(tier):
+            tier_stats = stats[tier]
+            return (
+                tier_stats["samples"] >= settings.SCRAPER_PROFILE_MIN_SAMPLES
+                and tier_stats["success_rate"] < settings.SCRAPER_TIER_MIN_SUCCESS_RATE
+            )
+        return sorted(tiers, key=failing)
@@ -0,0 +1,126 @@
+import asyncio
+from collections import deque
+from datetime import datetime, timezone
+from supabase import PostgrestAPIError
+from core.config import get_settings
+
+settings = get_settings()
+
+# SQLSTATE classes that retrying can't fix: data exceptions (bad uuid), integrity constraints (FK),
+# syntax/undefined objects. PGRST1xx/2xx are PostgREST request and schema errors
+REJECTED_CODE_PREFIXES = ("22", "23", "42", "PGRST1", "PGRST2")
+
+
+class UsageLogBuffer:
+    """
+    Write-behind buffer for `usage_logs` rows. Jobs add records in memory and a background loop
+    bulk-inserts them every USAGE_LOG_FLUSH_SECONDS, or sooner once USAGE_LOG_BATCH_SIZE rows
+    are waiting. `stop()` flushes whatever is left, so a graceful shutdown loses nothing.
+    Memory is capped at USAGE_LOG_MAX_BUFFERED rows; if Postgres stays down the oldest are dropped.
+    """
+
+    def __init__(self, supabase, batch_size: int = None, flush_interval: float = None, max_buffered: int = None):
+        self.supabase = supabase
+        self.batch_size = batch_size or settings.USAGE_LOG_BATCH_SIZE
+        self.flush_interval = flush_interval or settings.USAGE_LOG_FLUSH_SECONDS
+        self.rows = deque(maxlen=max_buffered or settings.USAGE_LOG_MAX_BUFFERED)
+        self.dropped = 0
+        self._flush_lock = asyncio.Lock()
+        self._wake = asyncio.Event()
+        self._stopping = False
+        self._task = None
+
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        # Let the loop finish its current flush instead of cancelling it mid-insert
+        self._stopping = True
+        self._wake.set()
+        if self._task:
+            await self._task
+            self._task = None
+        # Drain everything, one batch at a time; give up if Postgres is failing
+        while self.rows:
+            if not await self.flush():
+                print(f"Usage log: {len(self.rows)} rows could not be written at shutdown")
+                break
+
+    def add(self, user_id: str, url: str, **fields):
+        if len(self.rows) == self.rows.maxlen:
+            self.dropped += 1
+        self.rows.append({
+            "user_id": user_id,
+            "url_processed": url,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            **fields,
+        })
+        if len(self.rows) >= self.batch_size:
+            self._wake.set()
+
+    async def flush(self) -> bool:
+        """
+        Inserts up to one batch. Rows are put back on transient failures and retried on the next
+        flush; a batch Postgres rejects is retried row by row and the rejected rows are dropped.
+        """
+        async with self._flush_lock:
+            if not self.rows:
+                return True
+            batch = [self.rows.popleft() for _ in range(min(self.batch_size, len(self.rows)))]
+            try:
+                await asyncio.to_thread(self.supabase.table("usage_logs").insert(batch).execute)
+            except Exception as e:
+                print(f"Usage log flush of {len(batch)} rows failed: {e}")
+                if not _rejected(e):
+                    self._requeue(batch)
+                    return False
+                # One bad row (say, a user_id that isn't a uuid) mustn't hold up the rest
+                retry = []
+                for row in batch:
+                    try:
+                        await asyncio.to_thread(self.supabase.table("usage_logs").insert(row).execute)
+                    except Exception as row_error:
+                        if not _rejected(row_error):
+                            retry.append(row)
+                        else:
+                            print(f"Usage log: dropped row for {row['user_id']} ({row.get('job_id')}): {row_error}")
+                if retry:
+                    self._requeue(retry)
+                    return False
+            if self.dropped:
+                print(f"Usage log: dropped {self.dropped} rows while the buffer was full")
+                self.dropped = 0
+            return True
+
+    def _requeue(self, batch: list):
+        # Newer rows win if the buffer filled up in the meantime
+        free = self.rows.maxlen - len(self.rows)
+        self.dropped += max(0, len(batch) - free)
+        self.rows.extendleft(reversed(batch[max(0, len(batch) - free):]))
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            while self.rows:
+                if not await self.flush():
+                    break
+                if len(self.rows) < self.batch_size:
+                    # Keep partial batches for the next tick
+                    break
+
+
+def _rejected(error: Exception) -> bool:
+    """
+    True if Postgres refused the rows themselves, as opposed to being unreachable or overloaded.
+    """
+    if not isinstance(error, PostgrestAPIError):
+        return False
+    code = error.code
+    # Responses that weren't PostgREST JSON carry the HTTP status instead
+    if isinstance(code, int):
+        return 400 <= code < 500 and code not in (408, 429)
+    return str(code or "").startswith(REJECTED_CODE_PREFIXES)
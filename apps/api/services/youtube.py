@@ -1,59 +1,116 @@
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api.formatters import TextFormatter
-import yt_dlp
 import os
-import uuid
+import asyncio
+import tempfile
+from core.urls import get_youtube_video_id
 from services.audio import AudioService
+from services.cache import VideoCache, MISSING
+from core.metrics import track_tier, YOUTUBE_TIER_SECONDS, YOUTUBE_CACHE_HITS
 # Import ScraperService for fallback
+
+# yt-dlp reports everything as DownloadError; these messages mean the audio won't become fetchable
+# by retrying. Anything else (403/429 throttling, bot checks, network errors) may clear up soon
+UNAVAILABLE_MARKERS = (
+    "private video", "video unavailable", "has been removed", "account associated with this video has been terminated",
+    "not available in your country", "geo restriction", "members-only", "available to this channel's members",
+    "confirm your age",
+)
  
 
 class YouTubeService:
-    def __init__(self):
+    def __init__(self, redis=None):
         self.audio_service = AudioService()
+        self.redis = redis
         self.download_path = "downloads"
         os.makedirs(self.download_path, exist_ok=True)
 
     def get_video_id(self, url: str) -> str:
-        # Simple extraction, can be improved with regex
-        if "v=" in url:
-            return url.split("v=")[1].split("&")[0]
-        elif "youtu.be/" in url:
-            return url.split("youtu.be/")[1].split("?")[0]
-        return ""
-
-    async def process_video(self, url: str):
+        return get_youtube_video_id(url)
+
+    async def process_video(self, url: str, on_stage=None):
         video_id = self.get_video_id(url)
         if not video_id:
             raise ValueError("Invalid YouTube URL")
+        # Every URL form (Shorts, embed, live, m./music.) is fetched as the canonical watch URL
+        url = f"https://www.youtube.com/watch?v={video_id}"
+
+        # 0. Known video: reuse whatever a previous run got from the best tier, no network at all
+        cached_transcript = await VideoCache.get(self.redis, video_id, "transcript_api")
+        cached_whisper = await VideoCache.get(self.redis, video_id, "whisper")
+        for method, cached in (("transcript_api", cached_transcript), ("whisper", cached_whisper)):
+            if cached and cached != MISSING:
+                print(f"Video cache hit ({method}) for {video_id}")
+                YOUTUBE_CACHE_HITS.labels(tier=method).inc()
+                return {"method": method, "content": cached}
 
         # 1. Try fetching existing transcript (Fastest & Best Quality)
-        try:
-            print(f"Attempting Transcript API for {video_id}")
-            transcript_list = YouTubeTranscriptApi.get_transcript(video_id)
-            formatter = TextFormatter()
-            text = formatter.format_transcript(transcript_list)
-            return {"method": "transcript_api", "content": text}
-        except Exception as e:
-            print(f"Transcript API failed: {e}. Falling back to Whisper...")
+        # Each tier's library is imported when the tier is first tried, not when the worker starts
+        if cached_transcript != MISSING:
+            from youtube_transcript_api import YouTubeTranscriptApi, NoTranscriptFound, TranscriptsDisabled, VideoUnavailable
+            from youtube_transcript_api.formatters import TextFormatter
+            try:
+                with track_tier(YOUTUBE_TIER_SECONDS, "transcript_api") as tier:
+                    if on_stage:
+                        await on_stage("fetching")
+                    print(f"Attempting Transcript API for {video_id}")
+                    try:
+                        transcript_list = await asyncio.to_thread(YouTubeTranscriptApi.get_transcript, video_id)
+                    except AttributeError:
+                        # Handle youtube-transcript-api >= 1.0 where get_transcript became an instance fetch()
+                        transcript_list = await asyncio.to_thread(YouTubeTranscriptApi().fetch, video_id)
+                    formatter = TextFormatter()
+                    text = formatter.format_transcript(transcript_list)
+                    tier["outcome"] = "success"
+                await VideoCache.set(self.redis, video_id, "transcript_api", text)
+                return {"method": "transcript_api", "content": text}
+            except (NoTranscriptFound, TranscriptsDisabled, VideoUnavailable) as e:
+                print(f"No transcript available for {video_id}: {type(e).__name__}. Falling back to Whisper...")
+                await VideoCache.set_missing(self.redis, video_id, "transcript_api")
+            except Exception as e:
+                print(f"Transcript API failed: {e}. Falling back to Whisper...")
 
         # 2. Fallback: Download audio & Transcribe
-        try:
-            print(f"Attempting Audio Download for {url}")
-            return await self._download_and_transcribe(url)
-        except Exception as e:
-            print(f"Whisper fallback failed: {e}. Falling back to Metadata Scrape.")
+        if cached_whisper != MISSING:
+            import yt_dlp
+            try:
+                if on_stage:
+                    await on_stage("transcribing")
+                print(f"Attempting Audio Download for {url}")
+                with track_tier(YOUTUBE_TIER_SECONDS, "whisper") as tier:
+                    result = await self._download_and_transcribe(url)
+                    tier["outcome"] = "success"
+                await VideoCache.set(self.redis, video_id, "whisper", result["content"])
+                return result
+            except yt_dlp.utils.DownloadError as e:
+                print(f"Whisper fallback failed: {e}. Falling back to Metadata Scrape.")
+                # Only a video that can't be fetched at all is remembered; throttling and network errors aren't
+                if any(marker in str(e).lower() for marker in UNAVAILABLE_MARKERS):
+                    await VideoCache.set_missing(self.redis, video_id, "whisper")
+            except Exception as e:
+                print(f"Whisper fallback failed: {e}. Falling back to Metadata Scrape.")
             
         # 3. Last Resort: yt-dlp Metadata (Title + Description)
         # Much improved over raw HTML scraping
+        cached_metadata = await VideoCache.get(self.redis, video_id, "metadata_fallback")
+        if cached_metadata and cached_metadata != MISSING:
+            print(f"Video cache hit (metadata_fallback) for {video_id}")
+            YOUTUBE_CACHE_HITS.labels(tier="metadata_fallback").inc()
+            return {"method": "metadata_fallback", "content": cached_metadata}
         try:
+            if on_stage:
+                await on_stage("fetching")
             print(f"Attempting yt-dlp Metadata Fallback for {url}")
-            return await self._get_metadata_fallback(url)
+            with track_tier(YOUTUBE_TIER_SECONDS, "metadata_fallback") as tier:
+                result = await self._get_metadata_fallback(url)
+                tier["outcome"] = "success"
+            await VideoCache.set(self.redis, video_id, "metadata_fallback", result["content"])
+            return result
         except Exception as e:
             print(f"Metadata fallback failed: {e}")
 
         raise Exception("Failed to process YouTube video (Transcript, Audio, and Metadata all failed).")
 
     async def _get_metadata_fallback(self, url: str):
+        import yt_dlp
         ydl_opts = {
             'quiet': True,
             'no_warnings': True,
@@ -83,76 +140,55 @@ class YouTubeService:
             raise e
 
     async def _download_and_transcribe(self, url: str):
-        file_id = str(uuid.uuid4())
-        # The filename template for yt-dlp
-        # We use a temporary filename that yt-dlp will write to
-        output_template = os.path.join(self.download_path, f"{file_id}.%(ext)s")
-        
-        # We expect mp3 because of the postprocessor
-        final_filepath = os.path.join(self.download_path, f"{file_id}.mp3")
+        import yt_dlp
+        # Everything for this job (source audio + chunks) lives in one temp dir that is
+        # removed on exit, whether transcription succeeds or not
+        with tempfile.TemporaryDirectory(dir=self.download_path) as work_dir:
+            # The filename template for yt-dlp
+            output_template = os.path.join(work_dir, "source.%(ext)s")
 
-        ydl_opts = {
-            'format': 'bestaudio/best',
-            'postprocessors': [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }],
-            'outtmpl': output_template,
-            'quiet': True,
-            'no_warnings': True,
-            'nocheckcertificate': True,
-            'source_address': '0.0.0.0', # Enforce IPv4
-            # Use Android client to bypass some 403s
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['android', 'web'],
+            ydl_opts = {
+                # Smallest reasonable audio-only stream; AudioService re-encodes it for speech anyway,
+                # so no FFmpegExtractAudio pass here
+                'format': 'bestaudio[abr<=96]/bestaudio/best',
+                'outtmpl': output_template,
+                'quiet': True,
+                'no_warnings': True,
+                'nocheckcertificate': True,
+                'source_address': '0.0.0.0', # Enforce IPv4
+                # Use Android client to bypass some 403s
+                'extractor_args': {
+                    'youtube': {
+                        'player_client': ['android', 'web'],
+                    }
+                },
+                'http_headers': {
+                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+                    'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
+                    'Accept-Language': 'en-US,en;q=0.5',
                 }
-            },
-            'http_headers': {
-                'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8',
-                'Accept-Language': 'en-US,en;q=0.5',
             }
-        }
 
-        try:
-            # Run blocking yt-dlp in a thread to avoid blocking the event loop
-            import asyncio
-            
-            def run_yt_dlp():
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    ydl.download([url])
-            
-            loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, run_yt_dlp)
-            
-            if not os.path.exists(final_filepath):
-                # Check for other extensions just in case
-                base_path = os.path.join(self.download_path, file_id)
-                found = False
-                for ext in ['.webm', '.m4a', '.mp3']:
-                    if os.path.exists(base_path + ext):
-                        final_filepath = base_path + ext
-                        found = True
-                        break
-                if not found:
-                    raise FileNotFoundError(f"Audio file not found at {final_filepath}")
-
-            text = self.audio_service.transcribe(final_filepath)
-            
-            # Cleanup
-            if os.path.exists(final_filepath):
-                os.remove(final_filepath)
-                
-            return {"method": "whisper", "content": text}
-            
-        except Exception as e:
-            print(f"Download/Transcribe failed: {e}")
-            if os.path.exists(final_filepath):
-                # Cleanup potential partial files
-                try:
-                    os.remove(final_filepath)
-                except: 
-                    pass
-            raise e
+            try:
+                # Run blocking yt-dlp in a thread to avoid blocking the event loop
+                def run_yt_dlp():
+                    with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                        ydl.download([url])
+
+                # Sub-stages of the whisper tier, so slow downloads and slow transcription can be told apart
+                with track_tier(YOUTUBE_TIER_SECONDS, "audio_download") as tier:
+                    await asyncio.to_thread(run_yt_dlp)
+                    tier["outcome"] = "success"
+
+                downloaded = [name for name in os.listdir(work_dir) if name.startswith("source.")]
+                if not downloaded:
+                    raise FileNotFoundError(f"Audio file not found in {work_dir}")
+
+                with track_tier(YOUTUBE_TIER_SECONDS, "audio_transcribe") as tier:
+                    text = await self.audio_service.transcribe(os.path.join(work_dir, downloaded[0]), work_dir=work_dir)
+                    tier["outcome"] = "success"
+                return {"method": "whisper", "content": text}
+
+            except Exception as e:
+                print(f"Download/Transcribe failed: {e}")
+                raise e
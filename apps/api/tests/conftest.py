@@ -0,0 +1,24 @@
+import os
+import sys
+import pytest
+
+# Settings are read at import time; the values only have to exist for the modules under test
+for name in (
+    "CLERK_SECRET_KEY", "NEXT_PUBLIC_CLERK_PUBLISHABLE_KEY", "NEXT_PUBLIC_SUPABASE_URL",
+    "NEXT_PUBLIC_SUPABASE_ANON_KEY", "OPENAI_API_KEY", "GEMINI_API_KEY", "GROQ_API_KEY",
+    "NOTION_CLIENT_ID", "NOTION_CLIENT_SECRET", "NOTION_REDIRECT_URI",
+):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("REDIS_URL", "redis://localhost:6379/15")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def redis():
+    """
+    A fresh in-process Redis per test; lupa gives fakeredis the Lua support the scripts need.
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    return fakeredis.FakeAsyncRedis()
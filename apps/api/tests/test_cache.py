@@ -0,0 +1,58 @@
+import asyncio
+from services.cache import INFLIGHT_PREFIX, ResultCache
+
+
+def test_claim_is_singleflight(redis):
+    async def scenario():
+        return await ResultCache.claim(redis, "k", "job-1"), await ResultCache.claim(redis, "k", "job-2")
+    assert asyncio.run(scenario()) == ("job-1", "job-1")
+
+
+def test_claim_gives_up_when_the_key_keeps_changing_hands(redis):
+    class Racing:
+        # Every SET NX loses, and the winner is gone again by the time we read it
+        async def set(self, *args, **kwargs):
+            return None
+
+        async def get(self, key):
+            return None
+
+    assert asyncio.run(ResultCache.claim(Racing(), "k", "job-1")) is None
+
+
+def test_release_returns_each_attached_user_once(redis):
+    async def scenario():
+        await ResultCache.claim(redis, "k", "job-1")
+        attached = [
+            await ResultCache.attach(redis, "k", "job-1", "alice"),
+            await ResultCache.attach(redis, "k", "job-1", "bob"),
+            await ResultCache.attach(redis, "k", "job-1", "alice"),
+        ]
+        return attached, sorted(await ResultCache.release(redis, "k", "job-1")), await ResultCache.release(redis, "k", "job-1")
+    assert asyncio.run(scenario()) == ([True, True, True], ["alice", "bob"], [])
+
+
+def test_attach_fails_once_the_job_released_the_key(redis):
+    async def scenario():
+        await ResultCache.claim(redis, "k", "job-1")
+        await ResultCache.release(redis, "k", "job-1")
+        return await ResultCache.attach(redis, "k", "job-1", "alice"), await ResultCache.release(redis, "k", "job-1")
+    assert asyncio.run(scenario()) == (False, [])
+
+
+def test_release_keeps_a_newer_owners_claim(redis):
+    async def scenario():
+        await ResultCache.claim(redis, "k", "job-1")
+        # job-1's marker expired and job-2 claimed the key
+        await redis.delete(INFLIGHT_PREFIX + "k")
+        await ResultCache.claim(redis, "k", "job-2")
+        await ResultCache.release(redis, "k", "job-1")
+        return await ResultCache.claim(redis, "k", "job-3"), await ResultCache.attach(redis, "k", "job-1", "alice")
+    assert asyncio.run(scenario()) == ("job-2", False)
+
+
+def test_cache_key_ignores_url_noise_but_not_language():
+    key = ResultCache.make_key("https://www.Example.com/post/?utm_source=x#top", "Auto")
+    assert key == ResultCache.make_key("example.com/post", "Auto")
+    assert key == ResultCache.make_key("https://example.com/post", None)
+    assert key != ResultCache.make_key("https://example.com/post", "Korean")
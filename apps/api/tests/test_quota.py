@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+import core.quota as quota
+from core.quota import UsageQuota, counter_key, current_month
+
+
+@pytest.fixture
+def usage_logs(redis, monkeypatch):
+    """
+    Rows per user in usage_logs this month, as count_usage_logs would report them.
+    """
+    logged = {}
+    monkeypatch.setattr(quota, "get_redis", lambda: redis)
+    monkeypatch.setattr(quota, "count_usage_logs", lambda supabase, user_id, month: logged.get(user_id, 0))
+    return logged
+
+
+def test_missing_counter_is_seeded_from_usage_logs(redis, usage_logs):
+    usage_logs["u"] = 3
+
+    async def scenario():
+        return await UsageQuota.check_and_increment(None, "u", 5), await redis.get(counter_key("u", current_month()))
+    assert asyncio.run(scenario()) == ((True, 4), b"4")
+
+
+def test_multi_credit_requests_are_all_or_nothing(redis, usage_logs):
+    usage_logs["u"] = 3
+
+    async def scenario():
+        return [
+            await UsageQuota.check_and_increment(None, "u", 5, credits=3),
+            await UsageQuota.check_and_increment(None, "u", 5, credits=2),
+            await UsageQuota.check_and_increment(None, "u", 5, credits=3),
+            await UsageQuota.check_and_increment(None, "u", 5),
+        ]
+    # 3 + 3 doesn't fit and consumes nothing; 3 + 2 fits exactly; then the month is used up
+    assert asyncio.run(scenario()) == [(False, 3), (True, 5), (False, 5), (False, 5)]
+
+
+def test_refund_never_goes_below_zero(redis, usage_logs):
+    async def scenario():
+        await UsageQuota.check_and_increment(None, "u", 5, credits=2)
+        return await UsageQuota.refund("u", 1), await UsageQuota.refund("u", 5), await UsageQuota.refund("u")
+    assert asyncio.run(scenario()) == (1, 0, 0)
+
+
+def test_refund_without_a_counter_creates_none(redis, usage_logs):
+    async def scenario():
+        return await UsageQuota.refund("u", 2), await redis.exists(counter_key("u", current_month()))
+    assert asyncio.run(scenario()) == (0, 0)
+
+
+def test_reconcile_raises_counters_but_never_lowers_them(redis, usage_logs):
+    async def scenario():
+        await UsageQuota.check_and_increment(None, "behind", 50)
+        await UsageQuota.check_and_increment(None, "ahead", 50, credits=4)
+        # A flush lost admissions for "behind"; "ahead" has admissions not logged yet
+        usage_logs.update(behind=7, ahead=2)
+        raised = await UsageQuota.reconcile(None)
+        month = current_month()
+        return raised, await redis.get(counter_key("behind", month)), await redis.get(counter_key("ahead", month))
+    assert asyncio.run(scenario()) == (1, b"7", b"4")
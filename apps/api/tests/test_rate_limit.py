@@ -0,0 +1,87 @@
+import asyncio
+from starlette.requests import Request
+import core.rate_limit as rate_limit
+from core.auth import UserProfile
+from core.rate_limit import RateLimitService, client_ip
+
+
+async def check(limits, times: int) -> list:
+    results = [await RateLimitService.check(limits) for _ in range(times)]
+    # An empty header dict means the limiter failed open, which none of these tests expect
+    assert all(headers for _, headers in results)
+    return results
+
+
+def test_burst_limit_rejects_with_retry_after(redis, monkeypatch):
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: redis)
+    results = asyncio.run(check([("rate-limit:user:u:burst", 3, 10)], 4))
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert [headers["RateLimit-Remaining"] for _, headers in results] == ["2", "1", "0", "0"]
+    assert "Retry-After" not in results[2][1]
+    # One slot frees up every period / limit seconds
+    assert results[3][1]["Retry-After"] == "4"
+    assert results[3][1]["RateLimit-Limit"] == "3"
+
+
+def test_rejected_request_is_not_counted_against_other_limits(redis, monkeypatch):
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: redis)
+    burst = ("rate-limit:user:u:burst", 2, 10)
+    sustained = ("rate-limit:user:u:sustained", 100, 3600)
+
+    async def scenario():
+        return await check([burst, sustained], 5), await check([sustained], 1)
+    both, (sustained_only,) = asyncio.run(scenario())
+    assert [allowed for allowed, _ in both] == [True, True, False, False, False]
+    # Only the two admitted requests moved the sustained limit, plus this one: 100 - 3 left
+    assert sustained_only == (True, {"RateLimit-Limit": "100", "RateLimit-Remaining": "97", "RateLimit-Reset": "108"})
+
+
+def test_requests_are_allowed_again_after_retry_after(redis, monkeypatch):
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: redis)
+    limits = [("rate-limit:ip:1.2.3.4:burst", 2, 0.2)]
+
+    async def scenario():
+        before = await check(limits, 3)
+        await asyncio.sleep(0.15)
+        return before, await check(limits, 1)
+    before, after = asyncio.run(scenario())
+    assert [allowed for allowed, _ in before] == [True, True, False]
+    assert before[2][1]["Retry-After"] == "1"
+    assert after[0][0]
+
+
+def test_limits_are_per_user_and_per_ip():
+    a = RateLimitService.limits_for(UserProfile("a", "FREE", 50), "1.1.1.1")
+    b = RateLimitService.limits_for(UserProfile("b", "FREE", 50), "2.2.2.2")
+    assert not {key for key, _, _ in a} & {key for key, _, _ in b}
+    assert any(":ip:1.1.1.1:" in key for key, _, _ in a)
+
+
+def test_fails_open_without_redis(monkeypatch):
+    class Broken:
+        def register_script(self, script):
+            raise ConnectionError("Redis is down")
+
+    monkeypatch.setattr(rate_limit, "get_redis", lambda: Broken())
+    monkeypatch.setattr(RateLimitService, "_script", None)
+    assert asyncio.run(RateLimitService.check([("rate-limit:user:u:burst", 1, 10)])) == (True, {})
+
+
+def request_from(peer: str, forwarded: list) -> Request:
+    headers = [(b"x-forwarded-for", value.encode("latin-1")) for value in forwarded]
+    return Request({"type": "http", "headers": headers, "client": (peer, 1234)})
+
+
+def test_client_ip_ignores_forwarded_for_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "TRUSTED_PROXY_HOPS", 0)
+    assert client_ip(request_from("10.0.0.1", ["6.6.6.6"])) == "10.0.0.1"
+
+
+def test_client_ip_counts_trusted_hops_from_the_right(monkeypatch):
+    monkeypatch.setattr(rate_limit.settings, "TRUSTED_PROXY_HOPS", 1)
+    # The client spoofed 6.6.6.6; the load balancer appended the address it saw
+    assert client_ip(request_from("10.0.0.1", ["6.6.6.6, 203.0.113.7"])) == "203.0.113.7"
+    assert client_ip(request_from("10.0.0.1", ["6.6.6.6", "203.0.113.7"])) == "203.0.113.7"
+    monkeypatch.setattr(rate_limit.settings, "TRUSTED_PROXY_HOPS", 2)
+    assert client_ip(request_from("10.0.0.1", ["6.6.6.6, 203.0.113.7, 10.0.0.9"])) == "203.0.113.7"
+    assert client_ip(request_from("10.0.0.1", [])) == "10.0.0.1"
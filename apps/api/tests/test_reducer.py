@@ -0,0 +1,40 @@
+from services.reducer import estimate_tokens, reduce_text
+
+
+def test_sentences_mentioning_chrome_words_are_kept():
+    content = [
+        "The regulator says cookies set without consent broke the law.",
+        "Readers who subscribe to the print edition get the archive for free.",
+        "Only 40% of people who sign up for a gym still go after six months.",
+        "Click here and there, and the study found users gave up within a minute.",
+        "© 2024 was the year the copyright office ruled on AI-generated images.",
+    ]
+    text, _ = reduce_text("\n".join(content), token_budget=0)
+    for sentence in content:
+        assert sentence in text
+
+
+def test_chrome_lines_are_dropped():
+    chrome = [
+        "Advertisement", "Share this article", "Subscribe now", "Sign up", "Follow us on Twitter",
+        "Accept all cookies", "Skip to main content", "Comments (12)", "© 2024 Example Media. All rights reserved.",
+    ]
+    body = "The council approved the new budget on Tuesday."
+    text, _ = reduce_text("\n".join(chrome[:5] + [body] + chrome[5:]), token_budget=0)
+    assert text == body
+
+
+def test_estimate_counts_cjk_as_denser():
+    english = "The quick brown fox jumps over the lazy dog. " * 20
+    korean = "빠른 갈색 여우가 게으른 개를 뛰어넘습니다. " * 20
+    japanese = "素早い茶色の狐が怠け者の犬を飛び越える。" * 20
+    assert estimate_tokens(english) == (len(english) + 3) // 4
+    # Tokenizers spend roughly a token per one or two CJK/Hangul characters, not per four
+    assert estimate_tokens(korean) > len(korean) / 2.5
+    assert estimate_tokens(japanese) > len(japanese) / 1.6
+
+
+def test_budget_is_in_tokens_for_cjk_text():
+    sentences = [f"{index}번째 문장은 요약에 필요한 서로 다른 내용을 담고 있습니다." for index in range(200)]
+    text, _ = reduce_text(" ".join(sentences), token_budget=500)
+    assert estimate_tokens(text) <= 500 * 1.05
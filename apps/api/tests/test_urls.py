@@ -0,0 +1,54 @@
+import pytest
+from core.urls import get_youtube_video_id, normalize_url
+
+
+@pytest.mark.parametrize("url, expected", [
+    ("HTTPS://Example.COM/a/b/", "https://example.com/a/b"),
+    ("https://www.example.com/", "https://example.com/"),
+    ("example.com/a", "https://example.com/a"),
+    ("http://example.com:80/a", "http://example.com/a"),
+    ("https://example.com:443/a", "https://example.com/a"),
+    ("https://example.com:8443/a", "https://example.com:8443/a"),
+    ("https://example.com/a#section-2", "https://example.com/a"),
+    ("https://example.com/a?b=2&a=1", "https://example.com/a?a=1&b=2"),
+    ("https://example.com/a?utm_source=x&UTM_Medium=y&fbclid=z&id=7", "https://example.com/a?id=7"),
+    ("https://example.com/search?q=&page=2", "https://example.com/search?page=2&q="),
+    ("  https://example.com/a  ", "https://example.com/a"),
+])
+def test_normalize_url(url, expected):
+    assert normalize_url(url) == expected
+
+
+def test_normalize_url_keeps_path_case():
+    assert normalize_url("https://example.com/Post") != normalize_url("https://example.com/post")
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://youtube.com/watch?feature=share&v=dQw4w9WgXcQ&t=42",
+    "https://m.youtube.com/watch?v=dQw4w9WgXcQ",
+    "https://music.youtube.com/watch?v=dQw4w9WgXcQ&list=RD",
+    "https://youtu.be/dQw4w9WgXcQ?si=abc",
+    "youtu.be/dQw4w9WgXcQ",
+    "https://www.youtube.com/shorts/dQw4w9WgXcQ",
+    "https://www.youtube.com/embed/dQw4w9WgXcQ?start=10",
+    "https://www.youtube-nocookie.com/embed/dQw4w9WgXcQ",
+    "https://www.youtube.com/live/dQw4w9WgXcQ",
+    "https://www.youtube.com/v/dQw4w9WgXcQ",
+])
+def test_youtube_video_links(url):
+    assert get_youtube_video_id(url) == "dQw4w9WgXcQ"
+    assert normalize_url(url) == "https://www.youtube.com/watch?v=dQw4w9WgXcQ"
+
+
+@pytest.mark.parametrize("url", [
+    "https://www.youtube.com/",
+    "https://www.youtube.com/@channel",
+    "https://www.youtube.com/playlist?list=PL123",
+    "https://www.youtube.com/watch?v=tooshort",
+    "https://youtu.be/",
+    "https://notyoutube.com/watch?v=dQw4w9WgXcQ",
+    "https://example.com/embed/dQw4w9WgXcQ",
+])
+def test_non_video_links(url):
+    assert get_youtube_video_id(url) == ""
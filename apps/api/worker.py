@@ -1,17 +1,59 @@
+import asyncio
+import importlib
+from arq import cron, func
 from arq.connections import RedisSettings
 from core.config import get_settings
+from core.metrics import start_metrics_server
+from services.browser import BrowserPool
+from services.http import HttpFetcher
+from services.notion import NotionClient
+from services.extractor import ExtractionPool
+from services.usage_log import UsageLogBuffer
+from core.quota import UsageQuota
+from services.queue import FairQueue
+from db.client import get_supabase_client
 
 settings = get_settings()
 
 async def startup(ctx):
     print("Worker starting up...")
+    # Workers have no web server of their own; expose job/tier metrics for Prometheus to scrape
+    if settings.WORKER_METRICS_PORT:
+        start_metrics_server(settings.WORKER_METRICS_PORT)
     # Initialize any heavy connections here, e.g. persistent DB pools
+    # Extraction processes are spawned first so they start from a clean parent
+    ctx["extract_pool"] = ExtractionPool()
+    await ctx["extract_pool"].start()
+    ctx["browser_pool"] = BrowserPool()
+    await ctx["browser_pool"].start()
+    ctx["http_fetcher"] = HttpFetcher(redis=ctx.get("redis"))
+    ctx["notion"] = NotionClient(redis=ctx.get("redis"))
+    ctx["usage_log"] = UsageLogBuffer(get_supabase_client())
+    await ctx["usage_log"].start()
+    # Every job ends in an LLM call; load litellm on a thread while the worker already takes jobs
+    ctx["llm_warm_up"] = asyncio.create_task(asyncio.to_thread(importlib.import_module, "litellm"))
 
 async def shutdown(ctx):
     print("Worker shutting down...")
+    if ctx.get("browser_pool"):
+        await ctx["browser_pool"].stop()
+    if ctx.get("http_fetcher"):
+        await ctx["http_fetcher"].close()
+    if ctx.get("notion"):
+        await ctx["notion"].close()
+    if ctx.get("extract_pool"):
+        await ctx["extract_pool"].stop()
+    # Last, so rows from jobs that finished during shutdown are written too
+    if ctx.get("usage_log"):
+        await ctx["usage_log"].stop()
 
-# In real structure we import from services natively
-from main import process_url_task
+async def reconcile_usage_counters(ctx):
+    # Catch Redis quota counters up with usage_logs in case Redis lost writes
+    reconciled = await UsageQuota.reconcile(get_supabase_client())
+    print(f"Reconciled {reconciled} usage counters")
+
+# Task logic lives in pipeline.py so the worker never imports the FastAPI app
+from pipeline import process_url_task, process_batch_task, export_to_notion_task
 
 from urllib.parse import urlparse
 
@@ -19,9 +61,28 @@ from urllib.parse import urlparse
 parsed_url = urlparse(settings.REDIS_URL)
 
 class WorkerSettings:
-    functions = [process_url_task]
+    functions = [
+        # Per-job timeouts are enforced per tier inside the task; this is the outer bound
+        # Results are persisted to Postgres, so Redis only keeps them around for recent /status polls
+        func(
+            process_url_task,
+            timeout=max(FairQueue.job_timeout(tier) for tier in settings.QUEUE_TIERS) + 60,
+            keep_result=settings.RESULT_HOT_TTL_SECONDS
+        ),
+        # A batch fans out hundreds of URLs inside one job, so it needs a much longer timeout
+        func(process_batch_task, timeout=settings.BATCH_TIMEOUT_SECONDS),
+        # Progress is saved per append, so a retried or resumed export continues where it stopped
+        func(export_to_notion_task, timeout=settings.NOTION_EXPORT_TIMEOUT_SECONDS),
+    ]
+    cron_jobs = [
+        cron(reconcile_usage_counters, minute=set(range(0, 60, settings.QUOTA_RECONCILE_MINUTES))),
+    ]
     on_startup = startup
     on_shutdown = shutdown
+    # All scraping I/O is non-blocking, so one worker can safely run many jobs at once
+    max_jobs = settings.WORKER_MAX_JOBS
+    # Lets DELETE /status/{job_id} cancel queued and running jobs
+    allow_abort_jobs = True
     redis_settings = RedisSettings(
         host=parsed_url.hostname or "localhost",
         port=parsed_url.port or 6379,
@@ -12,6 +12,64 @@ export interface ProcessResponse {
     category: string;
 }
 
+class JobFailedError extends Error {}
+
+// Reads the /stream/{job_id} Server-Sent Events feed until the job finishes.
+// fetch() is used instead of EventSource so the Authorization header is sent.
+const streamJob = async (apiUrl: string, jobId: string, headers: Record<string, string>): Promise<ProcessResponse> => {
+    const res = await fetch(`${apiUrl}/stream/${jobId}`, { headers: { ...headers, Accept: "text/event-stream" } });
+    if (!res.ok || !res.body) throw new Error("Stream unavailable");
+
+    const reader = res.body.pipeThrough(new TextDecoderStream()).getReader();
+    let buffer = "";
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) throw new Error("Stream closed before the job finished");
+        buffer += value;
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const frame = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+            const data = frame
+                .split("\n")
+                .filter((line) => line.startsWith("data:"))
+                .map((line) => line.slice(5).trim())
+                .join("\n");
+            if (!data) continue; // keep-alive or retry hint
+
+            const event = JSON.parse(data);
+            if (event.stage === "done") {
+                reader.cancel();
+                return event.result.data as ProcessResponse;
+            } else if (event.stage === "failed") {
+                reader.cancel();
+                throw new JobFailedError(event.error || "Extraction failed on server.");
+            }
+        }
+    }
+};
+
+const pollJob = async (apiUrl: string, jobId: string, headers: Record<string, string>): Promise<ProcessResponse> => {
+    while (true) {
+        await new Promise((resolve) => setTimeout(resolve, 2000)); // Poll every 2s
+
+        const statusRes = await fetch(`${apiUrl}/status/${jobId}`, { headers });
+        if (!statusRes.ok) throw new Error("Failed to fetch job status");
+
+        const jobData = await statusRes.json();
+
+        if (jobData.status === "completed") {
+            return jobData.result.data as ProcessResponse;
+        } else if (jobData.status === "failed") {
+            throw new Error(jobData.error || "Extraction failed on server.");
+        } else if (jobData.status === "cancelled") {
+            throw new Error("Job cancelled");
+        }
+        // If "processing" or "queued", continue loop
+    }
+};
+
 export const useProcessLink = () => {
     const { getToken } = useAuth();
     const apiUrl = process.env.NEXT_PUBLIC_API_URL || "http://localhost:8000";
@@ -19,7 +77,7 @@ export const useProcessLink = () => {
     return useMutation({
         mutationFn: async (urlToProcess: string): Promise<ProcessResponse> => {
             const token = await getToken();
-            const headers = {
+            const headers: Record<string, string> = {
                 "Content-Type": "application/json",
                 ...(token ? { "Authorization": `Bearer ${token}` } : {})
             };
@@ -37,23 +95,21 @@ export const useProcessLink = () => {
                 throw new Error(msg);
             }
 
-            const { job_id } = await startResponse.json();
-
-            // 2. Poll for completion
-            while (true) {
-                await new Promise((resolve) => setTimeout(resolve, 2000)); // Poll every 2s
+            const startData = await startResponse.json();
 
-                const statusRes = await fetch(`${apiUrl}/status/${job_id}`, { headers });
-                if (!statusRes.ok) throw new Error("Failed to fetch job status");
+            // Cache hit: the summary is returned synchronously, no job to poll
+            if (startData.status === "completed") {
+                return startData.result.data as ProcessResponse;
+            }
 
-                const jobData = await statusRes.json();
+            const { job_id } = startData;
 
-                if (jobData.status === "completed") {
-                    return jobData.result.data as ProcessResponse;
-                } else if (jobData.status === "failed") {
-                    throw new Error(jobData.error || "Extraction failed on server.");
-                }
-                // If "processing" or "queued", continue loop
+            // 2. Wait for completion: push updates over SSE, fall back to polling if the stream drops
+            try {
+                return await streamJob(apiUrl, job_id, headers);
+            } catch (err) {
+                if (err instanceof JobFailedError) throw err;
+                return await pollJob(apiUrl, job_id, headers);
             }
         },
     });